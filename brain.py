@@ -1,67 +1,74 @@
+import asyncio
+import hashlib
 import json
 import os
 import requests
 import re
 from typing import Dict, Optional
 
+import httpx
+
+from command_executor import HttpCommandExecutor
+from http_pool import OPENROUTER_URL, create_pooled_client
+from intent_cache import IntentCache
+from query_rules import parse_rules
+
+# Пометка команды по умолчанию, подставленной из-за ошибки ИИ (такие команды не кэшируются)
+FALLBACK_KEY = "_fallback"
+
+# Семейства тегов, значения которых (с частотами) попадают в схему для ИИ
+SCHEMA_TAG_FAMILIES = ['application_tags', 'technology_tags', 'role_tags', 'classification.frequency_range']
+
+# ==================== ШАБЛОН ПРОМПТА ====================
+
+PROMPT_INSTRUCTIONS = (
+    "Ты - система поиска электронных компонентов. Преобразуй запрос пользователя в команду.\n"
+    "Команды: search_components - поиск по параметрам; get_component_details - информация "
+    "о компоненте; get_characteristics - характеристики (ВАХ) компонента.\n"
+    'Верни только валидный JSON без пояснений: {"command": "имя_команды", "args": {...}, '
+    '"explanation": "пояснение на русском, что будет сделано"}'
+)
+
+# Примеры (few-shot): запрос -> ответ
+PROMPT_EXAMPLES = [
+    ("Найди советские транзисторы с током больше 0.1А", {
+        "command": "search_components",
+        "args": {"origin": "soviet", "min_current": 0.1, "type": "bjt"},
+        "explanation": "Поиск советских биполярных транзисторов с током более 0.1А"
+    }),
+    ("Покажи мощные MOSFET на 100В", {
+        "command": "search_components",
+        "args": {"type": "mosfet", "min_voltage": 50, "max_voltage": 150, "min_power": 50},
+        "explanation": "Поиск мощных MOSFET с напряжением 50-150В и мощностью от 50Вт"
+    }),
+    ("Найди лампы для аудио усилителей", {
+        "command": "search_components",
+        "args": {"type": "vacuum_tube", "application": "audio"},
+        "explanation": "Поиск вакуумных ламп для аудио применений"
+    }),
+]
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]|\n\s*')
+
+
+def compact_json(data) -> str:
+    """JSON без отступов и лишних пробелов"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов: слово — токен на каждые ~4 символа,
+    знак препинания и перевод строки с отступом — по токену"""
+    return sum(-(-len(piece) // 4) for piece in TOKEN_PATTERN.findall(text))
+
 class SimpleQueryParser:
     """Простой парсер запросов для работы без OpenRouter API"""
     
     @staticmethod
     def parse_query(user_question: str) -> Dict:
-        question = user_question.lower()
-        args = {}
-        
-        # Определяем тип компонента
-        if 'транзистор' in question:
-            if 'биполяр' in question or 'bjt' in question:
-                args['type'] = 'bjt'
-            elif 'полевой' in question or 'mosfet' in question:
-                args['type'] = 'mosfet'
-            else:
-                args['type'] = 'bjt'
-        elif 'лампа' in question or 'tube' in question:
-            args['type'] = 'vacuum_tube'
-        elif 'диод' in question:
-            args['type'] = 'diode'
-        
-        # Определяем происхождение
-        if 'советск' in question or 'отечествен' in question:
-            args['origin'] = 'soviet'
-        elif 'американ' in question or 'usa' in question:
-            args['origin'] = 'usa'
-        elif 'япон' in question:
-            args['origin'] = 'japan'
-        elif 'европ' in question:
-            args['origin'] = 'europe'
-        
-        # Парсим числовые параметры
-        # Мощность
-        power_match = re.search(r'мощность[^\d]*(\d+\.?\d*)', question)
-        if power_match:
-            args['min_power'] = float(power_match.group(1))
-        
-        # Ток
-        current_match = re.search(r'ток[^\d]*(\d+\.?\d*)\s*а', question)
-        if current_match:
-            args['min_current'] = float(current_match.group(1))
-        
-        # Напряжение
-        voltage_match = re.search(r'напряжен[^\d]*(\d+\.?\d*)\s*в', question)
-        if voltage_match:
-            args['min_voltage'] = float(voltage_match.group(1))
-        
-        # Если в запросе есть "мощный" или "большая мощность", устанавливаем минимальную мощность 10 Вт
-        if 'мощн' in question or 'большая мощность' in question:
-            args['min_power'] = 10.0
-        
-        # Если в запросе есть "высокое напряжение", устанавливаем минимальное напряжение 100 В
-        if 'высокое напряжение' in question:
-            args['min_voltage'] = 100.0
-        
-        # Если в запросе есть "большой ток", устанавливаем минимальный ток 1 А
-        if 'большой ток' in question:
-            args['min_current'] = 1.0
+        # Тип, происхождение, числа с единицами и качественные оценки («мощный»)
+        # разбираются за один проход автомата по таблице QUERY_RULES
+        args = parse_rules(user_question)
         
         return {
             "command": "search_components",
@@ -71,7 +78,7 @@ class SimpleQueryParser:
 
 
 class ComponentLibraryBrain:
-    def __init__(self):
+    def __init__(self, executor=None, intent_cache: Optional[IntentCache] = None):
         # Модель по умолчанию
         self.model = "deepseek/deepseek-chat"
         
@@ -89,6 +96,22 @@ class ComponentLibraryBrain:
             self.base_url = os.getenv("API_BASE_URL", "http://localhost:8000")
             print(f"🏠 Локальная среда, использую {self.base_url}")
         
+        # Исполнитель команд: по умолчанию HTTP-запросы к серверу (CLI main.py).
+        # Веб-приложение передаёт CatalogCommandExecutor и выполняет команды в своём процессе.
+        self.executor = executor or HttpCommandExecutor(self.base_url)
+        
+        # Общий асинхронный HTTP-клиент для OpenRouter: либо общий пул приложения
+        # (attach_async_client), либо собственный, создаваемый при первом запросе
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._owns_async_client = False
+        
+        # Кэш «запрос -> команда»: повторный вопрос не отправляется в ИИ
+        self.intent_cache = intent_cache or IntentCache.from_env()
+        
+        # Собранная статическая часть промпта (см. prompt_prefix) и её отпечаток
+        self._prompt_prefix: Optional[str] = None
+        self._prompt_version: Optional[str] = None
+        
         # 🔧 ОБНОВЛЕННАЯ КОНФИГУРАЦИЯ БИБЛИОТЕКИ ДЛЯ НОВОЙ СТРУКТУРЫ
         self.library_schema = {
             "name": "Electronic Component Library",
@@ -129,6 +152,8 @@ class ComponentLibraryBrain:
                     }
                 }
             },
+            # Значения по умолчанию; при подключённом каталоге заменяются
+            # словарями с частотами (apply_catalog_vocabulary)
             "component_types": ["bjt", "mosfet", "vacuum_tube", "diode", "transformer"],
             "component_types_extended": ["bjt_npn", "bjt_pnp", "mosfet_n_channel", "vacuum_tube_dual_triode", "diode_switching", "transformer_output"],
             "origin_types": ["soviet", "usa", "generic"],
@@ -139,67 +164,106 @@ class ComponentLibraryBrain:
             }
         }
     
-    def create_prompt(self, user_question: str) -> str:
-        """Создание промпта для ИИ на основе вопроса пользователя"""
-        prompt = f"""
-Ты - система поиска электронных компонентов. Твоя задача - анализировать запросы пользователей и преобразовывать их в команды поиска.
-
-Доступные команды:
-1. search_components - поиск компонентов по параметрам
-2. get_component_details - получение детальной информации о компоненте
-3. get_characteristics - получение характеристик (ВАХ) компонента
-
-Схема библиотеки:
-{json.dumps(self.library_schema, ensure_ascii=False, indent=2)}
-
-Запрос пользователя: "{user_question}"
-
-Верни ответ в формате JSON:
-{{
-    "command": "имя_команды",
-    "args": {{параметры}},
-    "explanation": "Пояснение на русском языке, что будет сделано"
-}}
-
-Примеры:
-1. Запрос: "Найди советские транзисторы с током больше 0.1А"
-   Ответ: {{
-        "command": "search_components",
-        "args": {{"origin": "soviet", "min_current": 0.1, "type": "bjt"}},
-        "explanation": "Поиск советских биполярных транзисторов с током более 0.1А"
-   }}
+    # ==================== СХЕМА ====================
+    
+    def apply_catalog_vocabulary(self, vocabulary: Dict) -> bool:
+        """Обновляет словари схемы по живому каталогу (ComponentCatalog.vocabulary).
 
-2. Запрос: "Покажи мощные MOSFET на 100В"
-   Ответ: {{
-        "command": "search_components",
-        "args": {{"type": "mosfet", "min_voltage": 50, "max_voltage": 150, "min_power": 50}},
-        "explanation": "Поиск мощных MOSFET с напряжением 50-150В и мощностью от 50Вт"
-   }}
+        Префикс промпта пересобирается, только если словари изменились.
+        Возвращает True, если схема обновлена.
+        """
+        updates = {
+            "component_types": vocabulary.get("component_types", {}),
+            "component_types_extended": vocabulary.get("component_types_extended", {}),
+            "origin_types": vocabulary.get("origin_types", {}),
+            "tag_types": {
+                family: tags for family, tags in vocabulary.get("tag_types", {}).items()
+                if family in SCHEMA_TAG_FAMILIES
+            },
+            "parameter_ranges": vocabulary.get("parameter_ranges", {}),
+        }
+        if all(self.library_schema.get(key) == value for key, value in updates.items()):
+            return False
+        
+        self.library_schema.update(updates)
+        self.refresh_prompt()
+        print(f"📚 Схема ИИ обновлена по каталогу: {len(updates['component_types_extended'])} типов, "
+              f"{len(updates['origin_types'])} происхождений, "
+              f"{sum(len(tags) for tags in updates['tag_types'].values())} тегов")
+        return True
+    
+    # ==================== ПРОМПТ ====================
+    
+    @property
+    def prompt_prefix(self) -> str:
+        """Статическая часть промпта: инструкции, схема и примеры.
 
-3. Запрос: "Найди лампы для аудио усилителей"
-   Ответ: {{
-        "command": "search_components",
-        "args": {{"type": "vacuum_tube", "application": "audio"}},
-        "explanation": "Поиск вакуумных ламп для аудио применений"
-   }}
+        Собирается один раз (схема — в компактном JSON) и не меняется между
+        запросами, поэтому провайдер может переиспользовать её кэш префикса.
+        """
+        if self._prompt_prefix is None:
+            self._prompt_prefix = self._render_prompt_prefix()
+        return self._prompt_prefix
+    
+    @property
+    def prompt_version(self) -> str:
+        """Отпечаток префикса промпта — часть ключа кэша команд.
 
-Теперь обработай запрос пользователя и верни JSON:
-"""
-        return prompt
+        Меняется вместе со схемой и словарями каталога, поэтому команды,
+        полученные по старому промпту, из кэша не берутся.
+        """
+        if self._prompt_version is None:
+            self._prompt_version = hashlib.sha1(self.prompt_prefix.encode('utf-8')).hexdigest()[:16]
+        return self._prompt_version
     
-    def ask_openrouter(self, prompt: str, api_key: Optional[str]) -> str:
-        """Отправка запроса к OpenRouter для DeepSeek Chat"""
-        # Если нет API ключа, возвращаем команду по умолчанию для поиска
-        if not api_key:
-            print("⚠️  API ключ отсутствует, использую режим поиска по умолчанию")
-            return json.dumps({
-                "command": "search_components",
-                "args": {},
-                "explanation": "Поиск компонентов в локальной базе данных"
-            })
-        
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        
+    def refresh_prompt(self):
+        """Сбрасывает собранный префикс (после изменения library_schema)"""
+        self._prompt_prefix = None
+        self._prompt_version = None
+    
+    def _render_prompt_prefix(self) -> str:
+        examples = "\n".join(
+            f'{i}. "{question}" -> {compact_json(answer)}'
+            for i, (question, answer) in enumerate(PROMPT_EXAMPLES, 1)
+        )
+        return (
+            f"{PROMPT_INSTRUCTIONS}\n"
+            f"Схема библиотеки:\n{compact_json(self.library_schema)}\n"
+            f"Примеры:\n{examples}"
+        )
+    
+    def create_prompt(self, user_question: str) -> str:
+        """Переменная часть промпта — только вопрос пользователя (префикс в prompt_prefix)"""
+        return f'Запрос пользователя: "{user_question}"\nВерни JSON.'
+    
+    def prompt_report(self, prompt: str) -> Dict:
+        """Размер промпта по частям: символы и оценка числа токенов"""
+        prefix = self.prompt_prefix
+        report = {
+            "prefix_chars": len(prefix),
+            "prefix_tokens": estimate_tokens(prefix),
+            "query_chars": len(prompt),
+            "query_tokens": estimate_tokens(prompt),
+        }
+        report["total_tokens"] = report["prefix_tokens"] + report["query_tokens"]
+        return report
+    
+    def _log_prompt(self, prompt: str):
+        report = self.prompt_report(prompt)
+        print(f"📝 Промпт: ~{report['total_tokens']} токенов "
+              f"(префикс ~{report['prefix_tokens']} кэшируемых + запрос ~{report['query_tokens']})")
+    
+    def _log_usage(self, result: Dict):
+        """Фактический расход токенов по ответу OpenRouter (включая попадания в кэш провайдера)"""
+        usage = result.get("usage") or {}
+        if not usage:
+            return
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        print(f"📊 Токены: промпт {usage.get('prompt_tokens')} (из кэша {cached}), "
+              f"ответ {usage.get('completion_tokens')}")
+    
+    def _openrouter_request(self, prompt: str, api_key: str):
+        """Заголовки и тело запроса к OpenRouter"""
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -207,26 +271,40 @@ class ComponentLibraryBrain:
             "X-Title": self.app_name
         }
         
+        # Неизменный префикс идёт первым сообщением, вопрос — последним:
+        # так совпадающее начало запроса может обслуживаться из кэша провайдера
         data = {
             "model": self.model,
             "messages": [
-                {
-                    "role": "system", 
-                    "content": "Ты возвращаешь только валидный JSON без пояснений. ВСЕГДА используй формат: {\"command\": \"...\", \"args\": {...}, \"explanation\": \"...\"}"
-                },
+                {"role": "system", "content": self.prompt_prefix},
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.1,
             "max_tokens": 1000
         }
+        return headers, data
+    
+    def ask_openrouter(self, prompt: str, api_key: Optional[str]) -> str:
+        """Отправка запроса к OpenRouter для DeepSeek Chat"""
+        # Если нет API ключа, возвращаем команду по умолчанию для поиска
+        if not api_key:
+            print("⚠️  API ключ отсутствует, использую режим поиска по умолчанию")
+            return json.dumps({
+                "command": "search_components",
+                "args": {},
+                "explanation": "Поиск компонентов в локальной базе данных"
+            })
+        
+        headers, data = self._openrouter_request(prompt, api_key)
         
         try:
             print(f"🤖 Запрос к {self.model}...")
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = requests.post(OPENROUTER_URL, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             
             result = response.json()
             content = result["choices"][0]["message"]["content"].strip()
+            self._log_usage(result)
             
             print(f"✅ Получен ответ: {content[:100]}...")
             return content
@@ -236,7 +314,55 @@ class ComponentLibraryBrain:
             return json.dumps({
                 "command": "search_components", 
                 "args": {}, 
-                "explanation": f"Ошибка ИИ, выполнен поиск по умолчанию"
+                "explanation": f"Ошибка ИИ, выполнен поиск по умолчанию",
+                FALLBACK_KEY: True
+            })
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Общий асинхронный клиент: соединения к OpenRouter переиспользуются между запросами"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = create_pooled_client()
+            self._owns_async_client = True
+        return self._async_client
+    
+    def attach_async_client(self, client: httpx.AsyncClient):
+        """Использовать пул соединений приложения (им управляет приложение)"""
+        self._async_client = client
+        self._owns_async_client = False
+    
+    async def aclose(self):
+        """Закрывает собственный асинхронный клиент (при остановке приложения)"""
+        if self._async_client is not None and self._owns_async_client:
+            await self._async_client.aclose()
+        self._async_client = None
+    
+    async def ask_openrouter_async(self, prompt: str, api_key: Optional[str]) -> str:
+        """Асинхронная версия ask_openrouter на общем пуле соединений"""
+        if not api_key:
+            return self.ask_openrouter(prompt, api_key)
+        
+        headers, data = self._openrouter_request(prompt, api_key)
+        
+        try:
+            print(f"🤖 Запрос к {self.model} (async)...")
+            response = await self.async_client.post(OPENROUTER_URL, headers=headers, json=data)
+            response.raise_for_status()
+            
+            result = response.json()
+            content = result["choices"][0]["message"]["content"].strip()
+            self._log_usage(result)
+            
+            print(f"✅ Получен ответ: {content[:100]}...")
+            return content
+            
+        except Exception as e:
+            print(f"❌ Ошибка OpenRouter: {e}")
+            return json.dumps({
+                "command": "search_components", 
+                "args": {}, 
+                "explanation": f"Ошибка ИИ, выполнен поиск по умолчанию",
+                FALLBACK_KEY: True
             })
     
     def parse_command(self, json_response: str) -> Dict:
@@ -283,18 +409,20 @@ class ComponentLibraryBrain:
             return {
                 "command": "search_components",
                 "args": {},
-                "explanation": "Поиск компонентов по запросу пользователя"
+                "explanation": "Поиск компонентов по запросу пользователя",
+                FALLBACK_KEY: True
             }
         except Exception as e:
             print(f"❌ Ошибка обработки ответа ИИ: {e}")
             return {
                 "command": "search_components",
                 "args": {},
-                "explanation": "Поиск компонентов"
+                "explanation": "Поиск компонентов",
+                FALLBACK_KEY: True
             }
     
     def execute_command(self, command_data: Dict) -> Dict:
-        """Выполнение команды на сервере с улучшенной обработкой ошибок"""
+        """Выполнение команды через подключённый исполнитель"""
         # Защита от None
         if not command_data:
             command_data = {
@@ -303,121 +431,8 @@ class ComponentLibraryBrain:
                 "explanation": "Поиск компонентов"
             }
         
-        command = command_data.get("command", "search_components")
-        args = command_data.get("args", {})
-        
         try:
-            print(f"\n🔧 Выполняю команду: {command}")
-            print(f"📝 Аргументы: {args}")
-            
-            if command == "search_components":
-                params = {k: v for k, v in args.items() if v is not None and v != ""}
-                
-                # 🔧 ПРЕОБРАЗОВАНИЕ ТИПОВ ДЛЯ API
-                for key in ['min_power', 'max_power', 'min_voltage', 'max_voltage', 'min_current', 'max_current']:
-                    if key in params:
-                        try:
-                            params[key] = float(params[key])
-                        except (ValueError, TypeError):
-                            # Если не удалось преобразовать, удаляем параметр
-                            params.pop(key, None)
-                
-                # 🔧 ИСПРАВЛЕНИЕ: Используем /api/components/search/extended для расширенного поиска
-                # Но также можно использовать /api/components для базового поиска.
-                # Проверим, есть ли расширенные параметры (мощность, напряжение, ток, application).
-                # Если есть хотя бы один из них, используем extended endpoint.
-                extended_params = ['min_power', 'max_power', 'min_voltage', 'max_voltage', 
-                                   'min_current', 'max_current', 'application', 'frequency_range']
-                
-                if any(param in params for param in extended_params):
-                    url = f"{self.base_url}/api/components/search/extended"
-                else:
-                    url = f"{self.base_url}/api/components"
-                
-                print(f"🌐 Запрос к: {url}")
-                print(f"📊 Параметры: {params}")
-                
-                response = requests.get(url, params=params, timeout=15)
-                print(f"📡 Код ответа: {response.status_code}")
-                print(f"📄 Заголовки ответа: {response.headers.get('content-type', 'unknown')}")
-                
-                if response.status_code == 200:
-                    # Проверяем, что ответ JSON
-                    content_type = response.headers.get('content-type', '')
-                    if 'application/json' in content_type:
-                        result = response.json()
-                        print(f"✅ Получено {result.get('count', 0)} компонентов")
-                        return result
-                    else:
-                        print(f"⚠️  Ответ не JSON: {response.text[:200]}")
-                        # Попробуем распарсить как JSON, даже если заголовок неправильный
-                        try:
-                            result = response.json()
-                            print(f"✅ Получено {result.get('count', 0)} компонентов (парсинг несмотря на заголовок)")
-                            return result
-                        except:
-                            # Если не удалось распарсить, возвращаем ошибку
-                            return {
-                                "success": False,
-                                "error": "Сервер вернул не JSON данные",
-                                "details": f"Content-Type: {content_type}, первые 200 символов: {response.text[:200]}"
-                            }
-                else:
-                    print(f"❌ Ошибка API: {response.status_code}")
-                    print(f"Текст ошибки: {response.text[:200]}")
-                    return {
-                        "success": False,
-                        "error": f"Ошибка API: {response.status_code}",
-                        "details": response.text[:200]
-                    }
-            
-            elif command in ["get_component_details", "get_characteristics"]:
-                component_id = args.get("component_id")
-                if not component_id:
-                    return {
-                        "success": False,
-                        "error": "Не указан ID компонента"
-                    }
-                
-                if command == "get_component_details":
-                    url = f"{self.base_url}/api/components/{component_id}"
-                else:
-                    url = f"{self.base_url}/api/components/{component_id}/characteristics"
-                
-                print(f"🌐 Запрос к: {url}")
-                
-                response = requests.get(url, timeout=15)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Для характеристики добавляем ID компонента
-                    if command == "get_characteristics":
-                        result = {
-                            "component_id": component_id,
-                            "characteristics": result.get("characteristics", [])
-                        }
-                    
-                    return result
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Ошибка {response.status_code}",
-                        "details": response.text[:200]
-                    }
-            
-            return {
-                "success": False,
-                "error": f"Неизвестная команда: {command}"
-            }
-            
-        except requests.exceptions.ConnectionError as e:
-            print(f"❌ Ошибка подключения: {e}")
-            return {
-                "success": False,
-                "error": f"Сервер недоступен: {self.base_url}",
-                "details": str(e)
-            }
+            return self.executor.execute(command_data)
         except Exception as e:
             print(f"❌ Ошибка выполнения: {e}")
             import traceback
@@ -428,6 +443,67 @@ class ComponentLibraryBrain:
                 "details": traceback.format_exc()
             }
     
+    async def execute_command_async(self, command_data: Dict) -> Dict:
+        """Асинхронное выполнение команды.
+
+        Блокирующий исполнитель (HTTP или поиск по каталогу в памяти) вызывается
+        в отдельном потоке, чтобы не задерживать event loop; неблокирующий — напрямую.
+        """
+        if getattr(self.executor, "blocking", True):
+            return await asyncio.to_thread(self.execute_command, command_data)
+        return self.execute_command(command_data)
+    
+    def _local_command(self, user_question: str) -> Dict:
+        """Команда из простого парсера (режим без ключа)"""
+        print("🔧 Использую SimpleQueryParser для локального поиска")
+        command_data = SimpleQueryParser.parse_query(user_question)
+        print(f"📋 Команда (локальная): {command_data.get('command')}")
+        print(f"💡 Объяснение: {command_data.get('explanation')}")
+        return command_data
+    
+    def _cached_command(self, user_question: str) -> Optional[Dict]:
+        """Команда из кэша — без запроса к ИИ"""
+        command_data = self.intent_cache.get(user_question, self.model, self.prompt_version)
+        if command_data is not None:
+            print(f"⚡ Команда из кэша: {command_data.get('command')}")
+        return command_data
+    
+    def _remember_command(self, user_question: str, command_data: Dict):
+        """Кэширует команду, полученную от ИИ (команды по умолчанию при ошибках — нет)"""
+        if command_data.pop(FALLBACK_KEY, False):
+            return
+        self.intent_cache.put(user_question, self.model, command_data, self.prompt_version)
+    
+    def _build_response(self, command_data: Dict, result: Dict, user_api_key: Optional[str]) -> Dict:
+        """Формирует финальный ответ process_query"""
+        print(f"✅ Результат получен")
+        
+        response = {
+            "success": True,
+            "command": command_data,
+            "result": result,
+            "mode": "openrouter" if user_api_key else "local_parser"
+        }
+        
+        # Если результат содержит ошибку, помечаем как неуспешный
+        if isinstance(result, dict) and result.get("success") is False:
+            response["success"] = False
+            response["error"] = result.get("error", "Неизвестная ошибка")
+        
+        return response
+    
+    def _error_response(self, e: Exception, where: str) -> Dict:
+        print(f"❌ Критическая ошибка в {where}: {e}")
+        import traceback
+        traceback.print_exc()
+        
+        return {
+            "success": False,
+            "error": f"Внутренняя ошибка: {str(e)}",
+            "details": traceback.format_exc(),
+            "mode": "error"
+        }
+    
     def process_query(self, user_question: str, user_api_key: Optional[str] = None) -> Dict:
         """Основной метод обработки запроса пользователя"""
         try:
@@ -436,14 +512,14 @@ class ComponentLibraryBrain:
             
             # Если ключ не предоставлен, используем простой парсер
             if not user_api_key:
-                print("🔧 Использую SimpleQueryParser для локального поиска")
-                command_data = SimpleQueryParser.parse_query(user_question)
-                print(f"📋 Команда (локальная): {command_data.get('command')}")
-                print(f"💡 Объяснение: {command_data.get('explanation')}")
+                command_data = self._local_command(user_question)
             else:
+                command_data = self._cached_command(user_question)
+            
+            if command_data is None:
                 # Создаем промпт для ИИ
                 prompt = self.create_prompt(user_question)
-                print(f"📝 Промпт создан ({len(prompt)} символов)")
+                self._log_prompt(prompt)
                 
                 # Запрашиваем ответ у ИИ
                 json_response = self.ask_openrouter(prompt, user_api_key)
@@ -453,37 +529,44 @@ class ComponentLibraryBrain:
                 command_data = self.parse_command(json_response)
                 print(f"📋 Команда: {command_data.get('command')}")
                 print(f"💡 Объяснение: {command_data.get('explanation')}")
+                self._remember_command(user_question, command_data)
             
             # Выполняем команду
             result = self.execute_command(command_data)
-            print(f"✅ Результат получен")
+            return self._build_response(command_data, result, user_api_key)
             
-            # Формируем финальный ответ
-            response = {
-                "success": True,
-                "command": command_data,
-                "result": result,
-                "mode": "openrouter" if user_api_key else "local_parser"
-            }
+        except Exception as e:
+            return self._error_response(e, "process_query")
+    
+    async def process_query_async(self, user_question: str, user_api_key: Optional[str] = None) -> Dict:
+        """Асинхронная версия process_query: параллельные запросы стоят корутин, а не потоков"""
+        try:
+            print(f"\n🎯 Обрабатываю запрос (async): '{user_question}'")
+            print(f"🔑 Ключ предоставлен: {'Да' if user_api_key else 'Нет'}")
             
-            # Если результат содержит ошибку, помечаем как неуспешный
-            if isinstance(result, dict) and result.get("success") is False:
-                response["success"] = False
-                response["error"] = result.get("error", "Неизвестная ошибка")
+            if not user_api_key:
+                command_data = self._local_command(user_question)
+            else:
+                # SQLite-кэш синхронный — читаем и пишем его вне цикла событий
+                command_data = await asyncio.to_thread(self._cached_command, user_question)
             
-            return response
+            if command_data is None:
+                prompt = self.create_prompt(user_question)
+                self._log_prompt(prompt)
+                
+                json_response = await self.ask_openrouter_async(prompt, user_api_key)
+                print(f"🤖 Ответ ИИ получен")
+                
+                command_data = self.parse_command(json_response)
+                print(f"📋 Команда: {command_data.get('command')}")
+                print(f"💡 Объяснение: {command_data.get('explanation')}")
+                await asyncio.to_thread(self._remember_command, user_question, command_data)
             
-        except Exception as e:
-            print(f"❌ Критическая ошибка в process_query: {e}")
-            import traceback
-            traceback.print_exc()
+            result = await self.execute_command_async(command_data)
+            return self._build_response(command_data, result, user_api_key)
             
-            return {
-                "success": False,
-                "error": f"Внутренняя ошибка: {str(e)}",
-                "details": traceback.format_exc(),
-                "mode": "error"
-            }
+        except Exception as e:
+            return self._error_response(e, "process_query_async")
 
 # 🔧 АВТОТЕСТ ПРИ ЗАПУСКЕ
 if __name__ == "__main__":
@@ -0,0 +1,665 @@
+"""
+Скомпилированный каталог компонентов с индексами для быстрого поиска
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Iterable, Tuple, Callable, Union
+
+import numpy as np
+
+from catalog_stats import CatalogStats
+from columns import ColumnStore
+from filter_expression import And, FilterNode, Not, Term, parse_filter
+from normalization import normalize_components, type_family
+from similarity import SimilarityIndex
+from substitutes import SubstituteIndex
+from text_index import TextIndex, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Семейства тегов, по которым строятся инвертированные индексы
+TAG_FAMILIES = ['application_tags', 'technology_tags', 'role_tags']
+# Списочные поля без инвертированного индекса: хранятся только CSR-кодами
+# колоночного хранилища (поиск и частоты — без обхода записей)
+LIST_FAMILIES = ['analogues', 'substitutes', 'manufacturer']
+
+
+# ==================== НОРМАЛИЗОВАННЫЕ ПАРАМЕТРЫ ====================
+
+def get_power_value(component):
+    """Получает нормализованное значение мощности (Вт)"""
+    return component.get('params', {}).get('Ptot', 0)
+
+def get_voltage_value(component):
+    """Получает нормализованное значение напряжения (В)"""
+    return component.get('params', {}).get('Uce_max', 0)
+
+def get_current_value(component):
+    """Получает нормализованное значение тока (А)"""
+    return component.get('params', {}).get('Imax', 0)
+
+def get_gain_value(component):
+    """Получает нормализованное значение усиления (h21э или μ)"""
+    return component.get('params', {}).get('gain', 0)
+
+def get_transconductance_value(component):
+    """Получает нормализованное значение крутизны (мА/В)"""
+    return component.get('params', {}).get('gm', 0)
+
+def get_frequency_value(component):
+    """Получает нормализованное значение граничной частоты (МГц)"""
+    return component.get('params', {}).get('ft', 0)
+
+# Числовые колонки каталога: имя -> функция извлечения значения
+NUMERIC_COLUMNS = {
+    'power': get_power_value,
+    'voltage': get_voltage_value,
+    'current': get_current_value,
+    'gain': get_gain_value,
+    'transconductance': get_transconductance_value,
+    'frequency': get_frequency_value,
+}
+
+# Канонические параметры (поля API) -> колонки каталога
+SORT_COLUMNS = {
+    'Ptot': 'power',
+    'Imax': 'current',
+    'Uce': 'voltage',
+    'Uce_max': 'voltage',
+    'gain': 'gain',
+    'gm': 'transconductance',
+    'ft': 'frequency',
+}
+
+
+def _norm(value) -> str:
+    """Нормализует значение ключа индекса (регистр не учитывается)"""
+    return str(value).strip().lower()
+
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def _union(postings: List[np.ndarray]) -> np.ndarray:
+    """Объединение отсортированных списков ordinal"""
+    if not postings:
+        return _EMPTY
+    return np.unique(np.concatenate(postings)) if len(postings) > 1 else postings[0]
+
+
+def _membership(postings: np.ndarray, ordinals: np.ndarray) -> np.ndarray:
+    """Маска вхождения ordinals в отсортированный список postings (бинарный поиск)"""
+    if len(postings) == 0:
+        return np.zeros(len(ordinals), dtype=bool)
+    positions = np.searchsorted(postings, ordinals)
+    positions[positions == len(postings)] = len(postings) - 1
+    return postings[positions] == ordinals
+
+
+class ComponentCatalog:
+    """Каталог компонентов: первичный индекс по id и инвертированные индексы по атрибутам.
+
+    Индексы хранят отсортированные массивы порядковых номеров компонентов (ordinal)
+    в списке ``components``, поэтому результаты всегда возвращаются в порядке каталога.
+    """
+
+    def __init__(self, components: List[Dict], normalized: bool = False):
+        # Канонические параметры вычисляются один раз при загрузке каталога
+        # (normalized=True — записи уже прошли normalize_components)
+        self.components = components if normalized else normalize_components(components)
+        self.by_id: Dict[str, int] = {}
+        self.by_type: Dict[str, np.ndarray] = defaultdict(list)
+        self.by_origin: Dict[str, np.ndarray] = defaultdict(list)
+        # Семейство тегов -> тег -> список ordinal
+        # Для classification ключ семейства имеет вид "classification.<поле>"
+        self.by_tag: Dict[str, Dict[str, np.ndarray]] = defaultdict(lambda: defaultdict(list))
+        # Исходное написание нормализованных значений (для отображения в фильтрах)
+        self.labels: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # Объединённые списки семейств типов ('bjt' -> bjt_npn + bjt_pnp)
+        self._family_postings: Dict[str, np.ndarray] = {}
+        # Индекс похожести строится при первом обращении
+        self._similarity: Optional[SimilarityIndex] = None
+        self._substitutes: Optional[SubstituteIndex] = None
+        self._stats: Optional[CatalogStats] = None
+        self._build_indexes()
+        self.columns = ColumnStore(components, NUMERIC_COLUMNS, TAG_FAMILIES + LIST_FAMILIES)
+        self.text = TextIndex(components)
+
+    @classmethod
+    def from_parts(cls, components, by_id, by_type: Dict[str, np.ndarray],
+                   by_origin: Dict[str, np.ndarray], by_tag: Dict[str, Dict[str, np.ndarray]],
+                   labels: Dict[str, Dict[str, str]], columns: ColumnStore,
+                   text: TextIndex) -> 'ComponentCatalog':
+        """Каталог из готовых индексов (снимок каталога) — без прохода по компонентам.
+
+        components — любая последовательность записей, by_id — отображение ID -> ordinal.
+        """
+        catalog = cls.__new__(cls)
+        catalog.components = components
+        catalog.by_id = by_id
+        catalog.by_type = by_type
+        catalog.by_origin = by_origin
+        catalog.by_tag = by_tag
+        catalog.labels = labels
+        catalog._family_postings = {}
+        catalog._similarity = None
+        catalog._substitutes = None
+        catalog._stats = None
+        catalog.columns = columns
+        catalog.text = text
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.components)
+
+    def __iter__(self):
+        return iter(self.components)
+
+    # ==================== ПОСТРОЕНИЕ ИНДЕКСОВ ====================
+
+    def _build_indexes(self):
+        """Строит все индексы за один проход по каталогу"""
+        for ordinal, component in enumerate(self.components):
+            component_id = component.get('id')
+            if component_id is not None:
+                if component_id in self.by_id:
+                    logger.warning(f"⚠️ Дублирующийся ID компонента: {component_id}")
+                else:
+                    self.by_id[component_id] = ordinal
+
+            if component.get('type'):
+                self.by_type[component['type']].append(ordinal)
+            if component.get('origin'):
+                origin = _norm(component['origin'])
+                self.by_origin[origin].append(ordinal)
+                self.labels['origin'].setdefault(origin, component['origin'])
+
+            for family in TAG_FAMILIES:
+                self._index_tags(family, component.get(family, []), ordinal)
+            for family in LIST_FAMILIES:
+                for value in component.get(family) or []:
+                    self.labels[family].setdefault(_norm(value), value)
+
+            for key, values in (component.get('classification') or {}).items():
+                if not isinstance(values, list):
+                    values = [values]
+                self._index_tags(f"classification.{key}", values, ordinal)
+
+        # Замораживаем списки в компактные массивы для бинарного поиска
+        for index in [self.by_type, self.by_origin, *self.by_tag.values()]:
+            for key, postings in index.items():
+                index[key] = np.asarray(postings, dtype=np.int64)
+
+        logger.info(f"📇 Индексы каталога построены: {len(self.by_id)} ID, "
+                    f"{len(self.by_type)} типов, {len(self.by_origin)} происхождений, "
+                    f"{len(self.by_tag)} семейств тегов")
+
+    def _index_tags(self, family: str, tags: List, ordinal: int):
+        """Добавляет теги компонента в индекс семейства"""
+        seen = set()
+        for tag in tags:
+            key = _norm(tag)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.by_tag[family][key].append(ordinal)
+            self.labels[family].setdefault(key, tag)
+
+    # ==================== ПОИСК ====================
+
+    def get(self, component_id: str) -> Optional[Dict]:
+        """Получает компонент по ID за O(1)"""
+        ordinal = self.by_id.get(component_id)
+        return self.components[ordinal] if ordinal is not None else None
+
+    def type_postings(self, type: str) -> np.ndarray:
+        """Компоненты указанного типа.
+
+        Если точного типа нет, значение трактуется как семейство:
+        'bjt' -> bjt_npn + bjt_pnp, 'vacuum_tube' -> все лампы.
+        """
+        if type in self.by_type:
+            return self.by_type[type]
+        if type in self._family_postings:
+            return self._family_postings[type]
+        family = [postings for name, postings in self.by_type.items() if name.startswith(f"{type}_")]
+        if not family:
+            postings = _EMPTY
+        else:
+            postings = np.sort(np.concatenate(family)) if len(family) > 1 else family[0]
+        # Каталог неизменяем — объединение семейства считается один раз
+        self._family_postings[type] = postings
+        return postings
+
+    def tag_postings(self, family: str, tag: str) -> np.ndarray:
+        """Отсортированный массив ordinal компонентов с указанным тегом"""
+        if family in self.by_tag:
+            return self.by_tag[family].get(_norm(tag), _EMPTY)
+        # Списочное поле без индекса (analogues, substitutes, manufacturer) — по CSR колоночного хранилища
+        if family in self.columns.tag_codes:
+            return self.columns.tag_ordinals(family, tag)
+        return _EMPTY
+
+    def lookup(
+        self,
+        type: Optional[str] = None,
+        origin: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None
+    ) -> np.ndarray:
+        """Пересечение индексов по фильтрам на равенство.
+
+        Начинает с самого короткого списка, поэтому стоимость — O(совпадений),
+        а не O(размер каталога). Без фильтров возвращает весь каталог.
+        """
+        postings = self._equality_postings(type, origin, tags)
+        if not postings:
+            return np.arange(len(self.components), dtype=np.int64)
+
+        postings.sort(key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result):
+                break
+            result = result[_membership(other, result)]
+        return result
+
+    def _equality_postings(self, type, origin, tags) -> List[np.ndarray]:
+        postings = []
+        if type:
+            postings.append(self.type_postings(type))
+        if origin:
+            postings.append(self.by_origin.get(_norm(origin), _EMPTY))
+        for family, tag in (tags or {}).items():
+            if tag:
+                postings.append(self.tag_postings(family, tag))
+        return postings
+
+    # ==================== ВЫРАЖЕНИЯ ФИЛЬТРОВ ====================
+
+    def expression_postings(self, expression: Union[str, FilterNode]) -> Tuple[np.ndarray, bool]:
+        """Вычисляет выражение AND/OR/NOT над индексами каталога.
+
+        Возвращает (ordinals, complemented): при complemented=True результат —
+        все компоненты, кроме ordinals. Дополнение хранится символически
+        (законы де Моргана), поэтому NOT не разворачивается во весь каталог,
+        и стоимость определяется длинами участвующих списков, а не размером каталога.
+        """
+        node = parse_filter(expression) if isinstance(expression, str) else expression
+
+        if isinstance(node, Term):
+            if node.field == 'type':
+                return self.type_postings(node.value), False
+            if node.field == 'origin':
+                return self.by_origin.get(_norm(node.value), _EMPTY), False
+            return self.tag_postings(node.field, node.value), False
+
+        if isinstance(node, Not):
+            postings, complemented = self.expression_postings(node.child)
+            return postings, not complemented
+
+        parts = [self.expression_postings(child) for child in node.children]
+        plain = sorted((postings for postings, complemented in parts if not complemented), key=len)
+        negated = [postings for postings, complemented in parts if complemented]
+
+        if isinstance(node, And):
+            if not plain:
+                # NOT a AND NOT b = NOT (a OR b)
+                return _union(negated), True
+            # Начинаем с самого короткого списка, остальные проверяются бинарным поиском
+            result = plain[0]
+            for postings in plain[1:]:
+                result = result[_membership(postings, result)]
+            for postings in negated:
+                result = result[~_membership(postings, result)]
+            return result, False
+
+        # Or
+        if not negated:
+            return _union(plain), False
+        # a OR NOT b = NOT (b AND NOT a)
+        excluded = sorted(negated, key=len)[0]
+        for postings in negated[1:]:
+            excluded = excluded[_membership(postings, excluded)]
+        for postings in plain:
+            excluded = excluded[~_membership(postings, excluded)]
+        return excluded, True
+
+    def records(self, ordinals: Iterable[int]) -> List[Dict]:
+        """Преобразует ordinal в записи компонентов"""
+        if isinstance(ordinals, np.ndarray):
+            ordinals = ordinals.tolist()
+        return [self.components[ordinal] for ordinal in ordinals]
+
+    def filter(
+        self,
+        type: Optional[str] = None,
+        origin: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None
+    ) -> List[Dict]:
+        """Компоненты, удовлетворяющие фильтрам на равенство, в порядке каталога"""
+        return self.records(self.lookup(type=type, origin=origin, tags=tags))
+
+    def values(self, attribute: str) -> List[str]:
+        """Уникальные значения индексированного атрибута (type, origin или семейства тегов)"""
+        if attribute == 'type':
+            return sorted(self.by_type)
+        return sorted(self.labels.get(attribute, {}).values())
+
+    def similarity(self) -> SimilarityIndex:
+        """Индекс похожести по типу, происхождению и тегам (строится один раз)"""
+        if self._similarity is None:
+            self._similarity = SimilarityIndex(self.columns, TAG_FAMILIES)
+        return self._similarity
+
+    def similar(self, component_id: str, limit: int = 5) -> List[Tuple[Dict, float]]:
+        """Самые похожие компоненты с оценками, по убыванию оценки"""
+        ordinal = self.by_id.get(component_id)
+        if ordinal is None:
+            return []
+        ordinals, scores = self.similarity().top_k(ordinal, limit)
+        return list(zip(self.records(ordinals), scores.tolist()))
+
+    def substitutes(self) -> SubstituteIndex:
+        """Индекс замен по электрическим номиналам (деревья строятся по требованию)"""
+        if self._substitutes is None:
+            self._substitutes = SubstituteIndex(self)
+        return self._substitutes
+
+    def stats(self) -> CatalogStats:
+        """Агрегированная статистика (считается один раз)"""
+        if self._stats is None:
+            self._stats = CatalogStats.build(self, TAG_FAMILIES)
+        return self._stats
+
+    def inherit_stats(self, previous: 'ComponentCatalog', diff: Dict[str, List[str]]):
+        """Статистика по разнице с предыдущей версией каталога вместо полного пересчёта"""
+        self._stats = previous.stats().updated(self, diff)
+
+    def vocabulary(self, max_tags: int = 30) -> Dict:
+        """Словарь значений каталога для схемы ИИ: типы, происхождения и теги
+        с частотами, диапазоны числовых параметров.
+
+        Считается по готовым индексам (длины списков), без прохода по компонентам.
+        """
+        def counts(index: Dict[str, np.ndarray], labels: Dict[str, str] = None, limit: int = None) -> Dict[str, int]:
+            ranked = sorted(index.items(), key=lambda item: (-len(item[1]), item[0]))[:limit]
+            return {(labels or {}).get(key, key): len(postings) for key, postings in ranked}
+
+        families: Dict[str, int] = defaultdict(int)
+        for name, postings in self.by_type.items():
+            family = type_family(name)
+            families[name if family == '*' else family] += len(postings)
+
+        ranges = {}
+        for column, values in self.columns.numeric.items():
+            known = values[values > 0]
+            if len(known):
+                ranges[column] = {"min": float(known.min()), "max": float(known.max())}
+
+        return {
+            "component_types": dict(sorted(families.items(), key=lambda item: (-item[1], item[0]))),
+            "component_types_extended": counts(self.by_type),
+            "origin_types": counts(self.by_origin),
+            "tag_types": {
+                family: counts(index, limit=max_tags)
+                for family, index in sorted(self.by_tag.items())
+            },
+            "parameter_ranges": ranges,
+        }
+
+    # ==================== ФАСЕТЫ ====================
+
+    def facets(self, ordinals: np.ndarray, max_tags: int = 15) -> Dict:
+        """Счётчики по типу, происхождению и тегам для результата поиска.
+
+        Считаются по кодам колоночного хранилища только для строк результата,
+        без повторного прохода по каталогу. Ключи — значения фильтров
+        (type — семейство: bjt, vacuum_tube...; теги — в исходном написании).
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        columns = self.columns
+
+        def ranked(counts: np.ndarray, keys: List[str], limit: Optional[int] = None) -> Dict[str, int]:
+            present = np.flatnonzero(counts)
+            order = sorted(present.tolist(), key=lambda code: (-counts[code], keys[code]))
+            return {keys[code]: int(counts[code]) for code in order[:limit]}
+
+        def vocab_keys(name: str) -> List[str]:
+            keys = [''] * len(columns.vocab[name])
+            for key, code in columns.vocab[name].items():
+                keys[code] = key
+            return keys
+
+        type_counts = ranked(columns.code_counts('type', ordinals), vocab_keys('type'))
+        families: Dict[str, int] = defaultdict(int)
+        for name, count in type_counts.items():
+            family = type_family(name)
+            families[name if family == '*' else family] += count
+
+        tags = {}
+        for family in TAG_FAMILIES:
+            labels = self.labels.get(family, {})
+            keys = [labels.get(key, key) for key in vocab_keys(family)]
+            tags[family] = ranked(columns.tag_code_counts(family, ordinals), keys, max_tags)
+
+        return {
+            "total": len(ordinals),
+            "type": dict(sorted(families.items(), key=lambda item: (-item[1], item[0]))),
+            "type_extended": type_counts,
+            "origin": ranked(columns.code_counts('origin', ordinals), vocab_keys('origin')),
+            "tags": tags,
+        }
+
+    def disjunctive_facets(self, ordinals: np.ndarray, query: Dict, max_tags: int = 15) -> Dict:
+        """Фасеты, где счётчики каждого измерения посчитаны без его собственного фильтра.
+
+        ordinals — результат search_ordinals(**query). При выбранном type=bjt
+        счётчики типов показывают, сколько нашлось бы mosfet, ламп и т.д. при
+        остальных фильтрах; для этого выборка пересчитывается только по тем
+        измерениям, фильтр которых задан.
+        """
+        result = self.facets(ordinals, max_tags)
+
+        def relaxed(**changes) -> Dict:
+            return self.facets(self.search_ordinals(**{**query, **changes}), max_tags)
+
+        if query.get('type'):
+            without_type = relaxed(type=None)
+            result['type'], result['type_extended'] = without_type['type'], without_type['type_extended']
+        if query.get('origin'):
+            result['origin'] = relaxed(origin=None)['origin']
+        tags = query.get('tags') or {}
+        for family, tag in tags.items():
+            if tag and family in result['tags']:
+                result['tags'][family] = relaxed(tags={**tags, family: None})['tags'][family]
+        return result
+
+    # ==================== ВЕКТОРИЗОВАННЫЙ ПОИСК ====================
+
+    def match_mask(
+        self,
+        type: Optional[str] = None,
+        origin: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None
+    ) -> np.ndarray:
+        """Булева маска компонентов, удовлетворяющих всем фильтрам.
+
+        ranges: колонка ('power', 'voltage', 'current') -> (min, max), None — без границы.
+        """
+        columns = self.columns
+        mask = np.ones(len(self.components), dtype=bool)
+        if type:
+            type_mask = np.zeros(len(self.components), dtype=bool)
+            type_mask[self.type_postings(type)] = True
+            mask &= type_mask
+        if origin:
+            mask &= columns.equals_mask('origin', origin)
+        for family, tag in (tags or {}).items():
+            if not tag:
+                continue
+            if family in columns.tag_codes:
+                mask &= columns.tag_mask(family, tag)
+            else:
+                tag_mask = np.zeros(len(self.components), dtype=bool)
+                tag_mask[self.tag_postings(family, tag)] = True
+                mask &= tag_mask
+        for column, (min_value, max_value) in (ranges or {}).items():
+            columns.range_mask(column, min_value, max_value, mask=mask)
+        return mask
+
+    def search(
+        self,
+        type: Optional[str] = None,
+        origin: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        where: Optional[Union[str, FilterNode]] = None
+    ) -> List[Dict]:
+        """Поиск по фильтрам на равенство, диапазонам параметров, тексту
+        и выражению фильтра where (type:bjt AND NOT origin:usa...).
+
+        Порядок стабилен (order_by, иначе релевантность для текстового запроса,
+        иначе порядок каталога; ordinal — вторичный ключ), поэтому пара
+        offset/limit даёт детерминированную пагинацию.
+        """
+        return self.records(self.search_ordinals(
+            type=type, origin=origin, tags=tags, ranges=ranges, text=text,
+            limit=limit, offset=offset, order_by=order_by, descending=descending, where=where
+        ))
+
+    def search_ordinals(
+        self,
+        type: Optional[str] = None,
+        origin: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        text: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        where: Optional[Union[str, FilterNode]] = None
+    ) -> np.ndarray:
+        """Планировщик запроса: ведущим выбирается самый селективный индекс.
+
+        Размер каждого источника оценивается без сканирования (длина списка или
+        бинарный поиск в отсортированном индексе), остальные фильтры проверяются
+        только на кандидатах ведущего индекса, и работа прекращается,
+        как только набрано offset + limit результатов.
+        """
+        columns = self.columns
+        # (оценка размера, получение кандидатов, проверка кандидатов)
+        sources: List[Tuple[int, Callable[[], np.ndarray], Callable[[np.ndarray], np.ndarray]]] = []
+
+        for postings in self._equality_postings(type, origin, tags):
+            sources.append((
+                len(postings),
+                lambda p=postings: p,
+                lambda ordinals, p=postings: _membership(p, ordinals)
+            ))
+
+        for column, (min_value, max_value) in (ranges or {}).items():
+            if min_value is None and max_value is None:
+                continue
+            sources.append((
+                columns.range_count(column, min_value, max_value),
+                lambda c=column, lo=min_value, hi=max_value: columns.range_ordinals(c, lo, hi),
+                lambda ordinals, c=column, lo=min_value, hi=max_value: self._range_check(c, lo, hi, ordinals)
+            ))
+
+        if where:
+            # Выражение — ещё один источник; дополнение (NOT) проверяется без разворачивания
+            postings, complemented = self.expression_postings(where)
+            if complemented:
+                sources.append((
+                    len(self.components) - len(postings),
+                    lambda p=postings: np.setdiff1d(np.arange(len(self.components), dtype=np.int64), p,
+                                                    assume_unique=True),
+                    lambda ordinals, p=postings: ~_membership(p, ordinals)
+                ))
+            else:
+                sources.append((
+                    len(postings),
+                    lambda p=postings: p,
+                    lambda ordinals, p=postings: _membership(p, ordinals)
+                ))
+
+        text_ordinals = text_scores = None
+        if text and tokenize(text):
+            text_ordinals, text_scores = self.text.match(text)
+            sources.append((
+                len(text_ordinals),
+                lambda: text_ordinals,
+                lambda ordinals: _membership(text_ordinals, ordinals)
+            ))
+
+        if sources:
+            sources.sort(key=lambda source: source[0])
+            candidates = sources[0][1]()
+            checks = [source[2] for source in sources[1:]]
+        else:
+            # Без фильтров в порядке каталога нужна только запрошенная страница
+            size = len(self.components)
+            if limit and not order_by:
+                size = min(size, max(offset or 0, 0) + limit)
+            candidates = np.arange(size, dtype=np.int64)
+            checks = []
+
+        if order_by:
+            values = columns.numeric[order_by][candidates]
+            candidates = candidates[np.lexsort((candidates, -values if descending else values))]
+        elif text_scores is not None and len(text_ordinals):
+            # Кандидаты вне текстовой выборки всё равно отсеются проверкой ниже
+            positions = np.minimum(np.searchsorted(text_ordinals, candidates), len(text_ordinals) - 1)
+            candidates = candidates[np.lexsort((candidates, -text_scores[positions]))]
+
+        offset = max(offset or 0, 0)
+        needed = offset + limit if limit else None
+        if not checks:
+            return candidates[offset:needed]
+
+        # Проверяем остальные фильтры блоками и останавливаемся по достижении лимита
+        chunk = max(needed or len(candidates), 1024)
+        matched = []
+        found = 0
+        for start in range(0, len(candidates), chunk):
+            block = candidates[start:start + chunk]
+            for check in checks:
+                if not len(block):
+                    break
+                block = block[check(block)]
+            matched.append(block)
+            found += len(block)
+            if needed is not None and found >= needed:
+                break
+
+        result = np.concatenate(matched) if matched else _EMPTY
+        return result[offset:needed]
+
+    def refine(self, ordinals: np.ndarray,
+               ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> np.ndarray:
+        """Оставляет из ordinals (с сохранением порядка) подходящие по диапазонам"""
+        for column, (min_value, max_value) in (ranges or {}).items():
+            if not len(ordinals):
+                break
+            if min_value is None and max_value is None:
+                continue
+            ordinals = ordinals[self._range_check(column, min_value, max_value, ordinals)]
+        return ordinals
+
+    def _range_check(self, column: str, min_value: Optional[float],
+                     max_value: Optional[float], ordinals: np.ndarray) -> np.ndarray:
+        values = self.columns.numeric[column][ordinals]
+        keep = np.ones(len(ordinals), dtype=bool)
+        if min_value is not None:
+            keep &= values >= min_value
+        if max_value is not None:
+            keep &= values <= max_value
+        return keep
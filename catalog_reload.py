@@ -0,0 +1,187 @@
+"""
+Горячая перезагрузка каталога: отслеживание components.json и атомарная подмена
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from catalog import ComponentCatalog
+from normalization import normalize_components
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """(размер, mtime_ns) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _record_digest(component: Dict) -> str:
+    return hashlib.sha1(json.dumps(component, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def record_digests(components: Iterable[Dict]) -> Dict[str, str]:
+    """ID -> хеш нормализованной записи"""
+    return {c.get('id'): _record_digest(c) for c in components}
+
+
+def diff_catalogs(old_digests: Dict[str, str], new_digests: Dict[str, str]) -> Dict[str, List[str]]:
+    """ID добавленных, удалённых и изменённых компонентов по хешам записей (record_digests)"""
+    return {
+        "added": sorted(str(i) for i in new_digests.keys() - old_digests.keys()),
+        "removed": sorted(str(i) for i in old_digests.keys() - new_digests.keys()),
+        "changed": sorted(str(i) for i in new_digests.keys() & old_digests.keys()
+                          if new_digests[i] != old_digests[i]),
+    }
+
+
+class CatalogReloader:
+    """Следит за файлом каталога и подменяет живой каталог без остановки воркера.
+
+    Новый каталог и его индексы строятся в фоновом потоке (там же выполняется
+    необязательная подготовка prepare), затем ссылка на него подменяется одним
+    присваиванием (on_swap). Текущие запросы дочитывают старый
+    каталог — он не изменяется, поэтому читателям не нужны блокировки.
+    Если содержимое не изменилось (файл лишь «потрогали» или переформатировали),
+    пересборка не выполняется.
+    """
+
+    def __init__(self, source_path: str, get_catalog: Callable[[], ComponentCatalog],
+                 on_swap: Callable[[ComponentCatalog], None],
+                 prepare: Optional[Callable[[ComponentCatalog], None]] = None, interval: float = 5.0):
+        self.source_path = source_path
+        self.get_catalog = get_catalog
+        self.on_swap = on_swap
+        self.prepare = prepare
+        self.interval = interval
+        self.fingerprint = file_fingerprint(source_path)
+        self.digest: Optional[str] = None
+        # Хеши записей текущего каталога: (каталог, ID -> хеш); при следующей
+        # перезагрузке старая сторона сравнения берётся отсюда, а не пересчитывается
+        self._record_digests: Optional[Tuple[ComponentCatalog, Dict[str, str]]] = None
+        self.version = 1
+        self.loaded_at = time.time()
+        self.last_result: Optional[Dict] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def changed(self) -> bool:
+        """Изменился ли файл с момента последней загрузки (по размеру и mtime)"""
+        return file_fingerprint(self.source_path) != self.fingerprint
+
+    # ==================== ПЕРЕЗАГРУЗКА ====================
+
+    async def reload(self, force: bool = False) -> Dict:
+        """Перечитывает файл и, если каталог изменился, подменяет его.
+
+        Одновременно выполняется не больше одной пересборки.
+        """
+        async with self._lock:
+            if not force and not self.changed():
+                return self._result(False, "файл не изменялся")
+
+            fingerprint = file_fingerprint(self.source_path)
+            started = time.perf_counter()
+            try:
+                built = await asyncio.to_thread(self._build, self.get_catalog(), force)
+            except Exception as e:
+                # Битый JSON и т. п.: продолжаем работать со старым каталогом
+                logger.error(f"❌ Не удалось перезагрузить каталог: {e}")
+                self.fingerprint = fingerprint
+                return self._result(False, f"ошибка: {e}")
+
+            self.fingerprint = fingerprint
+            catalog, diff, digest = built
+            self.digest = digest
+            if catalog is None:
+                return self._result(False, "содержимое не изменилось", diff)
+
+            self.on_swap(catalog)
+            self.version += 1
+            self.loaded_at = time.time()
+            elapsed = time.perf_counter() - started
+            logger.info(f"🔄 Каталог перезагружен (версия {self.version}) за {elapsed:.2f} с: "
+                        f"+{len(diff['added'])} / -{len(diff['removed'])} / ~{len(diff['changed'])}")
+            return self._result(True, "каталог обновлён", diff)
+
+    def _build(self, current: ComponentCatalog, force: bool):
+        """Читает и сравнивает каталог (в фоновом потоке); None вместо каталога — без изменений"""
+        with open(self.source_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == self.digest and not force:
+            return None, {"added": [], "removed": [], "changed": []}, digest
+
+        components = normalize_components(json.loads(data.decode('utf-8')))
+        new_digests = record_digests(components)
+        if self._record_digests is not None and self._record_digests[0] is current:
+            old_digests = self._record_digests[1]
+        else:
+            # Первая перезагрузка (или каталог подменили в обход) — один полный проход
+            old_digests = record_digests(current.components)
+        diff = diff_catalogs(old_digests, new_digests)
+        if not force and not any(diff.values()):
+            self._record_digests = (current, new_digests)
+            return None, diff, digest
+        catalog = ComponentCatalog(components, normalized=True)
+        self._record_digests = (catalog, new_digests)
+        # Агрегаты обновляются по разнице версий, а не пересчитываются
+        catalog.inherit_stats(current, diff)
+        if self.prepare is not None:
+            self.prepare(catalog)
+        return catalog, diff, digest
+
+    def _result(self, reloaded: bool, message: str, diff: Optional[Dict] = None) -> Dict:
+        self.last_result = {
+            "reloaded": reloaded,
+            "message": message,
+            "version": self.version,
+            "diff": {key: len(ids) for key, ids in diff.items()} if diff else None,
+            "checked_at": time.time(),
+        }
+        return {**self.last_result, "changed_ids": diff}
+
+    def status(self) -> Dict:
+        return {
+            "source": self.source_path,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "watch_interval": self.interval,
+            "last_reload": self.last_result,
+        }
+
+    # ==================== НАБЛЮДЕНИЕ ЗА ФАЙЛОМ ====================
+
+    def start(self):
+        """Запускает периодическую проверку файла (interval <= 0 — только ручная перезагрузка)"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+            logger.info(f"👀 Отслеживание {self.source_path}: проверка каждые {self.interval:g} с")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.changed():
+                continue
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"❌ Ошибка при подмене каталога: {e}")
@@ -0,0 +1,171 @@
+"""
+Агрегированная статистика каталога: счётчики по типам, происхождению и тегам,
+top-k по номиналам. Считается один раз при сборке каталога, при перезагрузке
+обновляется по разнице между версиями и отдаётся за O(1).
+"""
+
+import heapq
+import logging
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Сколько компонентов хранится в каждом top-k
+TOP_K = 5
+# Номиналы (числовые колонки каталога), для которых ведётся top-k
+TOP_RATINGS = ('power', 'voltage', 'current')
+
+# Счётчики главной страницы: ключ -> условие на тип (в нижнем регистре)
+TYPE_GROUPS: Dict[str, Callable[[str], bool]] = {
+    "bjt_count": lambda t: t in ('bjt_npn', 'bjt_pnp'),
+    "mosfet_count": lambda t: 'mosfet' in t,
+    "tube_count": lambda t: 'vacuum_tube' in t,
+    "diode_count": lambda t: 'diode' in t,
+    "transformer_count": lambda t: 'transformer' in t,
+}
+# Ключ -> значения origin (в нижнем регистре)
+ORIGIN_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "soviet_count": ('soviet',),
+    "usa_count": ('usa',),
+    "japan_count": ('japan',),
+    "europe_count": ('europe', 'uk'),
+    "generic_count": ('generic',),
+}
+
+
+def _norm(value) -> str:
+    return str(value).strip().lower()
+
+
+class CatalogStats:
+    """Счётчики каталога и top-k компонентов по номиналам.
+
+    Экземпляр принадлежит одной версии каталога и после сборки не изменяется:
+    при перезагрузке строится новый экземпляр через updated().
+    """
+
+    def __init__(self, catalog, tag_families: Iterable[str]):
+        self.catalog = catalog
+        self.tag_families = list(tag_families)
+        self.total = len(catalog)
+        self.by_type: Counter = Counter()
+        self.by_origin: Counter = Counter()
+        self.by_tag: Dict[str, Counter] = {}
+        # Номинал -> ID компонентов top-k по убыванию
+        self.top: Dict[str, List[str]] = {}
+        self._summary: Optional[Dict] = None
+        self._tag_tables: Dict[str, List[Tuple[str, int]]] = {}
+
+    # ==================== ПОЛНЫЙ ПОДСЧЁТ ====================
+
+    @classmethod
+    def build(cls, catalog, tag_families: Iterable[str]) -> "CatalogStats":
+        """Подсчёт по колоночным кодам каталога (без обхода записей)"""
+        stats = cls(catalog, tag_families)
+        columns = catalog.columns
+        for attribute, counter in (('type', stats.by_type), ('origin', stats.by_origin)):
+            counter.update(cls._code_counts(columns.codes[attribute], columns.vocab[attribute]))
+        for family in stats.tag_families:
+            if family in columns.tag_codes:
+                stats.by_tag[family] = Counter(
+                    cls._code_counts(columns.tag_codes[family], columns.vocab[family]))
+        for rating in TOP_RATINGS:
+            stats.top[rating] = stats._top_ids(range(stats.total), rating)
+        return stats
+
+    @staticmethod
+    def _code_counts(codes: np.ndarray, vocab: Dict[str, int]) -> Dict[str, int]:
+        counts = np.bincount(codes[codes >= 0], minlength=len(vocab)) if len(vocab) else []
+        # Порядок словаря — порядок первого появления значения в каталоге
+        return {key: int(counts[code]) for key, code in vocab.items() if counts[code]}
+
+    def _top_ids(self, ordinals: Iterable[int], rating: str) -> List[str]:
+        """Top-k по номиналу кучей (heapq.nlargest); при равенстве — в порядке каталога"""
+        values = self.catalog.columns.numeric[rating]
+        best = heapq.nlargest(TOP_K, ordinals, key=lambda ordinal: (values[ordinal], -ordinal))
+        return [self.catalog.components[ordinal].get('id') for ordinal in best]
+
+    # ==================== ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ ====================
+
+    def _count(self, component: Dict, sign: int):
+        if component.get('type'):
+            self.by_type[component['type']] += sign
+        if component.get('origin'):
+            self.by_origin[_norm(component['origin'])] += sign
+        for family in self.tag_families:
+            counter = self.by_tag.setdefault(family, Counter())
+            for tag in {_norm(tag) for tag in component.get(family) or []}:
+                counter[tag] += sign
+
+    def updated(self, catalog, diff: Dict[str, List[str]]) -> "CatalogStats":
+        """Статистика новой версии каталога по разнице с текущей (diff_catalogs)"""
+        stats = CatalogStats(catalog, self.tag_families)
+        stats.by_type = Counter(self.by_type)
+        stats.by_origin = Counter(self.by_origin)
+        stats.by_tag = {family: Counter(counter) for family, counter in self.by_tag.items()}
+
+        removed = [self.catalog.get(component_id) for component_id in diff["removed"] + diff["changed"]]
+        added = [catalog.get(component_id) for component_id in diff["added"] + diff["changed"]]
+        for component in removed:
+            if component is not None:
+                stats._count(component, -1)
+        for component in added:
+            if component is not None:
+                stats._count(component, +1)
+        for counter in [stats.by_type, stats.by_origin, *stats.by_tag.values()]:
+            counter += Counter()   # отбрасывает нулевые счётчики
+
+        touched = set(diff["removed"]) | set(diff["changed"])
+        for rating, top in self.top.items():
+            if touched & set(top):
+                # Ушёл или изменился кто-то из лидеров — следующего кандидата не знаем, пересчёт
+                stats.top[rating] = stats._top_ids(range(stats.total), rating)
+            else:
+                # Лидеры остались: кандидаты — прежний top-k и новые/изменённые компоненты
+                candidates = [catalog.by_id[component_id] for component_id in top + diff["added"] + diff["changed"]
+                              if component_id in catalog.by_id]
+                stats.top[rating] = stats._top_ids(set(candidates), rating)
+        return stats
+
+    # ==================== ВЫДАЧА ====================
+
+    def summary(self) -> Dict[str, int]:
+        """Счётчики главной страницы (total_components, bjt_count, soviet_count...)"""
+        if self._summary is None:
+            types = Counter()
+            for component_type, count in self.by_type.items():
+                types[component_type.lower()] += count
+            summary = {"total_components": self.total}
+            for key, matches in TYPE_GROUPS.items():
+                summary[key] = sum(count for component_type, count in types.items() if matches(component_type))
+            for key, origins in ORIGIN_GROUPS.items():
+                summary[key] = sum(self.by_origin.get(origin, 0) for origin in origins)
+            self._summary = summary
+        return self._summary
+
+    def top_components(self, rating: str = 'power', limit: int = TOP_K) -> List[Dict]:
+        """Записи компонентов top-k по номиналу"""
+        return [self.catalog.get(component_id) for component_id in self.top.get(rating, [])[:limit]]
+
+    def tag_counts(self, family: str) -> List[Tuple[str, int]]:
+        """Теги семейства по убыванию частоты (в исходном написании)"""
+        table = self._tag_tables.get(family)
+        if table is None:
+            labels = self.catalog.labels.get(family, {})
+            columns = self.catalog.columns
+            if family in self.by_tag:
+                counts = self.by_tag[family].items()
+            elif family in self.catalog.by_tag:
+                # classification.* — длины списков инвертированного индекса
+                counts = ((tag, len(postings)) for tag, postings in self.catalog.by_tag[family].items())
+            elif family in columns.tag_codes:
+                # Списочное поле без индекса (analogues, substitutes, manufacturer) — по CSR-кодам
+                counts = self._code_counts(columns.tag_codes[family], columns.vocab[family]).items()
+            else:
+                counts = []
+            counts = [(labels.get(tag, tag), count) for tag, count in counts]
+            table = self._tag_tables[family] = sorted(counts, key=lambda item: item[1], reverse=True)
+        return table
@@ -0,0 +1,513 @@
+"""
+Чтение файлов характеристик (ВАХ) компонентов
+
+Формат файла: строки «напряжение, ток» (комментарии начинаются с #).
+Семейство кривых (выходные характеристики при разных Ib, анодные при разных Ug)
+задаётся третьей колонкой — значением параметра кривой; имя параметра
+указывается директивой в комментарии:
+
+    # @param Ug(V)
+    # Ua(V), Ia(mA), Ug(V)
+    0, 0, 0
+    50, 0.9, 0
+    0, 0, -1
+    50, 0.3, -1
+
+Точки с одинаковым значением параметра образуют одну кривую.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Кодировки, в которых встречаются файлы характеристик
+ENCODINGS_TO_TRY = ['utf-8', 'windows-1251', 'cp866', 'latin-1']
+
+# Расширение бинарного файла-спутника с уже разобранными кривыми (file.txt -> file.txt.npz)
+SIDECAR_SUFFIX = '.npz'
+
+# Директива с именем параметра семейства: «# @param Ug(V)»
+PARAM_DIRECTIVE = '@param'
+
+# Единица тока из заголовка колонок «# Ua(V), Ia(mA)» -> множитель к амперам
+CURRENT_UNITS = {'a': 1.0, 'ma': 1e-3, 'ua': 1e-6, 'µa': 1e-6, 'мка': 1e-6, 'ма': 1e-3, 'а': 1.0}
+CURRENT_UNIT_PATTERN = re.compile(r'^[^,()]+\([^)]*\)\s*,\s*[^,()]+\((?P<unit>[^)]+)\)')
+
+
+class Curve(NamedTuple):
+    """ВАХ в компактном виде: два массива float64 одинаковой длины"""
+    voltage: np.ndarray
+    current: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.voltage)
+
+    def points(self) -> List[Dict]:
+        """Точки в формате API: [{"voltage": ..., "current": ...}, ...]"""
+        return [{"voltage": v, "current": c} for v, c in zip(self.voltage.tolist(), self.current.tolist())]
+
+
+class CurveFamily(NamedTuple):
+    """Семейство ВАХ в колоночном виде: точки всех кривых подряд,
+    границы кривой i — offsets[i]:offsets[i + 1], её параметр — values[i]"""
+    voltage: np.ndarray
+    current: np.ndarray
+    offsets: np.ndarray
+    values: np.ndarray
+    parameter: Optional[str] = None
+    current_unit: str = 'A'
+    # Строки данных, которые не удалось разобрать (в спутник не сохраняется)
+    invalid_lines: int = 0
+
+    def __len__(self) -> int:
+        """Число кривых"""
+        return len(self.values)
+
+    @property
+    def point_count(self) -> int:
+        return len(self.voltage)
+
+    @property
+    def current_scale(self) -> float:
+        """Множитель, переводящий ток кривых в амперы"""
+        return CURRENT_UNITS.get(self.current_unit.lower(), 1.0)
+
+    def curve(self, index: int = 0) -> Curve:
+        """Кривая семейства (представления массивов, без копирования)"""
+        if not len(self):
+            return Curve(self.voltage, self.current)
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return Curve(self.voltage[start:end], self.current[start:end])
+
+    def curves(self) -> List[Curve]:
+        return [self.curve(index) for index in range(len(self))]
+
+    def nearest(self, value: Optional[float]) -> int:
+        """Индекс кривой с ближайшим значением параметра (None — первая кривая)"""
+        if value is None or not len(self) or np.all(np.isnan(self.values)):
+            return 0
+        return int(np.nanargmin(np.abs(self.values - value)))
+
+    def describe(self) -> Dict:
+        """Параметр семейства и значения для всех кривых"""
+        return {
+            "parameter": self.parameter,
+            "current_unit": self.current_unit,
+            "values": [None if np.isnan(value) else value for value in self.values.tolist()],
+            "points": np.diff(self.offsets).tolist(),
+        }
+
+
+def read_text(file_path: str) -> str:
+    """Читает файл, перебирая известные кодировки"""
+    for encoding in ENCODINGS_TO_TRY:
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                return f.read()
+        except UnicodeDecodeError:
+            continue
+
+    # Если ни одна кодировка не подошла, используем бинарный режим с игнорированием ошибок
+    with open(file_path, 'rb') as f:
+        logger.warning(f"⚠️ Использован игнорирующий декодер для {file_path}")
+        return f.read().decode('utf-8', errors='ignore')
+
+
+def parse_family(lines: Iterable[str]) -> CurveFamily:
+    """Разбирает строки файла за один проход, раскладывая точки по кривым"""
+    parameter = None
+    current_unit = 'A'
+    # Значение параметра -> (напряжения, токи); порядок кривых — как в файле
+    groups: "OrderedDict[Optional[float], tuple[array, array]]" = OrderedDict()
+    current_key, current_group = None, None
+    invalid_lines = 0
+
+    for line in lines:
+        # Пропускаем комментарии и пустые строки
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            comment = line.lstrip('#').strip()
+            if comment.startswith(PARAM_DIRECTIVE):
+                parameter = comment[len(PARAM_DIRECTIVE):].strip() or None
+            elif not groups:
+                match = CURRENT_UNIT_PATTERN.match(comment)
+                if match and match.group('unit').strip().lower() in CURRENT_UNITS:
+                    current_unit = match.group('unit').strip()
+            continue
+
+        # Заменяем запятые на пробелы и разбиваем
+        parts = line.replace(',', ' ').split()
+        if len(parts) < 2:
+            continue
+        try:
+            voltage = float(parts[0])
+            current = float(parts[1])
+            # Без третьей колонки все точки относятся к одной кривой (ключ None)
+            key = float(parts[2]) if len(parts) >= 3 else None
+        except ValueError:
+            # Предупреждение пишет тот, кто кэширует результат (_warn_invalid)
+            invalid_lines += 1
+            continue
+
+        # Точки одной кривой обычно идут подряд — словарь нужен только при смене кривой
+        if current_group is None or key != current_key:
+            current_key = key
+            current_group = groups.get(key)
+            if current_group is None:
+                current_group = groups[key] = (array('d'), array('d'))
+        current_group[0].append(voltage)
+        current_group[1].append(current)
+
+    lengths = [len(voltages) for voltages, _ in groups.values()]
+    return CurveFamily(
+        voltage=np.concatenate([np.frombuffer(voltages, dtype=np.float64) for voltages, _ in groups.values()])
+        if groups else np.empty(0),
+        current=np.concatenate([np.frombuffer(currents, dtype=np.float64) for _, currents in groups.values()])
+        if groups else np.empty(0),
+        offsets=np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64),
+        values=np.array([np.nan if value is None else value for value in groups], dtype=np.float64),
+        parameter=parameter,
+        current_unit=current_unit,
+        invalid_lines=invalid_lines,
+    )
+
+
+def _warn_invalid(file_path: str, family: CurveFamily):
+    """Одно предупреждение на разбор файла — там, где результат кэшируется"""
+    if family.invalid_lines:
+        logger.warning(f"⚠️ {file_path}: пропущено строк с ошибкой парсинга: {family.invalid_lines}")
+    if not family.point_count:
+        logger.warning(f"⚠️ {file_path}: нет точек ВАХ")
+
+
+def read_family(file_path: str) -> CurveFamily:
+    """Читает файл построчно (без загрузки целиком), перебирая известные кодировки"""
+    for encoding in ENCODINGS_TO_TRY:
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                return parse_family(f)
+        except UnicodeDecodeError:
+            continue
+    return parse_family(read_text(file_path).split('\n'))
+
+
+def parse_curve(data: str) -> Curve:
+    """Парсит данные ВАХ (формат: напряжение, ток) в пару массивов; у семейства — первая кривая"""
+    return parse_family(data.split('\n')).curve(0)
+
+
+def parse_characteristics(data: str) -> List[Dict]:
+    """Парсит данные ВАХ (формат: напряжение, ток)"""
+    return parse_curve(data).points()
+
+
+# ==================== БИНАРНЫЕ СПУТНИКИ ====================
+
+def sidecar_path(file_path: str) -> str:
+    return file_path + SIDECAR_SUFFIX
+
+
+def write_sidecar(file_path: str, family: CurveFamily):
+    """Сохраняет разобранное семейство рядом с текстовым файлом"""
+    temp_path = f"{sidecar_path(file_path)}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, voltage=family.voltage, current=family.current, offsets=family.offsets,
+                 values=family.values, parameter=np.array(family.parameter or ''),
+                 current_unit=np.array(family.current_unit))
+    os.replace(temp_path, sidecar_path(file_path))
+
+
+def _read_sidecar(file_path: str, source_mtime_ns: int) -> Optional[CurveFamily]:
+    """Семейство из спутника, если он не старше текстового файла"""
+    path = sidecar_path(file_path)
+    try:
+        if os.stat(path).st_mtime_ns < source_mtime_ns:
+            return None
+        with np.load(path) as data:
+            return CurveFamily(
+                voltage=data['voltage'],
+                current=data['current'],
+                offsets=data['offsets'],
+                values=data['values'],
+                parameter=str(data['parameter']) or None,
+                current_unit=str(data['current_unit']),
+            )
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning(f"⚠️ Не удалось прочитать {path}: {e}")
+        return None
+
+
+def compile_sidecars(directory: str = 'characteristics') -> int:
+    """Разбирает текстовые файлы каталога в бинарные спутники; возвращает число новых"""
+    if not os.path.isdir(directory):
+        return 0
+    compiled = 0
+    for name in sorted(os.listdir(directory)):
+        file_path = os.path.join(directory, name)
+        if name.endswith(SIDECAR_SUFFIX) or not os.path.isfile(file_path):
+            continue
+        # Актуальный спутник (не старше текста и в текущем формате) пересобирать не нужно
+        if _read_sidecar(file_path, os.stat(file_path).st_mtime_ns) is not None:
+            continue
+        family = read_family(file_path)
+        _warn_invalid(file_path, family)
+        # Спутник пишется и для файла без точек: воркеры не разбирают его заново
+        write_sidecar(file_path, family)
+        compiled += 1
+    logger.info(f"💾 Подготовлено {compiled} бинарных файлов ВАХ в {directory}")
+    return compiled
+
+
+# ==================== ПЕРЕДИСКРЕТИЗАЦИЯ ====================
+
+# Методы прореживания: lttb сохраняет форму кривой, minmax — экстремумы (пики, выбросы)
+DECIMATION_METHODS = ('lttb', 'minmax')
+
+
+def window_curve(curve: Curve, v_min: Optional[float] = None, v_max: Optional[float] = None) -> Curve:
+    """Точки с напряжением в диапазоне [v_min, v_max]"""
+    if v_min is None and v_max is None:
+        return curve
+    mask = np.ones(len(curve), dtype=bool)
+    if v_min is not None:
+        mask &= curve.voltage >= v_min
+    if v_max is not None:
+        mask &= curve.voltage <= v_max
+    return Curve(curve.voltage[mask], curve.current[mask])
+
+
+def decimate_minmax(curve: Curve, points: int) -> Curve:
+    """Минимум и максимум тока в каждом из (points - 2)/2 интервалов плюс обе
+    крайние точки: не больше points точек, порядок сохраняется"""
+    total = len(curve)
+    if total <= points:
+        return curve
+    if points < 4:
+        # На пару min/max не хватает места — равномерная выборка с концами
+        indices = np.unique(np.linspace(0, total - 1, max(points, 1)).astype(np.int64))
+        return Curve(curve.voltage[indices], curve.current[indices])
+    # Две точки зарезервированы под концы кривой
+    buckets = (points - 2) // 2
+    size = -(-total // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:total] = curve.current
+    padded = padded.reshape(buckets, size)
+    # Последний интервал может быть неполным: хвост заполнен NaN
+    offsets = np.arange(buckets) * size
+    valid = offsets < total
+    lows = np.nanargmin(padded[valid], axis=1) + offsets[valid]
+    highs = np.nanargmax(padded[valid], axis=1) + offsets[valid]
+    indices = np.unique(np.concatenate([lows, highs, [0, total - 1]]))
+    return Curve(curve.voltage[indices], curve.current[indices])
+
+
+def decimate_lttb(curve: Curve, points: int) -> Curve:
+    """Largest-Triangle-Three-Buckets: из каждого интервала берётся точка,
+    образующая наибольший треугольник с соседними выбранными точками"""
+    total = len(curve)
+    if total <= points or points < 3:
+        return curve
+    x, y = curve.voltage, curve.current
+    edges = np.linspace(1, total - 1, points - 1).astype(np.int64)
+    indices = np.empty(points, dtype=np.int64)
+    indices[0], indices[-1] = 0, total - 1
+
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Третья вершина — среднее следующего интервала
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else total
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return Curve(x[indices], y[indices])
+
+
+def interpolate_curve(curve: Curve, at) -> np.ndarray:
+    """Ток при заданных напряжениях (линейная интерполяция; вне диапазона кривой — NaN)"""
+    at = np.asarray(at, dtype=np.float64)
+    if not len(curve):
+        return np.full(at.shape, np.nan)
+    voltage, current = curve.voltage, curve.current
+    if np.any(np.diff(voltage) < 0):
+        order = np.argsort(voltage, kind='stable')
+        voltage, current = voltage[order], current[order]
+    return np.interp(at, voltage, current, left=np.nan, right=np.nan)
+
+
+def resample_curve(curve: Curve, points: Optional[int] = None, v_min: Optional[float] = None,
+                   v_max: Optional[float] = None, method: str = 'lttb') -> Curve:
+    """Окно по напряжению, затем прореживание до points точек"""
+    curve = window_curve(curve, v_min, v_max)
+    if points is None or len(curve) <= points:
+        return curve
+    if method == 'minmax':
+        return decimate_minmax(curve, points)
+    return decimate_lttb(curve, points)
+
+
+def _nullable(values: np.ndarray) -> List[Optional[float]]:
+    """Список для JSON: NaN -> None"""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def curve_response(component_id: str, family: CurveFamily, points: Optional[int] = None,
+                   v_min: Optional[float] = None, v_max: Optional[float] = None,
+                   method: str = 'lttb', at: Optional[List[float]] = None,
+                   value: Optional[float] = None, whole_family: bool = False) -> Dict:
+    """Ответ API характеристик с учётом параметров передискретизации.
+
+    По умолчанию возвращается одна кривая (ближайшая к значению параметра value),
+    при whole_family — всё семейство в колоночном виде.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation method '{method}', expected one of: {', '.join(DECIMATION_METHODS)}")
+    if points is not None:
+        points = max(points, 3)
+    if whole_family:
+        return _family_response(component_id, family, points, v_min, v_max, method, at)
+
+    index = family.nearest(value)
+    curve = family.curve(index)
+    sampled = resample_curve(curve, points, v_min, v_max, method)
+    response = {
+        "component_id": component_id,
+        "current_unit": family.current_unit,
+        "characteristics": sampled.points(),
+        "total_points": len(curve),
+        "returned_points": len(sampled),
+    }
+    if points is not None and len(sampled) < len(curve):
+        response["decimation"] = method
+    if len(family) > 1:
+        response["family"] = family.describe()
+        response["selected"] = {"index": index, "value": _nullable(family.values[index:index + 1])[0]}
+    if at:
+        response["interpolated"] = [
+            {"voltage": v, "current": c}
+            for v, c in zip(at, _nullable(interpolate_curve(curve, at)))
+        ]
+    return response
+
+
+def _family_response(component_id: str, family: CurveFamily, points: Optional[int],
+                     v_min: Optional[float], v_max: Optional[float], method: str,
+                     at: Optional[List[float]]) -> Dict:
+    """Всё семейство одним колоночным ответом: общие массивы voltage/current и границы кривых"""
+    sampled = [resample_curve(curve, points, v_min, v_max, method) for curve in family.curves()]
+    lengths = [len(curve) for curve in sampled]
+    response = {
+        "component_id": component_id,
+        "parameter": family.parameter,
+        "current_unit": family.current_unit,
+        "values": _nullable(family.values),
+        "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).tolist(),
+        "voltage": np.concatenate([curve.voltage for curve in sampled]).tolist() if sampled else [],
+        "current": np.concatenate([curve.current for curve in sampled]).tolist() if sampled else [],
+        "total_points": family.point_count,
+        "returned_points": sum(lengths),
+    }
+    if points is not None and sum(lengths) < family.point_count:
+        response["decimation"] = method
+    if at:
+        # Строка на кривую, столбец на напряжение
+        response["interpolated"] = {
+            "voltage": list(at),
+            "current": [_nullable(interpolate_curve(curve, at)) for curve in family.curves()],
+        }
+    return response
+
+
+# ==================== КЭШ ====================
+
+class CurveCache:
+    """LRU-кэш разобранных семейств кривых; запись сбрасывается при изменении файла (mtime/размер)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[tuple[int, int], CurveFamily]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: str) -> Optional[CurveFamily]:
+        """Семейство кривых из файла; None, если файл отсутствует"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        family = _read_sidecar(file_path, stat.st_mtime_ns)
+        if family is None:
+            family = read_family(file_path)
+            _warn_invalid(file_path, family)
+        # Кэшированные массивы общие для всех запросов — только для чтения
+        for column in (family.voltage, family.current, family.offsets, family.values):
+            column.flags.writeable = False
+
+        with self._lock:
+            self._entries[file_path] = (stamp, family)
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return family
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+curve_cache = CurveCache(int(os.getenv("CHARACTERISTICS_CACHE_SIZE", "256")))
+
+
+def load_family(file_path: Optional[str]) -> Optional[CurveFamily]:
+    """Семейство ВАХ из кэша; None, если файл не указан или отсутствует"""
+    if not file_path:
+        return None
+    return curve_cache.get(file_path)
+
+
+def load_curve(file_path: Optional[str], value: Optional[float] = None) -> Optional[Curve]:
+    """Кривая ВАХ из кэша (у семейства — ближайшая к значению параметра, по умолчанию первая)"""
+    family = load_family(file_path)
+    return family.curve(family.nearest(value)) if family is not None else None
+
+
+def load_characteristics(file_path: Optional[str]) -> Optional[List[Dict]]:
+    """Загружает ВАХ из файла; None, если файл не указан или отсутствует"""
+    curve = load_curve(file_path)
+    return curve.points() if curve is not None else None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    compile_sidecars(sys.argv[1] if len(sys.argv) > 1 else 'characteristics')
@@ -0,0 +1,201 @@
+"""
+Колоночное представление каталога на NumPy для векторизованной фильтрации
+"""
+
+import logging
+from typing import Dict, List, Optional, Callable, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value) -> float:
+    """Приводит значение параметра к float (нечисловые значения считаются 0)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _norm(value) -> str:
+    return str(value).strip().lower()
+
+
+class ColumnStore:
+    """Непрерывные массивы параметров и целочисленные коды атрибутов.
+
+    - числовые колонки: float64, по одному значению на компонент;
+    - type/origin: int32-коды в словаре значений (-1 — значение отсутствует);
+    - семейства тегов: CSR-представление (offsets + codes) по словарю тегов;
+    - для каждой числовой колонки — отсортированный индекс (argsort + значения)
+      для ответа на диапазонные запросы бинарным поиском.
+    """
+
+    # Группы массивов хранилища (для сохранения в снимок каталога)
+    ARRAY_GROUPS = ['numeric', 'sorted_order', 'sorted_values', 'codes',
+                    'tag_offsets', 'tag_codes', 'tag_owners']
+
+    def __init__(self, components: List[Dict], numeric: Dict[str, Callable[[Dict], float]],
+                 tag_families: List[str]):
+        self.size = len(components)
+        self.numeric: Dict[str, np.ndarray] = {
+            name: np.fromiter((_to_float(getter(c)) for c in components),
+                              dtype=np.float64, count=self.size)
+            for name, getter in numeric.items()
+        }
+        self.sorted_order: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        for name, values in self.numeric.items():
+            order = np.argsort(values, kind='stable')
+            self.sorted_order[name] = order
+            self.sorted_values[name] = values[order]
+
+        self.vocab: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for attribute in ('type', 'origin'):
+            self.vocab[attribute], self.codes[attribute] = self._encode_scalar(
+                components, attribute, lower=(attribute == 'origin'))
+
+        self.tag_offsets: Dict[str, np.ndarray] = {}
+        self.tag_codes: Dict[str, np.ndarray] = {}
+        self.tag_owners: Dict[str, np.ndarray] = {}
+        for family in tag_families:
+            self._encode_tags(components, family)
+
+        logger.info(f"🧮 Колоночное хранилище: {self.size} строк, "
+                    f"колонки {', '.join(self.numeric)}")
+
+    @classmethod
+    def from_arrays(cls, size: int, arrays: Dict[str, np.ndarray],
+                    vocab: Dict[str, Dict[str, int]]) -> 'ColumnStore':
+        """Хранилище поверх готовых массивов (например, отображённых в память).
+
+        Имена массивов — как в arrays(): 'numeric.power', 'tag_codes.role_tags' и т. д.
+        """
+        store = cls.__new__(cls)
+        store.size = size
+        store.vocab = vocab
+        for group in cls.ARRAY_GROUPS:
+            setattr(store, group, {})
+        for name, array in arrays.items():
+            group, key = name.split('.', 1)
+            getattr(store, group)[key] = array
+        return store
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            f"{group}.{key}": array
+            for group in self.ARRAY_GROUPS
+            for key, array in getattr(self, group).items()
+        }
+
+    # ==================== КОДИРОВАНИЕ ====================
+
+    def _encode_scalar(self, components: List[Dict], attribute: str, lower: bool):
+        vocab: Dict[str, int] = {}
+        codes = np.full(self.size, -1, dtype=np.int32)
+        for ordinal, component in enumerate(components):
+            value = component.get(attribute)
+            if not value:
+                continue
+            key = _norm(value) if lower else value
+            codes[ordinal] = vocab.setdefault(key, len(vocab))
+        return vocab, codes
+
+    def _encode_tags(self, components: List[Dict], family: str):
+        vocab: Dict[str, int] = {}
+        offsets = np.zeros(self.size + 1, dtype=np.int64)
+        flat: List[int] = []
+        for ordinal, component in enumerate(components):
+            tags = component.get(family, [])
+            for code in {vocab.setdefault(_norm(t), len(vocab)) for t in tags}:
+                flat.append(code)
+            offsets[ordinal + 1] = len(flat)
+
+        codes = np.asarray(flat, dtype=np.int32)
+        self.vocab[family] = vocab
+        self.tag_offsets[family] = offsets
+        self.tag_codes[family] = codes
+        # Владелец каждого тега — для обратного перехода от кода тега к строкам
+        self.tag_owners[family] = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(offsets))
+
+    # ==================== МАСКИ ====================
+
+    def equals_mask(self, attribute: str, value: str) -> np.ndarray:
+        """Маска строк, у которых type/origin равен значению"""
+        key = _norm(value) if attribute == 'origin' else value
+        code = self.vocab[attribute].get(key)
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.codes[attribute] == code
+
+    def tag_mask(self, family: str, tag: str) -> np.ndarray:
+        """Маска строк, содержащих тег в указанном семействе"""
+        mask = np.zeros(self.size, dtype=bool)
+        code = self.vocab.get(family, {}).get(_norm(tag))
+        if code is not None:
+            mask[self.tag_owners[family][self.tag_codes[family] == code]] = True
+        return mask
+
+    def tag_ordinals(self, family: str, tag: str) -> np.ndarray:
+        """Отсортированные ordinal строк, содержащих тег в указанном семействе"""
+        code = self.vocab.get(family, {}).get(_norm(tag))
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        # Коды внутри строки уникальны, а владельцы идут по возрастанию — повторов и сортировки не нужно
+        return self.tag_owners[family][self.tag_codes[family] == code]
+
+    def range_mask(self, column: str, min_value: Optional[float] = None,
+                   max_value: Optional[float] = None,
+                   mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Накладывает фильтр min/max по числовой колонке на маску"""
+        if mask is None:
+            mask = np.ones(self.size, dtype=bool)
+        values = self.numeric[column]
+        if min_value is not None:
+            mask &= values >= min_value
+        if max_value is not None:
+            mask &= values <= max_value
+        return mask
+
+    # ==================== ФАСЕТЫ ====================
+
+    def code_counts(self, attribute: str, ordinals: np.ndarray) -> np.ndarray:
+        """Число строк ordinals с каждым кодом type/origin (индекс массива — код)"""
+        codes = self.codes[attribute][ordinals]
+        return np.bincount(codes[codes >= 0], minlength=len(self.vocab[attribute]))
+
+    def tag_code_counts(self, family: str, ordinals: np.ndarray) -> np.ndarray:
+        """Число строк ordinals с каждым тегом семейства (индекс массива — код тега)"""
+        offsets = self.tag_offsets[family]
+        starts = offsets[ordinals]
+        lengths = offsets[ordinals + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(len(self.vocab[family]), dtype=np.int64)
+        # Позиции всех тегов строк без цикла: начало строки, растянутое на её длину, + сдвиг внутри строки
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return np.bincount(self.tag_codes[family][positions], minlength=len(self.vocab[family]))
+
+    # ==================== ОТСОРТИРОВАННЫЕ ИНДЕКСЫ ====================
+
+    def range_bounds(self, column: str, min_value: Optional[float] = None,
+                     max_value: Optional[float] = None) -> Tuple[int, int]:
+        """Границы [lo, hi) диапазона в отсортированном индексе колонки за O(log n)"""
+        sorted_values = self.sorted_values[column]
+        lo = 0 if min_value is None else int(np.searchsorted(sorted_values, min_value, side='left'))
+        hi = self.size if max_value is None else int(np.searchsorted(sorted_values, max_value, side='right'))
+        return lo, max(lo, hi)
+
+    def range_count(self, column: str, min_value: Optional[float] = None,
+                    max_value: Optional[float] = None) -> int:
+        """Число строк в диапазоне — оценка селективности без сканирования"""
+        lo, hi = self.range_bounds(column, min_value, max_value)
+        return hi - lo
+
+    def range_ordinals(self, column: str, min_value: Optional[float] = None,
+                       max_value: Optional[float] = None) -> np.ndarray:
+        """Ordinal строк в диапазоне, упорядоченные по возрастанию (порядок каталога)"""
+        lo, hi = self.range_bounds(column, min_value, max_value)
+        return np.sort(self.sorted_order[column][lo:hi])
@@ -0,0 +1,337 @@
+"""
+Исполнители команд ИИ-модуля: прямой вызов каталога или HTTP-запрос к серверу
+"""
+
+import json
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from characteristics import load_characteristics
+
+# Числовые аргументы команды search_components
+NUMERIC_ARGS = ['min_power', 'max_power', 'min_voltage', 'max_voltage', 'min_current', 'max_current']
+# Наибольшее число компонентов в ответе одного поиска
+MAX_SEARCH_LIMIT = 1000
+
+
+def prepare_search_args(args: Dict) -> Dict:
+    """Убирает пустые аргументы и приводит числовые к float"""
+    params = {k: v for k, v in (args or {}).items() if v is not None and v != ""}
+    
+    # 🔧 ПРЕОБРАЗОВАНИЕ ТИПОВ ДЛЯ API
+    for key in NUMERIC_ARGS:
+        if key in params:
+            try:
+                params[key] = float(params[key])
+            except (ValueError, TypeError):
+                # Если не удалось преобразовать, удаляем параметр
+                params.pop(key, None)
+    return params
+
+
+class CatalogCommandExecutor:
+    """Выполняет команды напрямую над каталогом в том же процессе.
+
+    Используется веб-приложением: без HTTP-запроса к самому себе, повторной
+    сериализации JSON и занятого рабочего потока.
+    """
+    
+    # Поиск по каталогу — синхронная работа numpy (на большом каталоге заметная),
+    # поэтому из event loop исполнитель вызывается в потоке (execute_command_async)
+    blocking = True
+    
+    def __init__(self, get_catalog: Callable, default_limit: int = 50):
+        # Функция, возвращающая актуальный каталог (ComponentCatalog)
+        self.get_catalog = get_catalog
+        self.default_limit = default_limit
+    
+    def execute(self, command_data: Dict) -> Dict:
+        command = command_data.get("command", "search_components")
+        args = command_data.get("args") or {}
+        
+        print(f"\n🔧 Выполняю команду: {command} (в процессе)")
+        print(f"📝 Аргументы: {args}")
+        
+        return self._dispatch(command, args, self.get_catalog())
+    
+    def _dispatch(self, command: str, args: Dict, catalog) -> Dict:
+        if command == "search_components":
+            return self.search_components(args, catalog)
+        elif command == "get_component_details":
+            return self.get_component_details(args, catalog)
+        elif command == "get_characteristics":
+            return self.get_characteristics(args, catalog)
+        
+        return {
+            "success": False,
+            "error": f"Неизвестная команда: {command}"
+        }
+    
+    def _search_query(self, args: Dict) -> Tuple[Dict, int]:
+        """Аргументы команды -> параметры ComponentCatalog.search и лимит"""
+        params = prepare_search_args(args)
+        try:
+            limit = int(params.get("limit", self.default_limit))
+        except (ValueError, TypeError):
+            limit = self.default_limit
+        # 0 означал бы «без ограничения», отрицательный — пустой ответ
+        limit = min(max(limit, 1), MAX_SEARCH_LIMIT)
+        
+        query = {
+            "type": params.get("component_type") or params.get("type"),
+            "origin": params.get("origin"),
+            "tags": {
+                "application_tags": params.get("application") or params.get("application_tag"),
+                "classification.frequency_range": params.get("frequency_range"),
+            },
+            "ranges": {
+                "power": (params.get("min_power"), params.get("max_power")),
+                "voltage": (params.get("min_voltage"), params.get("max_voltage")),
+                "current": (params.get("min_current"), params.get("max_current")),
+            },
+            "text": params.get("search_text"),
+        }
+        return query, limit
+    
+    def search_components(self, args: Dict, catalog=None) -> Dict:
+        """Поиск с той же семантикой, что /api/components/search/extended"""
+        query, limit = self._search_query(args)
+        components = (catalog or self.get_catalog()).search(limit=limit, **query)
+        print(f"✅ Получено {len(components)} компонентов")
+        return {
+            "count": len(components),
+            "components": components
+        }
+    
+    def get_component_details(self, args: Dict, catalog=None) -> Dict:
+        component_id = args.get("component_id")
+        if not component_id:
+            return {
+                "success": False,
+                "error": "Не указан ID компонента"
+            }
+        
+        component = (catalog or self.get_catalog()).get(component_id)
+        if not component:
+            return {
+                "success": False,
+                "error": f"Компонент '{component_id}' не найден"
+            }
+        return component
+    
+    def get_characteristics(self, args: Dict, catalog=None) -> Dict:
+        component_id = args.get("component_id")
+        if not component_id:
+            return {
+                "success": False,
+                "error": "Не указан ID компонента"
+            }
+        
+        component = (catalog or self.get_catalog()).get(component_id)
+        if not component:
+            return {
+                "success": False,
+                "error": f"Компонент '{component_id}' не найден"
+            }
+        return {
+            "component_id": component_id,
+            "characteristics": load_characteristics(component.get("characteristics_file")) or []
+        }
+    
+    # ==================== ПАКЕТНОЕ ВЫПОЛНЕНИЕ ====================
+    
+    def execute_batch(self, commands: List) -> Iterator[Tuple[int, Dict]]:
+        """Выполняет пакет команд над одним снимком каталога.
+
+        - одинаковые команды выполняются один раз;
+        - поиски с одинаковыми фильтрами на равенство и текстом делят один
+          проход по индексам, различаясь только диапазонами и лимитом.
+
+        Результаты выдаются по мере готовности в порядке команд: (номер, результат).
+        """
+        catalog = self.get_catalog()
+        prepared = [self._batch_entry(command_data) for command_data in commands]
+        
+        # Сколько разных поисков приходится на каждый набор фильтров
+        group_sizes: Dict[str, int] = defaultdict(int)
+        unique_searches = {key: group for key, command, args, group in prepared if group is not None}
+        for group in unique_searches.values():
+            group_sizes[group] += 1
+        shared: Dict[str, np.ndarray] = {}
+        results: Dict[str, Dict] = {}
+        
+        for index, (key, command, args, group) in enumerate(prepared):
+            if key not in results:
+                # Ошибка одной команды не должна обрывать уже начатый поток ответов
+                try:
+                    if group is not None and group_sizes[group] > 1:
+                        results[key] = self._shared_search(catalog, args, group, shared)
+                    elif command is None:
+                        results[key] = {"success": False, "error": "Команда должна быть объектом с полями command и args"}
+                    else:
+                        results[key] = self._dispatch(command, args, catalog)
+                except Exception as e:
+                    print(f"❌ Ошибка команды #{index} ({command}): {e}")
+                    results[key] = {"success": False, "error": f"Ошибка выполнения: {e}"}
+            yield index, results[key]
+    
+    def _batch_entry(self, command_data) -> Tuple[str, Optional[str], Dict, Optional[str]]:
+        """(ключ команды, команда, аргументы, ключ группы общего прохода для поиска)"""
+        if not isinstance(command_data, dict) or not isinstance(command_data.get("args") or {}, dict):
+            return "invalid", None, {}, None
+        command = command_data.get("command", "search_components")
+        args = command_data.get("args") or {}
+        if not isinstance(command, str):
+            return "invalid", None, {}, None
+        if command != "search_components":
+            return json.dumps([command, args], sort_keys=True, default=str), command, args, None
+        
+        query, limit = self._search_query(args)
+        key = json.dumps([command, query, limit], sort_keys=True, default=str)
+        group = json.dumps([query["type"], query["origin"], query["tags"], query["text"]],
+                           sort_keys=True, default=str)
+        return key, command, args, group
+    
+    def _shared_search(self, catalog, args: Dict, group: str, shared: Dict[str, np.ndarray]) -> Dict:
+        """Поиск через общую для группы выборку по фильтрам на равенство и тексту"""
+        query, limit = self._search_query(args)
+        if group not in shared:
+            shared[group] = catalog.search_ordinals(
+                type=query["type"], origin=query["origin"], tags=query["tags"], text=query["text"])
+        ordinals = catalog.refine(shared[group], query["ranges"])
+        components = catalog.records(ordinals[:limit])
+        return {
+            "count": len(components),
+            "components": components
+        }
+
+
+class HttpCommandExecutor:
+    """Выполняет команды HTTP-запросами к серверу библиотеки (для CLI main.py)"""
+    
+    # Синхронные запросы requests — в асинхронном коде выполняются в потоке
+    blocking = True
+    
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+    
+    def execute(self, command_data: Dict) -> Dict:
+        """Выполнение команды на сервере с улучшенной обработкой ошибок"""
+        command = command_data.get("command", "search_components")
+        args = command_data.get("args", {})
+        
+        try:
+            print(f"\n🔧 Выполняю команду: {command}")
+            print(f"📝 Аргументы: {args}")
+            
+            if command == "search_components":
+                params = prepare_search_args(args)
+                
+                # 🔧 ИСПРАВЛЕНИЕ: Используем /api/components/search/extended для расширенного поиска
+                # Но также можно использовать /api/components для базового поиска.
+                # Проверим, есть ли расширенные параметры (мощность, напряжение, ток, application).
+                # Если есть хотя бы один из них, используем extended endpoint.
+                extended_params = ['min_power', 'max_power', 'min_voltage', 'max_voltage', 
+                                   'min_current', 'max_current', 'application', 'frequency_range']
+                
+                if any(param in params for param in extended_params):
+                    url = f"{self.base_url}/api/components/search/extended"
+                else:
+                    url = f"{self.base_url}/api/components"
+                
+                print(f"🌐 Запрос к: {url}")
+                print(f"📊 Параметры: {params}")
+                
+                response = requests.get(url, params=params, timeout=15)
+                print(f"📡 Код ответа: {response.status_code}")
+                print(f"📄 Заголовки ответа: {response.headers.get('content-type', 'unknown')}")
+                
+                if response.status_code == 200:
+                    # Проверяем, что ответ JSON
+                    content_type = response.headers.get('content-type', '')
+                    if 'application/json' in content_type:
+                        result = response.json()
+                        print(f"✅ Получено {result.get('count', 0)} компонентов")
+                        return result
+                    else:
+                        print(f"⚠️  Ответ не JSON: {response.text[:200]}")
+                        # Попробуем распарсить как JSON, даже если заголовок неправильный
+                        try:
+                            result = response.json()
+                            print(f"✅ Получено {result.get('count', 0)} компонентов (парсинг несмотря на заголовок)")
+                            return result
+                        except:
+                            # Если не удалось распарсить, возвращаем ошибку
+                            return {
+                                "success": False,
+                                "error": "Сервер вернул не JSON данные",
+                                "details": f"Content-Type: {content_type}, первые 200 символов: {response.text[:200]}"
+                            }
+                else:
+                    print(f"❌ Ошибка API: {response.status_code}")
+                    print(f"Текст ошибки: {response.text[:200]}")
+                    return {
+                        "success": False,
+                        "error": f"Ошибка API: {response.status_code}",
+                        "details": response.text[:200]
+                    }
+            
+            elif command in ["get_component_details", "get_characteristics"]:
+                component_id = args.get("component_id")
+                if not component_id:
+                    return {
+                        "success": False,
+                        "error": "Не указан ID компонента"
+                    }
+                
+                if command == "get_component_details":
+                    url = f"{self.base_url}/api/components/{component_id}"
+                else:
+                    url = f"{self.base_url}/api/components/{component_id}/characteristics"
+                
+                print(f"🌐 Запрос к: {url}")
+                
+                response = requests.get(url, timeout=15)
+                
+                if response.status_code == 200:
+                    result = response.json()
+                    
+                    # Для характеристики добавляем ID компонента
+                    if command == "get_characteristics":
+                        result = {
+                            "component_id": component_id,
+                            "characteristics": result.get("characteristics", [])
+                        }
+                    
+                    return result
+                else:
+                    return {
+                        "success": False,
+                        "error": f"Ошибка {response.status_code}",
+                        "details": response.text[:200]
+                    }
+            
+            return {
+                "success": False,
+                "error": f"Неизвестная команда: {command}"
+            }
+            
+        except requests.exceptions.ConnectionError as e:
+            print(f"❌ Ошибка подключения: {e}")
+            return {
+                "success": False,
+                "error": f"Сервер недоступен: {self.base_url}",
+                "details": str(e)
+            }
+        except Exception as e:
+            print(f"❌ Ошибка выполнения: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                "success": False,
+                "error": f"Ошибка выполнения: {str(e)}",
+                "details": traceback.format_exc()
+            }
@@ -0,0 +1,143 @@
+"""
+Выражения фильтров для поиска компонентов
+
+Синтаксис: условия вида поле:значение, объединённые AND / OR / NOT и скобками,
+AND можно не писать. Значения с пробелами берутся в кавычки:
+
+    type:bjt AND (origin:soviet OR origin:usa) NOT application:"audio amplifier"
+
+Разбор даёт дерево из Term / And / Or / Not; вычисляется оно над индексами
+каталога (ComponentCatalog.expression_postings).
+"""
+
+import re
+from typing import List, NamedTuple, Tuple, Union
+
+# Поле выражения -> индекс каталога (type, origin или семейство тегов)
+FILTER_FIELDS = {
+    'type': 'type',
+    'origin': 'origin',
+    'application': 'application_tags',
+    'application_tags': 'application_tags',
+    'technology': 'technology_tags',
+    'technology_tags': 'technology_tags',
+    'role': 'role_tags',
+    'role_tags': 'role_tags',
+}
+
+# Ограничение размера выражения: каждое условие — отдельный индекс
+MAX_FILTER_TERMS = 64
+# Ограничение вложенности: NOT и скобки вместе (разбор и вычисление рекурсивны)
+MAX_FILTER_NESTING = 32
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<lparen>\()|(?P<rparen>\))'
+    r'|(?P<field>[A-Za-z_]+)\s*:\s*(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s()"]+))'
+    r'|(?P<word>[^\s()"]+))'
+)
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+class Term(NamedTuple):
+    field: str
+    value: str
+
+
+class And(NamedTuple):
+    children: Tuple
+
+
+class Or(NamedTuple):
+    children: Tuple
+
+
+class Not(NamedTuple):
+    child: 'FilterNode'
+
+
+FilterNode = Union[Term, And, Or, Not]
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    """Список (вид, значение): '(' / ')' / оператор / (поле, значение)"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid filter expression near: {text[position:].strip()[:30]}")
+        position = match.end()
+        if match.group('lparen'):
+            tokens.append(('(', '('))
+        elif match.group('rparen'):
+            tokens.append((')', ')'))
+        elif match.group('field'):
+            field = match.group('field').lower()
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter field '{field}', expected one of: {', '.join(FILTER_FIELDS)}")
+            value = match.group('quoted') if match.group('quoted') is not None else match.group('value')
+            tokens.append(('term', (FILTER_FIELDS[field], value)))
+        elif match.group('word').upper() in _OPERATORS:
+            tokens.append(('op', match.group('word').upper()))
+        else:
+            raise ValueError(f"Expected field:value or AND/OR/NOT, got '{match.group('word')}'")
+    return tokens
+
+
+def parse_filter(text: str) -> FilterNode:
+    """Разбирает выражение фильтра; ValueError при синтаксической ошибке"""
+    tokens = _tokenize(text or '')
+    if not tokens:
+        raise ValueError("Empty filter expression")
+    if sum(1 for kind, _ in tokens if kind == 'term') > MAX_FILTER_TERMS:
+        raise ValueError(f"Filter expression has more than {MAX_FILTER_TERMS} conditions")
+    # Глубина дерева не больше числа NOT и открывающих скобок — этого достаточно для рекурсии
+    if sum(1 for token in tokens if token in (('op', 'NOT'), ('(', '('))) > MAX_FILTER_NESTING:
+        raise ValueError(f"Filter expression has more than {MAX_FILTER_NESTING} NOT operators and parentheses")
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def parse_or() -> FilterNode:
+        nonlocal position
+        children = [parse_and()]
+        while peek() == ('op', 'OR'):
+            position += 1
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def parse_and() -> FilterNode:
+        nonlocal position
+        children = [parse_unary()]
+        while True:
+            kind, value = peek()
+            if (kind, value) == ('op', 'AND'):
+                position += 1
+            elif kind not in ('term', '(') and (kind, value) != ('op', 'NOT'):
+                break
+            # Соседние условия без оператора — неявный AND
+            children.append(parse_unary())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def parse_unary() -> FilterNode:
+        nonlocal position
+        kind, value = peek()
+        position += 1
+        if (kind, value) == ('op', 'NOT'):
+            return Not(parse_unary())
+        if kind == 'term':
+            return Term(*value)
+        if kind == '(':
+            node = parse_or()
+            if peek()[0] != ')':
+                raise ValueError("Missing closing parenthesis in filter expression")
+            position += 1
+            return node
+        raise ValueError(f"Unexpected {value or 'end of expression'} in filter expression")
+
+    node = parse_or()
+    if position < len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position][1]}' in filter expression")
+    return node
@@ -8,3 +8,23 @@ keepalive = 5
 accesslog = "-"  
 errorlog = "-"  
 loglevel = "info" 
+  
+  
+def on_starting(server):  
+    """Собираем снимок каталога в мастер-процессе до запуска воркеров:  
+    воркеры отображают его в память и делят страницы между собой"""  
+    # Сборка не обязательна: без снимка воркеры читают JSON, без бинарных файлов — текст ВАХ  
+    try:  
+        from snapshot import DEFAULT_SNAPSHOT, DEFAULT_SOURCE, build_snapshot, is_fresh  
+  
+        if not is_fresh(DEFAULT_SNAPSHOT, DEFAULT_SOURCE):  
+            build_snapshot(DEFAULT_SOURCE, DEFAULT_SNAPSHOT)  
+    except Exception as e:  
+        server.log.warning(f"⚠️ Снимок каталога не собран, воркеры загрузят JSON: {e}")  
+  
+    # Бинарные файлы ВАХ: воркеры читают их вместо разбора текста  
+    try:  
+        from characteristics import compile_sidecars  
+        compile_sidecars()  
+    except Exception as e:  
+        server.log.warning(f"⚠️ Бинарные файлы ВАХ не собраны: {e}")  
@@ -0,0 +1,114 @@
+"""
+Общий пул HTTP-соединений приложения к OpenRouter
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Адрес OpenRouter можно переопределить (например, на локальную заглушку для тестов)
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+OPENROUTER_URL = f"{OPENROUTER_BASE_URL}/chat/completions"
+
+# HTTP/2 доступен только при установленном пакете h2 (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def pool_settings() -> Dict:
+    """Настройки пула из переменных окружения"""
+    return {
+        "max_connections": int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20")),
+        "max_keepalive_connections": int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30")),
+        "per_host_limit": int(os.getenv("OPENROUTER_PER_HOST_LIMIT", "10")),
+        "timeout": float(os.getenv("OPENROUTER_TIMEOUT", "30")),
+    }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Тело ответа, освобождающее слот хоста при закрытии (в т.ч. для потоковых ответов)"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    """Транспорт с ограничением числа одновременных запросов к одному хосту.
+
+    Слот занят, пока тело ответа не прочитано и не закрыто, поэтому
+    ограничение действует и на потоковые (SSE) ответы.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host_limit: int):
+        self._transport = transport
+        self.per_host_limit = per_host_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphores.get(request.url.host)
+        if semaphore is None:
+            semaphore = self._semaphores[request.url.host] = asyncio.Semaphore(self.per_host_limit)
+
+        await semaphore.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        if isinstance(response.stream, httpx.ByteStream):
+            # Тело уже в памяти — соединение свободно
+            semaphore.release()
+        else:
+            response.stream = _ReleasingStream(response.stream, semaphore.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def create_pooled_client(settings: Optional[Dict] = None,
+                         transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Долгоживущий асинхронный клиент с keep-alive, ограниченным пулом и лимитом на хост.
+
+    transport позволяет подменить сетевой уровень (например, заглушкой в тестах).
+    """
+    settings = {**pool_settings(), **(settings or {})}
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive_connections"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+    logger.info(f"🔌 HTTP-пул: до {settings['max_connections']} соединений, "
+                f"{settings['per_host_limit']} на хост, keep-alive {settings['keepalive_expiry']} с, "
+                f"HTTP/2: {'да' if HTTP2_AVAILABLE else 'нет'}")
+    return httpx.AsyncClient(
+        transport=HostLimitedTransport(transport, settings["per_host_limit"]),
+        timeout=settings["timeout"],
+    )
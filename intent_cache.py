@@ -0,0 +1,159 @@
+"""
+Кэш переводов запросов в команды (ответов ИИ) с TTL, LRU и необязательным хранением в SQLite
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SPACES_PATTERN = re.compile(r'\s+')
+# Знаки в конце запроса не меняют смысл: «найди лампы?» == «Найди лампы»
+TRAILING_PUNCTUATION = '.,!?;: '
+
+
+def normalize_query(text: str) -> str:
+    """Нормализованный текст запроса: регистр, ё/е, пробелы, завершающая пунктуация"""
+    text = SPACES_PATTERN.sub(' ', str(text).lower().replace('ё', 'е'))
+    return text.strip().rstrip(TRAILING_PUNCTUATION)
+
+
+class IntentCache:
+    """Кэш «нормализованный запрос + модель + версия промпта» -> команда (результат parse_command).
+
+    Версия — отпечаток промпта (схемы и словарей каталога): после их изменения
+    старые записи не находятся, и запрос заново уходит в ИИ.
+
+    - в памяти: LRU на OrderedDict, не больше max_entries записей;
+    - на диске (если задан path): таблица SQLite, общая для воркеров gunicorn
+      и переживающая перезапуск; при промахе в памяти запись подгружается с диска;
+    - запись старше ttl секунд считается отсутствующей.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1024, path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path or None
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            with self._connect() as db:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("""CREATE TABLE IF NOT EXISTS intents (
+                                  key TEXT PRIMARY KEY,
+                                  command TEXT NOT NULL,
+                                  created REAL NOT NULL)""")
+            logger.info(f"💾 Кэш команд ИИ: SQLite {self.path}, TTL {self.ttl:g} с")
+
+    @classmethod
+    def from_env(cls) -> "IntentCache":
+        """Настройки из переменных окружения INTENT_CACHE_*"""
+        return cls(
+            ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("INTENT_CACHE_SIZE", "1024")),
+            path=os.getenv("INTENT_CACHE_PATH") or None,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def make_key(query: str, model: str, version: str = "") -> str:
+        return f"{model}\n{version}\n{normalize_query(query)}"
+
+    # ==================== ЧТЕНИЕ / ЗАПИСЬ ====================
+
+    def get(self, query: str, model: str, version: str = "") -> Optional[Dict]:
+        """Команда из кэша (новая копия) или None"""
+        key = self.make_key(query, model, version)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+            if entry is not None:
+                del self._memory[key]
+
+        entry = self._load(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return json.loads(entry[1])
+
+    def put(self, query: str, model: str, command: Dict, version: str = ""):
+        """Сохраняет команду в памяти и (если настроено) на диске"""
+        key = self.make_key(query, model, version)
+        entry = (time.time(), json.dumps(command, ensure_ascii=False))
+        with self._lock:
+            self._remember(key, entry)
+
+        if self.path:
+            try:
+                with self._connect() as db:
+                    db.execute("INSERT OR REPLACE INTO intents (key, command, created) VALUES (?, ?, ?)",
+                               (key, entry[1], entry[0]))
+                    db.execute("DELETE FROM intents WHERE created < ?", (entry[0] - self.ttl,))
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Не удалось записать кэш команд: {e}")
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if not self.path:
+            return None
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT created, command FROM intents WHERE key = ? AND created >= ?",
+                                 (key, now - self.ttl)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш команд: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    def clear(self):
+        """Очищает кэш и счётчики"""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+        if self.path:
+            with self._connect() as db:
+                db.execute("DELETE FROM intents")
+
+    # ==================== СТАТИСТИКА ====================
+
+    def stats(self) -> Dict:
+        """Счётчики попаданий и промахов"""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "backend": "sqlite" if self.path else "memory",
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,181 @@
+"""
+Нагрузочная прямая и рабочая точка по семейству ВАХ
+
+Нагрузочная прямая резистивного каскада: I = (E - U) / R, где E — напряжение
+питания, R — сопротивление нагрузки. Рабочая точка — пересечение прямой с ВАХ.
+Кривые кусочно-линейные, поэтому пересечение на отрезке находится точно:
+для всех точек всех кривых сразу вычисляется f = I(U) - (E - U) / R и ищется
+первая смена знака f внутри каждой кривой.
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from characteristics import CurveFamily
+
+# Поля, по которым можно ранжировать кандидатов
+RANK_FIELDS = ('gain', 'dissipation', 'current', 'voltage', 'swing')
+
+# Единица параметра семейства в его описании: "Ug, V", "Ib (mA)", "Ib [uA]"
+PARAMETER_UNIT_PATTERN = re.compile(r'(?:,|\(|\[)\s*(?P<unit>[^\s,()\[\]]+)\s*[)\]]?\s*$')
+
+
+def gain_unit(parameter: Optional[str]) -> Optional[str]:
+    """Единица усиления -dU/dпараметр: V/V для сеточных семейств, V/mA для токовых...
+
+    None — единица параметра в файле ВАХ не указана.
+    """
+    match = PARAMETER_UNIT_PATTERN.search(parameter or '')
+    return f"V/{match.group('unit')}" if match else None
+
+
+def intersect_load_lines(voltage: np.ndarray, current: np.ndarray, offsets: np.ndarray,
+                         supply: np.ndarray, load: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Пересечения кривых с нагрузочными прямыми (по прямой на кривую).
+
+    voltage/current — точки всех кривых подряд (ток в амперах), границы кривой i —
+    offsets[i]:offsets[i + 1]; supply/load — E и R для каждой кривой.
+    Возвращает (U, I) рабочих точек; NaN — кривая не пересекает прямую.
+    """
+    curves = len(offsets) - 1
+    result_u = np.full(curves, np.nan)
+    result_i = np.full(curves, np.nan)
+    if not len(voltage) or not curves:
+        return result_u, result_i
+
+    lengths = np.diff(offsets)
+    owner = np.repeat(np.arange(curves), lengths)
+    # f(U) = I(U) - (E - U) / R: ВАХ растёт, прямая убывает — знак меняется один раз
+    f = current - (supply[owner] - voltage) / load[owner]
+
+    # Смена знака между точками k и k+1 одной кривой
+    same_curve = owner[:-1] == owner[1:]
+    crossing = same_curve & (f[:-1] < 0) & (f[1:] >= 0)
+    candidates = np.flatnonzero(crossing)
+
+    # Для каждой кривой — первая смена знака
+    curve_ids, first = np.unique(owner[candidates], return_index=True)
+    k = candidates[first]
+    t = -f[k] / (f[k + 1] - f[k])
+    result_u[curve_ids] = voltage[k] + t * (voltage[k + 1] - voltage[k])
+    result_i[curve_ids] = current[k] + t * (current[k + 1] - current[k])
+
+    # Кривая начинается уже над прямой (пересечение левее первой точки):
+    # рабочая точка прижимается к прямой при напряжении первой точки
+    starts = offsets[:-1][lengths > 0]
+    above = starts[(f[starts] >= 0) & (voltage[starts] <= supply[owner[starts]])]
+    clipped = owner[above]
+    result_u[clipped] = voltage[above]
+    result_i[clipped] = (supply[clipped] - voltage[above]) / load[clipped]
+    return result_u, result_i
+
+
+def _concat_families(families: Sequence[CurveFamily]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Общие массивы нескольких семейств (ток в амперах) и границы семейств в списке кривых"""
+    voltage = np.concatenate([family.voltage for family in families])
+    current = np.concatenate([family.current * family.current_scale for family in families])
+    lengths = np.concatenate([np.diff(family.offsets) for family in families])
+    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+    bounds = np.concatenate(([0], np.cumsum([len(family) for family in families])))
+    return voltage, current, offsets, bounds
+
+
+def solve_batch(families: Sequence[CurveFamily], supply: float, load: float,
+                bias: Optional[Sequence[Optional[float]]] = None) -> List[Dict]:
+    """Рабочие точки для набора семейств одним векторным расчётом.
+
+    bias — значение параметра (напряжение сетки, ток базы...) для каждого семейства;
+    между кривыми рабочая точка интерполируется. Без bias берётся кривая с
+    наибольшим током при пересечении (для одиночной кривой — она сама).
+    """
+    if supply <= 0 or load <= 0:
+        raise ValueError("Supply voltage and load resistance must be positive")
+    if not families:
+        return []
+
+    voltage, current, offsets, bounds = _concat_families(families)
+    curves = len(offsets) - 1
+    op_u, op_i = intersect_load_lines(voltage, current, offsets,
+                                      np.full(curves, float(supply)), np.full(curves, float(load)))
+    values = np.concatenate([family.values for family in families])
+
+    results = []
+    for index, family in enumerate(families):
+        part = slice(bounds[index], bounds[index + 1])
+        results.append(_operating_point(family, values[part], op_u[part], op_i[part],
+                                        bias[index] if bias is not None else None))
+    return results
+
+
+def _operating_point(family: CurveFamily, values: np.ndarray, op_u: np.ndarray, op_i: np.ndarray,
+                     bias: Optional[float]) -> Dict:
+    """Рабочая точка семейства, усиление и рассеиваемая мощность"""
+    solved = ~np.isnan(op_u)
+    result = {
+        "parameter": family.parameter,
+        "intersections": [
+            {"value": None if np.isnan(value) else value, "voltage": u, "current": i}
+            for value, u, i in zip(values.tolist(), op_u.tolist(), op_i.tolist()) if u == u
+        ],
+        "operating_point": None,
+        "gain": None,
+        "gain_unit": gain_unit(family.parameter),
+        "dissipation": None,
+        "swing": None,
+    }
+    if not solved.any():
+        return result
+
+    # Кривые с известным параметром, упорядоченные по нему
+    parametric = solved & ~np.isnan(values)
+    order = np.argsort(values[parametric])
+    params, points_u, points_i = values[parametric][order], op_u[parametric][order], op_i[parametric][order]
+
+    if bias is not None and len(params) >= 2:
+        if not params[0] <= bias <= params[-1]:
+            result["error"] = f"Bias {bias} is outside the curve family range [{params[0]}, {params[-1]}]"
+            return result
+        u = float(np.interp(bias, params, points_u))
+        i = float(np.interp(bias, params, points_i))
+        value = float(bias)
+    else:
+        best = int(np.nanargmax(np.where(solved, op_i, -np.inf)))
+        u, i = float(op_u[best]), float(op_i[best])
+        value = None if np.isnan(values[best]) else float(values[best])
+
+    result["operating_point"] = {"value": value, "voltage": u, "current": i}
+    result["dissipation"] = u * i
+    if len(params) >= 2:
+        # Усиление: изменение выходного напряжения на единицу параметра (dU/dUg, dU/dIb)
+        slopes = np.gradient(points_u, params)
+        result["gain"] = float(-np.interp(value if value is not None else params[-1], params, slopes))
+        # Размах выходного напряжения по крайним кривым
+        result["swing"] = float(points_u.max() - points_u.min())
+    return result
+
+
+def rank_candidates(entries: List[Dict], rank_by: str = 'gain', limit: Optional[int] = None) -> List[Dict]:
+    """Сортирует решённых кандидатов по полю (по убыванию; нерешённые — в конце)"""
+    if rank_by not in RANK_FIELDS:
+        raise ValueError(f"Unknown rank field '{rank_by}', expected one of: {', '.join(RANK_FIELDS)}")
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        raise ValueError(f"limit must be a positive integer, got {limit!r}")
+    if rank_by == 'gain':
+        # V/V (сетка) и V/mA (ток базы) на одной шкале несравнимы
+        units = {entry.get("gain_unit") for entry in entries if entry.get("gain") is not None}
+        if len(units) > 1:
+            raise ValueError(f"Cannot rank gain across families with different units: "
+                             f"{', '.join(sorted(str(unit) for unit in units))}; filter candidates by type")
+
+    def key(entry: Dict):
+        if rank_by in ('current', 'voltage'):
+            point = entry.get("operating_point")
+            value = point[rank_by] if point else None
+        else:
+            value = entry.get(rank_by)
+        return (value is None, -(value or 0.0))
+
+    ranked = sorted(entries, key=key)
+    return ranked[:limit] if limit is not None else ranked
@@ -0,0 +1,134 @@
+"""
+Нормализация электрических параметров компонентов при загрузке каталога
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Канонические параметры -> семейство типа -> пути-источники в порядке приоритета.
+# Семейство определяется префиксом поля type (vacuum_tube_dual_triode -> vacuum_tube),
+# пути из '*' проверяются после путей семейства. Явно заданный в params канонический
+# параметр всегда имеет приоритет. Чтобы поддержать новый тип или поле, достаточно
+# дополнить эту таблицу — код эндпоинтов менять не нужно.
+RATING_SOURCES: Dict[str, Dict[str, List[str]]] = {
+    'Imax': {
+        'bjt': ['params.max_collector_current',
+                'parameters_extended.electrical.current_ratings.ic_max'],
+        'mosfet': ['params.max_drain_current',
+                   'parameters_extended.electrical.current_ratings.id_max'],
+        'diode': ['params.max_forward_current',
+                  'parameters_extended.electrical.current_ratings.if_avg'],
+        'vacuum_tube': ['parameters_extended.electrical.current_ratings.max'],
+        'transformer': ['parameters_extended.electrical.current_ratings.secondary_max'],
+        '*': ['params.max_collector_current',
+              'params.max_drain_current',
+              'params.max_forward_current'],
+    },
+    'Uce_max': {
+        'bjt': ['params.max_collector_emitter_voltage',
+                'parameters_extended.electrical.voltage_ratings.vceo'],
+        'mosfet': ['params.max_drain_source_voltage',
+                   'parameters_extended.electrical.voltage_ratings.vds_max'],
+        'diode': ['params.max_reverse_voltage',
+                  'parameters_extended.electrical.voltage_ratings.vrrm'],
+        'vacuum_tube': ['params.plate_voltage_max',
+                        'parameters_extended.electrical.voltage_ratings.max'],
+        'transformer': ['parameters_extended.electrical.voltage_ratings.primary_max'],
+        '*': ['params.max_collector_emitter_voltage',
+              'params.max_drain_source_voltage',
+              'params.max_reverse_voltage',
+              'params.plate_voltage_max'],
+    },
+    'Ptot': {
+        'vacuum_tube': ['params.plate_dissipation'],
+        'transformer': ['params.power_rating'],
+        '*': ['params.max_power_dissipation',
+              'params.power_rating',
+              'params.plate_dissipation'],
+    },
+    # Усиление: h21э (минимальное) у транзисторов, коэффициент усиления μ у ламп
+    'gain': {
+        'bjt': ['params.current_gain_min'],
+        'vacuum_tube': ['params.amplification_factor'],
+        '*': [],
+    },
+    # Крутизна (мА/В)
+    'gm': {
+        'vacuum_tube': ['params.transconductance'],
+        '*': ['params.transconductance'],
+    },
+    # Граничная частота (МГц, как в справочных данных)
+    'ft': {
+        '*': ['params.ft',
+              'parameters_extended.electrical.frequency_characteristics.ft',
+              'parameters_extended.electrical.frequency_characteristics.fmax'],
+    },
+}
+
+
+def type_family(component_type: Optional[str]) -> str:
+    """Семейство типа компонента по самому длинному известному префиксу"""
+    component_type = (component_type or '').lower()
+    families = {family for sources in RATING_SOURCES.values() for family in sources if family != '*'}
+    best = ''
+    for family in families:
+        if component_type.startswith(family) and len(family) > len(best):
+            best = family
+    return best or '*'
+
+
+def _resolve_path(component: Dict, path: str):
+    """Значение по пути вида 'parameters_extended.electrical.voltage_ratings.max'"""
+    value = component
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _as_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def resolve_rating(component: Dict, rating: str) -> float:
+    """Канонический параметр компонента по таблице RATING_SOURCES (0, если не найден)"""
+    params = component.get('params') or {}
+    explicit = _as_number(params.get(rating))
+    if explicit is not None:
+        return explicit
+
+    sources = RATING_SOURCES.get(rating, {})
+    family = type_family(component.get('type'))
+    paths = list(sources.get('*', []))
+    if family != '*':
+        paths = sources.get(family, []) + paths
+    for path in paths:
+        value = _as_number(_resolve_path(component, path))
+        if value is not None:
+            return value
+    return 0
+
+
+def normalize_components(components: List[Dict]) -> List[Dict]:
+    """Один раз вычисляет канонические параметры и записывает их в params.
+
+    Поля Imax, Uce_max, Ptot, gain, gm и ft остаются в params для обратной совместимости
+    с шаблонами и API, горячие пути читают уже готовые значения.
+    """
+    unresolved = 0
+    for component in components:
+        params = component.setdefault('params', {})
+        for rating in RATING_SOURCES:
+            params[rating] = resolve_rating(component, rating)
+            if not params[rating]:
+                unresolved += 1
+    if unresolved:
+        logger.info(f"ℹ️ Нормализация параметров: {unresolved} значений не найдено, установлено 0")
+    return components
@@ -0,0 +1,208 @@
+"""
+Правила разбора запросов без ИИ: таблица синонимов, автомат Ахо–Корасик и единицы измерения
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# ==================== ТАБЛИЦА ПРАВИЛ ====================
+
+# Слово (основа, ищется как подстрока; короткие — только с начала слова) -> (слот, значение, приоритет).
+# Для слота выбирается правило с наибольшим приоритетом, при равенстве —
+# встретившееся раньше. Чтобы добавить синоним, достаточно дополнить таблицу.
+QUERY_RULES: Dict[str, Tuple[str, object, int]] = {
+    # Типы компонентов: общее слово «транзистор» уступает уточнениям
+    'транзистор': ('type', 'bjt', 1),
+    'биполяр': ('type', 'bjt', 2),
+    'bjt': ('type', 'bjt', 2),
+    'npn': ('type', 'bjt_npn', 3),
+    'pnp': ('type', 'bjt_pnp', 3),
+    'полев': ('type', 'mosfet', 2),
+    'mosfet': ('type', 'mosfet', 2),
+    'мосфет': ('type', 'mosfet', 2),
+    'ламп': ('type', 'vacuum_tube', 2),
+    'tube': ('type', 'vacuum_tube', 2),
+    'триод': ('type', 'vacuum_tube', 2),
+    'двойной триод': ('type', 'vacuum_tube_dual_triode', 3),
+    'пентод': ('type', 'vacuum_tube_pentode', 3),
+    'тетрод': ('type', 'vacuum_tube_beam_tetrode', 3),
+    'диод': ('type', 'diode', 2),
+    'diode': ('type', 'diode', 2),
+    'трансформатор': ('type', 'transformer', 2),
+    'transformer': ('type', 'transformer', 2),
+
+    # Происхождение
+    'советск': ('origin', 'soviet', 1),
+    'отечествен': ('origin', 'soviet', 1),
+    'ссср': ('origin', 'soviet', 1),
+    'soviet': ('origin', 'soviet', 1),
+    'американ': ('origin', 'usa', 1),
+    'сша': ('origin', 'usa', 1),
+    'usa': ('origin', 'usa', 1),
+    'япон': ('origin', 'japan', 1),
+    'japan': ('origin', 'japan', 1),
+    'европ': ('origin', 'europe', 1),
+    'europe': ('origin', 'europe', 1),
+
+    # Названия величин: к ним относится следующее число без единиц
+    'мощност': ('quantity', 'power', 1),
+    'power': ('quantity', 'power', 1),
+    'ток': ('quantity', 'current', 1),
+    'current': ('quantity', 'current', 1),
+    'напряжен': ('quantity', 'voltage', 1),
+    'voltage': ('quantity', 'voltage', 1),
+
+    # Качественные оценки: применяются, если величина не задана числом
+    'мощн': ('qualifier', ('min_power', 10.0), 1),
+    'большая мощность': ('qualifier', ('min_power', 10.0), 1),
+    'высокое напряжение': ('qualifier', ('min_voltage', 100.0), 1),
+    'высоковольт': ('qualifier', ('min_voltage', 100.0), 1),
+    'большой ток': ('qualifier', ('min_current', 1.0), 1),
+    'сильноточ': ('qualifier', ('min_current', 1.0), 1),
+}
+
+# Единица измерения -> (величина, множитель к базовой единице: А, В, Вт)
+UNITS: Dict[str, Tuple[str, float]] = {
+    'мка': ('current', 1e-6), 'ua': ('current', 1e-6), 'µa': ('current', 1e-6),
+    'ма': ('current', 1e-3), 'ma': ('current', 1e-3),
+    'а': ('current', 1.0), 'a': ('current', 1.0), 'ампер': ('current', 1.0),
+    'ка': ('current', 1e3), 'ka': ('current', 1e3),
+    'мв': ('voltage', 1e-3), 'mv': ('voltage', 1e-3),
+    'в': ('voltage', 1.0), 'v': ('voltage', 1.0), 'вольт': ('voltage', 1.0),
+    'кв': ('voltage', 1e3), 'kv': ('voltage', 1e3),
+    'мвт': ('power', 1e-3), 'mw': ('power', 1e-3),
+    'вт': ('power', 1.0), 'w': ('power', 1.0), 'ватт': ('power', 1.0),
+    'квт': ('power', 1e3), 'kw': ('power', 1e3),
+}
+
+# Основы не длиннее этого ищутся только с начала слова: «ток» не должен
+# находиться в «поток» и «источник», «сша» — в «слушать»
+WORD_START_MAX_LENGTH = 3
+
+# Сколько символов после названия величины может стоять относящееся к ней число
+QUANTITY_WINDOW = 30
+
+# Число с необязательной единицей; длинные единицы проверяются раньше коротких (мвт до мв)
+NUMBER_PATTERN = re.compile(
+    r'(?<![\w.,])(?P<number>\d+(?:[.,]\d+)?)\s*(?P<unit>'
+    + '|'.join(re.escape(unit) for unit in sorted(UNITS, key=len, reverse=True))
+    + r')?(?![\w])'
+)
+# Слова перед числом, превращающие его в верхнюю границу
+UPPER_BOUND_PATTERN = re.compile(r'(?:\bдо|(?<!не )меньше|(?<!не )менее|не более|не выше|ниже|максимум|<|≤)\s*$')
+UPPER_BOUND_CONTEXT = 12
+
+
+# ==================== АВТОМАТ АХО–КОРАСИК ====================
+
+class AhoCorasick:
+    """Поиск всех вхождений набора подстрок за один проход по тексту"""
+
+    def __init__(self, patterns: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+
+        for pattern, payload in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((len(pattern), payload))
+
+        # Ссылки неудачи строятся обходом в ширину
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state].extend(self._output[self._fail[next_state]])
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """Вхождения (начало, конец, payload) в порядке окончания"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in output[state]:
+                yield position + 1 - length, position + 1, payload
+
+
+# Автомат собирается один раз при импорте
+RULE_MATCHER = AhoCorasick(QUERY_RULES)
+
+
+# ==================== РАЗБОР ЗАПРОСА ====================
+
+def normalize_question(text: str) -> str:
+    return str(text).lower().replace('ё', 'е')
+
+
+def extract_quantities(question: str, keywords: List[Tuple[int, int, str]]) -> Dict[str, float]:
+    """Числовые ограничения min_/max_<величина> с учётом единиц (мА, кВ, mW...).
+
+    Величина числа определяется единицей, а без неё — ближайшим предшествующим
+    названием величины (keywords: (начало, конец, величина)).
+    """
+    args: Dict[str, float] = {}
+    for match in NUMBER_PATTERN.finditer(question):
+        value = float(match.group('number').replace(',', '.'))
+        unit = match.group('unit')
+        if unit:
+            quantity, scale = UNITS[unit]
+        else:
+            quantity, scale = _preceding_quantity(match.start(), keywords), 1.0
+            if quantity is None:
+                continue
+
+        context = question[max(0, match.start() - UPPER_BOUND_CONTEXT):match.start()]
+        bound = 'max' if UPPER_BOUND_PATTERN.search(context) else 'min'
+        args.setdefault(f"{bound}_{quantity}", value * scale)
+    return args
+
+
+def _preceding_quantity(position: int, keywords: List[Tuple[int, int, str]]) -> Optional[str]:
+    quantity = None
+    for start, end, name in keywords:
+        if end <= position and position - end <= QUANTITY_WINDOW:
+            quantity = name
+    return quantity
+
+
+def parse_rules(question: str) -> Dict:
+    """Аргументы search_components по таблице правил"""
+    question = normalize_question(question)
+    best: Dict[str, Tuple[int, object]] = {}
+    keywords: List[Tuple[int, int, str]] = []
+    qualifiers: List[Tuple[str, float]] = []
+
+    for start, end, (slot, value, priority) in RULE_MATCHER.finditer(question):
+        if end - start <= WORD_START_MAX_LENGTH and start > 0 and question[start - 1].isalpha():
+            continue
+        if slot == 'quantity':
+            keywords.append((start, end, value))
+        elif slot == 'qualifier':
+            qualifiers.append(value)
+        elif slot not in best or priority > best[slot][0]:
+            best[slot] = (priority, value)
+
+    args = {slot: value for slot, (priority, value) in best.items()}
+    args.update(extract_quantities(question, keywords))
+    for key, value in qualifiers:
+        quantity = key.split('_', 1)[1]
+        if f"min_{quantity}" not in args and f"max_{quantity}" not in args:
+            args[key] = value
+    return args
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-import json
-import os
 import logging
+from typing import List, Optional
+
+from catalog import ComponentCatalog, SORT_COLUMNS
+from characteristics import curve_response, load_family
+from snapshot import DEFAULT_SNAPSHOT, load_catalog
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -22,17 +25,15 @@ app.add_middleware(
 # Загружаем базу компонентов при старте
 def load_components():
     try:
-        with open('components.json', 'r', encoding='utf-8') as f:
-            components = json.load(f)
-            logger.info(f"✅ Загружено {len(components)} компонентов")
-            for comp in components:
-                logger.info(f"   • {comp['id']} (тип: {comp['type']}, происхождение: {comp.get('origin', 'не указано')})")
-            return components
+        catalog, source = load_catalog('components.json', DEFAULT_SNAPSHOT)
+        logger.info(f"✅ Загружено {len(catalog)} компонентов ({source})")
+        return catalog
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки components.json: {e}")
-        return []
+        return ComponentCatalog([])
 
-components = load_components()
+catalog = load_components()
+components = catalog.components
 
 @app.get("/")
 def read_root():
@@ -57,84 +58,52 @@ def get_components(
     Ptot_max: float = Query(None, description="Максимальная мощность (W)"),
     origin: str = Query(None, description="Происхождение/страна (soviet, usa, other)"),  # НОВЫЙ ПАРАМЕТР
     search_text: str = Query(None, description="Поиск по названию и описанию"),  # НОВЫЙ ПАРАМЕТР
-    sort_by: str = Query(None, description="Поле для сортировки: 'Ptot_desc' (мощность по убыванию), 'Ptot_asc', 'Imax_desc', 'Imax_asc', 'Uce_desc', 'Uce_asc'")
+    where: str = Query(None, description="Выражение фильтра: type:bjt AND (origin:soviet OR origin:usa) AND NOT application:audio"),
+    sort_by: str = Query(None, description="Поле для сортировки: 'Ptot_desc' (мощность по убыванию), 'Ptot_asc', 'Imax_desc', 'Imax_asc', 'Uce_desc', 'Uce_asc'"),
+    limit: int = Query(None, ge=1, description="Ограничение количества результатов"),
+    offset: int = Query(0, ge=0, description="Смещение для постраничного вывода")
 ):
     """
     Получить компоненты с фильтрацией по параметрам
     """
-    logger.info(f"🔍 Запрос с параметрами: type={type}, origin={origin}, search_text={search_text}, sort_by={sort_by}")
-    
-    filtered = components.copy()
-    
-    # Применяем фильтры, если они указаны
-    if type:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['type'] == type]
-        logger.info(f"   Фильтр по типу '{type}': {original_count} → {len(filtered)} компонентов")
+    logger.info(f"🔍 Запрос с параметрами: type={type}, origin={origin}, search_text={search_text}, where={where}, sort_by={sort_by}")
     
-    if origin:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c.get('origin', '').lower() == origin.lower()]
-        logger.info(f"   Фильтр по происхождению '{origin}': {original_count} → {len(filtered)} компонентов")
+    # Разделяем sort_by на поле и порядок (например, "Ptot_desc" -> поле="Ptot", порядок="desc")
+    order_by, descending = None, False
+    if sort_by:
+        if '_' in sort_by:
+            sort_field, sort_order = sort_by.rsplit('_', 1)
+        else:
+            sort_field, sort_order = sort_by, 'asc'
+        order_by = SORT_COLUMNS.get(sort_field)
+        descending = (sort_order.lower() == 'desc')
+        if order_by:
+            logger.info(f"   Сортировка по {sort_field} в порядке {sort_order}")
+        else:
+            logger.warning(f"⚠️ Неизвестное поле сортировки: {sort_by}")
+    
+    # Фильтры на равенство, диапазоны и текст отвечаются индексами каталога;
+    # ведущим становится самый селективный из них
+    search_args = dict(
+        type=type,
+        origin=origin,
+        ranges={
+            'current': (Imax_min, Imax_max),
+            'voltage': (Uce_min, Uce_max),
+            'power': (Ptot_min, Ptot_max),
+        },
+        order_by=order_by,
+        descending=descending,
+        where=where
+    )
     
+    try:
+        filtered = catalog.search(text=search_text, limit=limit, offset=offset, **search_args)
+    except ValueError as e:
+        logger.warning(f"⚠️ Некорректное выражение фильтра '{where}': {e}")
+        return {"error": str(e)}
     if search_text:
-        original_count = len(filtered)
-        search_lower = search_text.lower()
-        filtered = [
-            c for c in filtered 
-            if search_lower in c.get('name', '').lower() 
-            or search_lower in c.get('description', '').lower()
-            or search_lower in c.get('id', '').lower()
-        ]
-        logger.info(f"   Текстовый поиск '{search_text}': {original_count} → {len(filtered)} компонентов")
-    
-    if Imax_min is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Imax'] >= Imax_min]
-        logger.info(f"   Фильтр по Imax_min={Imax_min}: {original_count} → {len(filtered)} компонентов")
-    
-    if Imax_max is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Imax'] <= Imax_max]
-        logger.info(f"   Фильтр по Imax_max={Imax_max}: {original_count} → {len(filtered)} компонентов")
-    
-    if Uce_min is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Uce_max'] >= Uce_min]
-        logger.info(f"   Фильтр по Uce_min={Uce_min}: {original_count} → {len(filtered)} компонентов")
-    
-    if Uce_max is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Uce_max'] <= Uce_max]
-        logger.info(f"   Фильтр по Uce_max={Uce_max}: {original_count} → {len(filtered)} компонентов")
-    
-    if Ptot_min is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Ptot'] >= Ptot_min]
-        logger.info(f"   Фильтр по Ptot_min={Ptot_min}: {original_count} → {len(filtered)} компонентов")
-    
-    if Ptot_max is not None:
-        original_count = len(filtered)
-        filtered = [c for c in filtered if c['params']['Ptot'] <= Ptot_max]
-        logger.info(f"   Фильтр по Ptot_max={Ptot_max}: {original_count} → {len(filtered)} компонентов")
-    
-    # СОРТИРОВКА
-    if sort_by:
-        try:
-            # Разделяем sort_by на поле и порядок (например, "Ptot_desc" -> поле="Ptot", порядок="desc")
-            if '_' in sort_by:
-                sort_field, sort_order = sort_by.split('_')
-            else:
-                sort_field, sort_order = sort_by, 'asc'
-            
-            reverse_order = (sort_order.lower() == 'desc')
-            
-            # Сортируем по указанному полу в параметрах
-            filtered.sort(key=lambda x: x['params'].get(sort_field, 0), reverse=reverse_order)
-            logger.info(f"   Отсортировано по {sort_field} в порядке {sort_order}")
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка сортировки по {sort_by}: {e}")
+        logger.info(f"   Текстовый поиск '{search_text}': {len(filtered)} компонентов (по релевантности)")
     
     logger.info(f"✅ Возвращаю {len(filtered)} компонентов")
     
@@ -150,7 +119,7 @@ def get_component(component_id: str):
     """
     logger.info(f"🔍 Запрос компонента: {component_id}")
     
-    component = next((c for c in components if c['id'] == component_id), None)
+    component = catalog.get(component_id)
     
     if not component:
         logger.warning(f"❌ Компонент '{component_id}' не найден")
@@ -160,13 +129,22 @@ def get_component(component_id: str):
     return component
 
 @app.get("/components/{component_id}/characteristics")
-def get_characteristics(component_id: str):
+def get_characteristics(
+    component_id: str,
+    points: Optional[int] = Query(None, description="Максимальное число точек (прореживание под разрешение графика)"),
+    v_min: Optional[float] = Query(None, description="Минимальное напряжение окна (V)"),
+    v_max: Optional[float] = Query(None, description="Максимальное напряжение окна (V)"),
+    method: str = Query("lttb", description="Метод прореживания: 'lttb' (форма кривой) или 'minmax' (экстремумы)"),
+    at: Optional[List[float]] = Query(None, description="Напряжения (V) для интерполяции тока; можно указать несколько"),
+    curve: Optional[float] = Query(None, description="Значение параметра семейства (Ug, Ib...): выбирается ближайшая кривая"),
+    family: bool = Query(False, description="Вернуть всё семейство кривых в колоночном виде"),
+):
     """
     Получить характеристики (ВАХ) компонента
     """
     logger.info(f"🔍 Запрос характеристик для: {component_id}")
     
-    component = next((c for c in components if c['id'] == component_id), None)
+    component = catalog.get(component_id)
     
     if not component:
         logger.warning(f"❌ Компонент '{component_id}' не найден")
@@ -174,61 +152,20 @@ def get_characteristics(component_id: str):
     
     file_path = component.get('characteristics_file')
     
-    if not file_path or not os.path.exists(file_path):
-        logger.warning(f"❌ Файл характеристик для '{component_id}' не найден: {file_path}")
-        return {"error": f"Characteristics file for '{component_id}' not found"}
-    
     try:
-        # Пробуем разные кодировки для чтения файлов
-        encodings_to_try = ['utf-8', 'windows-1251', 'cp866', 'cp1251', 'latin-1']
-        
-        for encoding in encodings_to_try:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    data = f.read()
-                logger.info(f"✅ Файл прочитан в кодировке {encoding}")
-                break
-            except UnicodeDecodeError:
-                continue
-        else:
-            # Если ни одна кодировка не подошла, используем бинарный режим с игнорированием ошибок
-            with open(file_path, 'rb') as f:
-                data = f.read().decode('utf-8', errors='ignore')
-            logger.warning(f"⚠️ Использован игнорирующий декодер для {file_path}")
+        # Кривые берутся из кэша; файл перечитывается только после изменения
+        curve_family = load_family(file_path)
         
-        # Парсим данные (формат: напряжение, ток)
-        lines = data.strip().split('\n')
-        characteristics = []
+        if curve_family is None:
+            logger.warning(f"❌ Файл характеристик для '{component_id}' не найден: {file_path}")
+            return {"error": f"Characteristics file for '{component_id}' not found"}
         
-        for line in lines:
-            # Пропускаем комментарии и пустые строки
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            # Заменяем запятые на пробелы и разбиваем
-            parts = line.replace(',', ' ').split()
-            
-            if len(parts) >= 2:
-                try:
-                    voltage = float(parts[0])
-                    current = float(parts[1])
-                    
-                    characteristics.append({
-                        "voltage": voltage,
-                        "current": current
-                    })
-                except ValueError as e:
-                    logger.warning(f"⚠️ Ошибка парсинга строки '{line}': {e}")
-                    continue
+        logger.info(f"✅ Загружено {curve_family.point_count} точек ВАХ ({len(curve_family)} кривых) для '{component_id}'")
         
-        logger.info(f"✅ Загружено {len(characteristics)} точек ВАХ для '{component_id}'")
-        
-        return {
-            "component_id": component_id,
-            "characteristics": characteristics
-        }
+        return curve_response(component_id, curve_family, points, v_min, v_max, method, at, curve, family)
         
+    except ValueError as e:
+        return {"error": str(e)}
     except Exception as e:
         logger.error(f"❌ Ошибка чтения характеристик: {str(e)}")
         return {"error": f"Error reading characteristics: {str(e)}"}
@@ -0,0 +1,95 @@
+"""
+Индекс похожести компонентов: векторный подсчёт общих признаков и выбор top-k
+"""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from columns import ColumnStore
+
+logger = logging.getLogger(__name__)
+
+# Веса признаков в половинах балла: совпадение типа — 3, происхождения — 1, общий тег — 0.5
+TYPE_UNITS = 6
+ORIGIN_UNITS = 2
+TAG_UNITS = 1
+
+
+class SimilarityIndex:
+    """Похожесть компонентов поверх кодов колоночного хранилища.
+
+    Признаки компонента — коды type/origin и коды тегов (CSR по семействам),
+    поэтому оценка для всего каталога — это разреженное скалярное произведение:
+    совпадения типа и происхождения сравниваются векторно, общие теги считаются
+    через np.isin по кодам тегов и np.bincount по владельцам.
+    Top-k выбирается через argpartition, без сортировки всего каталога.
+    """
+
+    def __init__(self, columns: ColumnStore, tag_families: List[str]):
+        self.size = columns.size
+        self.type_codes = columns.codes['type']
+        self.origin_codes = columns.codes['origin']
+        self.tags = [
+            (columns.tag_offsets[family], columns.tag_codes[family], columns.tag_owners[family])
+            for family in tag_families if family in columns.tag_codes
+        ]
+        # Необязательная таблица соседей: top-k для каждого компонента
+        self.table_k = 0
+        self._table: Optional[np.ndarray] = None
+        self._table_units: Optional[np.ndarray] = None
+
+    def score_units(self, ordinal: int) -> np.ndarray:
+        """Оценка похожести всех компонентов на заданный (в половинах балла)"""
+        units = np.zeros(self.size, dtype=np.int32)
+        type_code = self.type_codes[ordinal]
+        if type_code >= 0:
+            units += (self.type_codes == type_code) * TYPE_UNITS
+        origin_code = self.origin_codes[ordinal]
+        if origin_code >= 0:
+            units += (self.origin_codes == origin_code) * ORIGIN_UNITS
+
+        for offsets, codes, owners in self.tags:
+            target_codes = codes[offsets[ordinal]:offsets[ordinal + 1]]
+            if len(target_codes):
+                shared = owners[np.isin(codes, target_codes)]
+                units += np.bincount(shared, minlength=self.size).astype(np.int32) * TAG_UNITS
+        return units
+
+    def _top_k(self, ordinal: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        units = self.score_units(ordinal)
+        units[ordinal] = 0
+        candidates = np.flatnonzero(units > 0)
+        if len(candidates) > k:
+            # Уникальный ключ: больше баллов — выше, при равенстве — раньше в каталоге
+            key = units[candidates].astype(np.int64) * self.size - candidates
+            candidates = candidates[np.argpartition(-key, k - 1)[:k]]
+        order = np.lexsort((candidates, -units[candidates]))
+        top = candidates[order]
+        return top, units[top]
+
+    def top_k(self, ordinal: int, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordinal k самых похожих компонентов и их оценки (по убыванию оценки)"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if self._table is not None and k <= self.table_k:
+            neighbors = self._table[ordinal, :k]
+            found = neighbors >= 0
+            return neighbors[found], self._table_units[ordinal, :k][found] / 2
+        top, units = self._top_k(ordinal, k)
+        return top, units / 2
+
+    def precompute(self, k: int):
+        """Строит таблицу top-k соседей для всех компонентов (запросы с k не больше — поиск в таблице)"""
+        started = time.perf_counter()
+        table = np.full((self.size, k), -1, dtype=np.int64)
+        table_units = np.zeros((self.size, k), dtype=np.int32)
+        for ordinal in range(self.size):
+            top, units = self._top_k(ordinal, k)
+            table[ordinal, :len(top)] = top
+            table_units[ordinal, :len(top)] = units
+        self._table, self._table_units, self.table_k = table, table_units, k
+        logger.info(f"🧭 Таблица похожих компонентов: {self.size} x {k} "
+                    f"за {time.perf_counter() - started:.2f} с")
@@ -0,0 +1,302 @@
+"""
+Бинарный снимок каталога: колонки, индексы и записи в одном файле,
+отображаемом в память (mmap) всеми воркерами.
+
+Сборка снимка (один раз перед запуском воркеров):
+    python snapshot.py [components.json] [components.snapshot]
+"""
+
+import json
+import logging
+import os
+import sys
+from functools import lru_cache
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from catalog import ComponentCatalog
+from columns import ColumnStore
+from text_index import TextIndex
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'ECLSNAP1'
+SNAPSHOT_VERSION = 3
+# Выравнивание массивов в файле (байт)
+ALIGNMENT = 64
+
+DEFAULT_SOURCE = 'components.json'
+DEFAULT_SNAPSHOT = os.getenv('CATALOG_SNAPSHOT', 'components.snapshot')
+# Сколько декодированных записей держит каждый воркер (остальные читаются из mmap заново)
+RECORD_CACHE_SIZE = int(os.getenv('SNAPSHOT_RECORD_CACHE_SIZE', '4096'))
+
+
+# ==================== ЛЕНИВЫЕ СТРУКТУРЫ ====================
+
+class SnapshotRecords(Sequence):
+    """Записи компонентов из снимка: JSON записи декодируется при обращении.
+
+    Декодированные записи хранятся в ограниченном LRU, чтобы куча воркера
+    не превращалась со временем в частную копию всего каталога.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, cache_size: int = RECORD_CACHE_SIZE):
+        self._blob = blob
+        self._offsets = offsets
+        self._decode = lru_cache(maxsize=max(cache_size, 0))(self._load)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(int(index))
+
+    def _load(self, index: int) -> Dict:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return json.loads(self._blob[start:end].tobytes())
+
+    def cache_info(self):
+        """Статистика LRU декодированных записей (hits, misses, currsize)"""
+        return self._decode.cache_info()
+
+
+class SortedKeyIndex(Mapping):
+    """Отображение ID -> ordinal поверх отсортированного массива ключей (бинарный поиск)"""
+
+    def __init__(self, keys: np.ndarray, ordinals: np.ndarray):
+        self._keys = keys
+        self._ordinals = ordinals
+
+    def _position(self, key) -> Optional[int]:
+        if not isinstance(key, str):
+            return None
+        encoded = key.encode('utf-8')
+        position = int(np.searchsorted(self._keys, encoded))
+        if position < len(self._keys) and self._keys[position] == encoded:
+            return position
+        return None
+
+    def __getitem__(self, key) -> int:
+        position = self._position(key)
+        if position is None:
+            raise KeyError(key)
+        return int(self._ordinals[position])
+
+    def __contains__(self, key) -> bool:
+        return self._position(key) is not None
+
+    def __iter__(self):
+        return (key.decode('utf-8') for key in self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# ==================== ЗАПИСЬ ====================
+
+def _source_stamp(source_path: str) -> Dict:
+    stat = os.stat(source_path)
+    return {"path": os.path.basename(source_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _bytes_array(values: List[str]) -> np.ndarray:
+    if not values:
+        return np.empty(0, dtype='S1')
+    return np.array([value.encode('utf-8') for value in values], dtype=bytes)
+
+
+def _flatten_postings(indexes: Dict[str, Dict[str, np.ndarray]], parts: List[np.ndarray]) -> Dict:
+    """Списки ordinal всех индексов -> общий массив; в метаданных — границы [start, end)"""
+    position = sum(len(part) for part in parts)
+    bounds = {}
+    for name, index in indexes.items():
+        bounds[name] = {}
+        for key, postings in index.items():
+            parts.append(np.asarray(postings, dtype=np.int64))
+            bounds[name][key] = [position, position + len(postings)]
+            position += len(postings)
+    return bounds
+
+
+def write_snapshot(catalog: ComponentCatalog, path: str, source_path: Optional[str] = None):
+    """Сохраняет скомпилированный каталог в бинарный снимок (атомарной заменой файла)"""
+    arrays: Dict[str, np.ndarray] = {}
+
+    # Записи: JSON подряд + смещения
+    encoded = [json.dumps(component, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+               for component in catalog.components]
+    arrays['records.blob'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    arrays['records.offsets'] = np.concatenate(
+        ([0], np.cumsum([len(item) for item in encoded], dtype=np.int64))).astype(np.int64)
+
+    # ID -> ordinal: отсортированные ключи для бинарного поиска
+    ids = sorted(catalog.by_id)
+    arrays['ids.keys'] = _bytes_array(ids)
+    arrays['ids.ordinals'] = np.asarray([catalog.by_id[key] for key in ids], dtype=np.int64)
+
+    postings_parts: List[np.ndarray] = []
+    indexes = {'type': catalog.by_type, 'origin': catalog.by_origin}
+    indexes.update({f"tag:{family}": index for family, index in catalog.by_tag.items()})
+    bounds = _flatten_postings(indexes, postings_parts)
+    arrays['postings'] = np.concatenate(postings_parts) if postings_parts else np.empty(0, dtype=np.int64)
+
+    arrays.update({f"columns.{name}": array for name, array in catalog.columns.arrays().items()})
+    arrays.update({f"text.{name}": array for name, array in catalog.text.arrays().items()})
+
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "count": len(catalog.components),
+        "source": _source_stamp(source_path) if source_path else None,
+        "postings": bounds,
+        "labels": {family: dict(labels) for family, labels in catalog.labels.items()},
+        "column_vocab": catalog.columns.vocab,
+        "arrays": {},
+    }
+
+    # Смещения массивов отсчитываются от начала области данных, идущей после заголовка
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        layout.append((offset, array))
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header["data_start"] = data_start
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    while len(SNAPSHOT_MAGIC) + 8 + len(header_bytes) > data_start:
+        data_start += ALIGNMENT
+        header["data_start"] = data_start
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for array_offset, array in layout:
+            f.seek(data_start + array_offset)
+            f.write(array.tobytes())
+    # Воркеры, уже отобразившие старый файл, продолжают читать его до перезапуска
+    os.replace(temp_path, path)
+    logger.info(f"💾 Снимок каталога записан: {path} ({len(catalog.components)} компонентов, "
+                f"{os.path.getsize(path) / 1e6:.1f} МБ)")
+
+
+# ==================== ЧТЕНИЕ ====================
+
+def read_header(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path}: не снимок каталога")
+        length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(length))
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: неподдерживаемая версия снимка {header.get('version')}")
+    return header
+
+
+def read_snapshot(path: str) -> ComponentCatalog:
+    """Открывает снимок только для чтения через mmap.
+
+    Массивы — представления поверх отображённого файла: данные не копируются,
+    страницы общие для всех процессов, время открытия не зависит от размера каталога.
+    """
+    header = read_header(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    data_start = header["data_start"]
+
+    def array(name: str) -> np.ndarray:
+        spec = header["arrays"][name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+        if not count:
+            return np.empty(spec["shape"], dtype=dtype)
+        start = data_start + spec["offset"]
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+
+    postings = array('postings')
+
+    def index(name: str) -> Dict[str, np.ndarray]:
+        return {key: postings[start:end] for key, (start, end) in header["postings"].get(name, {}).items()}
+
+    by_tag = {name[len('tag:'):]: index(name) for name in header["postings"] if name.startswith('tag:')}
+
+    columns = ColumnStore.from_arrays(
+        header["count"],
+        {name[len('columns.'):]: array(name) for name in header["arrays"] if name.startswith('columns.')},
+        header["column_vocab"],
+    )
+    text = TextIndex.from_arrays(
+        {name[len('text.'):]: array(name) for name in header["arrays"] if name.startswith('text.')})
+
+    catalog = ComponentCatalog.from_parts(
+        components=SnapshotRecords(array('records.blob'), array('records.offsets')),
+        by_id=SortedKeyIndex(array('ids.keys'), array('ids.ordinals')),
+        by_type=index('type'),
+        by_origin=index('origin'),
+        by_tag=by_tag,
+        labels=header["labels"],
+        columns=columns,
+        text=text,
+    )
+    logger.info(f"⚡ Каталог открыт из снимка {path}: {header['count']} компонентов")
+    return catalog
+
+
+def is_fresh(path: str, source_path: str) -> bool:
+    """Снимок существует и собран из текущей версии исходного JSON"""
+    if not os.path.exists(path):
+        return False
+    try:
+        header = read_header(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Снимок каталога не читается: {e}")
+        return False
+    if not os.path.exists(source_path):
+        return True
+    stamp = _source_stamp(source_path)
+    source = header.get("source") or {}
+    return source.get("size") == stamp["size"] and source.get("mtime_ns") == stamp["mtime_ns"]
+
+
+# ==================== ЗАГРУЗКА ====================
+
+def build_snapshot(source_path: str = DEFAULT_SOURCE, path: str = DEFAULT_SNAPSHOT) -> ComponentCatalog:
+    """Компилирует components.json в снимок и возвращает каталог"""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        catalog = ComponentCatalog(json.load(f))
+    write_snapshot(catalog, path, source_path)
+    return catalog
+
+
+def load_catalog(source_path: str = DEFAULT_SOURCE, path: str = DEFAULT_SNAPSHOT) -> Tuple[ComponentCatalog, str]:
+    """Каталог из актуального снимка, иначе из JSON.
+
+    Возвращает (каталог, источник: 'snapshot' или 'json').
+    """
+    if path and is_fresh(path, source_path):
+        return read_snapshot(path), 'snapshot'
+    if path and os.path.exists(path):
+        logger.warning(f"⚠️ Снимок {path} устарел — каталог загружается из {source_path}. "
+                       f"Пересоберите снимок: python snapshot.py")
+    with open(source_path, 'r', encoding='utf-8') as f:
+        return ComponentCatalog(json.load(f)), 'json'
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT
+    build_snapshot(source, target)
@@ -380,7 +380,8 @@ async function sendOpenRouterQuery(userQuestion) {
                 model: 'deepseek/deepseek-chat',
                 messages: messages,
                 temperature: 0.1,
-                max_tokens: 1000
+                max_tokens: 1000,
+                stream: true
             })
         });
 
@@ -396,6 +397,16 @@ async function sendOpenRouterQuery(userQuestion) {
             throw new Error(errorMessage);
         }
 
+        // Потоковый ответ (SSE) отрисовывается по мере поступления токенов
+        if ((response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+            return {
+                success: true,
+                stream: response.body,
+                response: '',
+                mode: 'openrouter_chat'
+            };
+        }
+
         const data = await response.json();
         return {
             success: true,
@@ -457,8 +468,51 @@ async function sendAiQuery(userQuestion) {
     }
 }
 
+// Функция для чтения SSE-потока OpenRouter: вызывает onText с накопленным текстом
+async function readOpenRouterStream(stream, onText) {
+    const reader = stream.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // События SSE разделены пустой строкой; неполный хвост ждёт следующего чанка
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        let changed = false;
+        
+        for (const line of lines) {
+            if (!line.startsWith('data:')) continue;  // комментарии ": OPENROUTER PROCESSING"
+            const data = line.slice(5).trim();
+            if (data === '[DONE]') continue;
+            try {
+                const event = JSON.parse(data);
+                if (event.error) {
+                    throw new Error(event.error.message || 'Ошибка OpenRouter');
+                }
+                const delta = event.choices?.[0]?.delta?.content;
+                if (delta) {
+                    text += delta;
+                    changed = true;
+                }
+            } catch (e) {
+                if (e instanceof SyntaxError) continue;
+                throw e;
+            }
+        }
+        
+        if (changed) onText(text);
+    }
+    
+    return text;
+}
+
 // Функция для отображения ответа от OpenRouter
-function displayOpenRouterResponse(question, result) {
+async function displayOpenRouterResponse(question, result) {
     const resultsDiv = document.getElementById('ai-results');
     
     if (!result.success) {
@@ -493,7 +547,7 @@ function displayOpenRouterResponse(question, result) {
                 </div>
                 <div class="card-body">
                     <div class="ai-response-content">
-                        ${formatAiResponse(result.response)}
+                        ${result.stream ? '<span class="spinner-border spinner-border-sm text-success" role="status"></span>' : formatAiResponse(result.response)}
                     </div>
                 </div>
             </div>
@@ -510,6 +564,34 @@ function displayOpenRouterResponse(question, result) {
     `;
     
     resultsDiv.innerHTML = html;
+    
+    if (!result.stream) return;
+    
+    // Отрисовываем токены по мере поступления (не чаще одного раза за кадр)
+    const contentDiv = resultsDiv.querySelector('.ai-response-content');
+    const loadingDiv = document.getElementById('ai-loading');
+    if (loadingDiv) loadingDiv.style.display = 'none';
+    
+    let streamedText = '';
+    let frameScheduled = false;
+    const render = (text) => {
+        streamedText = text;
+        if (frameScheduled) return;
+        frameScheduled = true;
+        requestAnimationFrame(() => {
+            frameScheduled = false;
+            contentDiv.innerHTML = formatAiResponse(streamedText);
+        });
+    };
+    
+    try {
+        streamedText = await readOpenRouterStream(result.stream, render) || 'Нет ответа от ИИ';
+    } catch (error) {
+        console.error('Ошибка чтения потока OpenRouter:', error);
+        streamedText += `\n\n⚠️ Ответ прерван: ${error.message}`;
+    }
+    result.response = streamedText;
+    contentDiv.innerHTML = formatAiResponse(result.response);
 }
 
 // Функция для создания графика ВАХ с использованием Chart.js
@@ -818,7 +900,11 @@ async function showComponentVah(componentId) {
     try {
         showNotification(`Загрузка характеристик компонента ${componentId}...`, 'info');
         
-        const response = await fetch(`/api/components/${encodeURIComponent(componentId)}/characteristics`);
+        // Число точек — по ширине графика в физических пикселях, а не по размеру записи
+        const container = document.getElementById('ai-results');
+        const chartWidth = (container?.clientWidth || window.innerWidth) * (window.devicePixelRatio || 1);
+        const points = Math.max(100, Math.round(chartWidth));
+        const response = await fetch(`/api/components/${encodeURIComponent(componentId)}/characteristics?points=${points}`);
         
         if (!response.ok) {
             throw new Error(`Ошибка загрузки характеристик: ${response.status}`);
@@ -828,7 +914,8 @@ async function showComponentVah(componentId) {
         
         // Отображаем характеристики
         const resultsDiv = document.getElementById('ai-results');
-        const html = `
+        const totalPoints = data.total_points ?? data.characteristics.length;
+        let html = `
             <div class="ai-response">
                 <div class="d-flex justify-content-between align-items-center mb-3">
                     <h5><i class="fas fa-chart-line text-success"></i> ВАХ компонента ${escapeHtml(componentId)}</h5>
@@ -846,7 +933,7 @@ async function showComponentVah(componentId) {
                         </div>
                         <div>
                             <h5 class="mb-0">ВАХ компонента <strong>${escapeHtml(componentId)}</strong></h5>
-                            <p class="mb-0">Количество точек данных: ${data.characteristics.length}</p>
+                            <p class="mb-0">Количество точек данных: ${totalPoints}${totalPoints > data.characteristics.length ? ` (на графике ${data.characteristics.length})` : ''}</p>
                         </div>
                     </div>
                 </div>
@@ -1128,7 +1215,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (result) {
                     if (result.success) {
                         if (queryType === 'chat') {
-                            displayOpenRouterResponse(userQuestion, result);
+                            await displayOpenRouterResponse(userQuestion, result);
                         } else {
                             displayBrainResponse(userQuestion, result);
                         }
@@ -0,0 +1,216 @@
+"""
+Поиск замен по электрическим параметрам: KD-дерево над логарифмами номиналов
+
+Замена должна быть «не хуже» исходного компонента: каждый учитываемый номинал
+(мощность, напряжение, ток, усиление, крутизна, частота) не меньше, чем у него.
+Среди таких кандидатов выбираются ближайшие в пространстве log10(номинал),
+нормированном на разброс по каталогу, — то есть с наименьшим «запасом».
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Номинал (поле params) -> числовая колонка каталога; для всех больше — лучше
+SUBSTITUTE_RATINGS = {
+    'Ptot': 'power',
+    'Uce_max': 'voltage',
+    'Imax': 'current',
+    'gain': 'gain',
+    'gm': 'transconductance',
+    'ft': 'frequency',
+}
+
+# Точек в листе дерева: листья проверяются векторно
+LEAF_SIZE = 32
+
+
+class KDTree:
+    """KD-дерево в плоских массивах: узел хранит границы своих точек (bounding box),
+    диапазон [start, end) в переставленном массиве индексов и двух потомков (-1 у листа)"""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE):
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.index = np.arange(len(points), dtype=np.int64)
+        lows, highs, ranges, children = [], [], [], []
+
+        # Построение без рекурсии: (узел, start, end)
+        stack = [(self._add_node(lows, highs, ranges, children, 0, len(points)), 0, len(points))]
+        while stack:
+            node, start, end = stack.pop()
+            if end - start <= leaf_size:
+                continue
+            block = self.points[self.index[start:end]]
+            axis = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            middle = (end - start) // 2
+            order = np.argpartition(block[:, axis], middle)
+            self.index[start:end] = self.index[start:end][order]
+            split = start + middle
+            left = self._add_node(lows, highs, ranges, children, start, split)
+            right = self._add_node(lows, highs, ranges, children, split, end)
+            children[node] = (left, right)
+            stack.append((left, start, split))
+            stack.append((right, split, end))
+
+        self.lows = np.asarray(lows).reshape(-1, self.points.shape[1])
+        self.highs = np.asarray(highs).reshape(-1, self.points.shape[1])
+        self.ranges = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+        self.children = np.asarray(children, dtype=np.int64).reshape(-1, 2)
+
+    def _add_node(self, lows, highs, ranges, children, start: int, end: int) -> int:
+        block = self.points[self.index[start:end]]
+        dims = self.points.shape[1]
+        lows.append(block.min(axis=0) if len(block) else np.full(dims, np.inf))
+        highs.append(block.max(axis=0) if len(block) else np.full(dims, -np.inf))
+        ranges.append((start, end))
+        children.append((-1, -1))
+        return len(ranges) - 1
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def query_dominating(self, target: np.ndarray, k: int,
+                         exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """k ближайших к target точек среди тех, что не меньше его по всем осям.
+
+        Возвращает (номера точек, расстояния) по возрастанию расстояния.
+        Узлы, целиком лежащие ниже target хотя бы по одной оси или дальше
+        текущего k-го результата, отсекаются без просмотра.
+        """
+        best: List[Tuple[float, int]] = []   # max-куча по расстоянию: (-d, точка)
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if np.any(self.highs[node] < target):
+                continue
+            # Ближайшая к target точка узла в допустимой области (не меньше target)
+            gap = np.maximum(self.lows[node] - target, 0.0)
+            bound = float(gap @ gap)
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+
+            left, right = self.children[node]
+            if left < 0:
+                start, end = self.ranges[node]
+                ids = self.index[start:end]
+                block = self.points[ids]
+                valid = np.all(block >= target, axis=1)
+                if exclude is not None:
+                    valid &= ids != exclude
+                deltas = block[valid] - target
+                for distance, point in zip(np.einsum('ij,ij->i', deltas, deltas).tolist(), ids[valid].tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, point))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, point))
+                continue
+
+            # Сначала более близкий потомок — быстрее сужается граница отсечения
+            near_left = float(np.sum(np.maximum(self.lows[left] - target, 0.0) ** 2)) <= \
+                float(np.sum(np.maximum(self.lows[right] - target, 0.0) ** 2))
+            stack.extend((right, left) if near_left else (left, right))
+
+        best.sort(key=lambda item: (-item[0], item[1]))
+        return (np.asarray([point for _, point in best], dtype=np.int64),
+                np.sqrt(np.asarray([-distance for distance, _ in best], dtype=np.float64)))
+
+
+class SubstituteIndex:
+    """Деревья замен по каталогу: отдельное дерево на тип и набор номиналов.
+
+    Дерево строится при первом запросе для сочетания (тип, номиналы) и живёт
+    вместе с каталогом — при перезагрузке каталога индекс создаётся заново.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._trees: Dict[Tuple[str, Tuple[str, ...]], Tuple[KDTree, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def ratings(self, ordinal: int) -> Dict[str, float]:
+        """Известные (ненулевые) номиналы компонента"""
+        numeric = self.catalog.columns.numeric
+        return {
+            rating: float(numeric[column][ordinal])
+            for rating, column in SUBSTITUTE_RATINGS.items()
+            if numeric[column][ordinal] > 0
+        }
+
+    def _tree(self, type: str, ratings: Tuple[str, ...]) -> Tuple[KDTree, np.ndarray, np.ndarray]:
+        """(дерево, ordinal точек, масштаб осей) для типа и набора номиналов"""
+        key = (type, ratings)
+        with self._lock:
+            cached = self._trees.get(key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        numeric = self.catalog.columns.numeric
+        ordinals = np.asarray(self.catalog.type_postings(type), dtype=np.int64)
+        values = np.column_stack([numeric[SUBSTITUTE_RATINGS[rating]][ordinals] for rating in ratings])
+        # В дерево попадают только компоненты, у которых известны все номиналы
+        known = np.all(values > 0, axis=1)
+        ordinals, logs = ordinals[known], np.log10(values[known])
+        scale = logs.std(axis=0) if len(logs) > 1 else np.ones(len(ratings))
+        scale[~(scale > 0)] = 1.0
+        tree = KDTree(logs / scale)
+
+        with self._lock:
+            self._trees[key] = (tree, ordinals, scale)
+        logger.info(f"🌳 Дерево замен {type} [{', '.join(ratings)}]: {len(ordinals)} компонентов "
+                    f"за {(time.perf_counter() - started) * 1000:.1f} мс")
+        return tree, ordinals, scale
+
+    def find(self, component_id: str, limit: int = 5, type: Optional[str] = None,
+             ratings: Optional[Sequence[str]] = None) -> Optional[Dict]:
+        """Замены «не хуже» компонента; None, если компонента нет в каталоге"""
+        ordinal = self.catalog.by_id.get(component_id)
+        if ordinal is None:
+            return None
+        unknown = [rating for rating in ratings or [] if rating not in SUBSTITUTE_RATINGS]
+        if unknown:
+            raise ValueError(f"Unknown ratings: {', '.join(unknown)}; "
+                             f"expected: {', '.join(SUBSTITUTE_RATINGS)}")
+
+        component = self.catalog.components[ordinal]
+        type = type or component.get('type')
+        target_ratings = self.ratings(ordinal)
+        used = tuple(rating for rating in (ratings or SUBSTITUTE_RATINGS) if rating in target_ratings)
+        result = {
+            "target_component": component_id,
+            "type": type,
+            "ratings_used": list(used),
+            "target_ratings": {rating: target_ratings[rating] for rating in used},
+            "known_substitutes": component.get('substitutes', []),
+            "substitutes": [],
+        }
+        if not used or not type or limit <= 0:
+            return result
+
+        tree, ordinals, scale = self._tree(type, used)
+        if not len(tree):
+            return result
+        target = np.log10([target_ratings[rating] for rating in used]) / scale
+        # Исходный компонент (если он в дереве) исключается по номеру точки
+        own = np.flatnonzero(ordinals == ordinal)
+        points, distances = tree.query_dominating(target, limit, int(own[0]) if len(own) else None)
+
+        for point, distance in zip(points.tolist(), distances.tolist()):
+            candidate = self.catalog.components[int(ordinals[point])]
+            candidate_ratings = {rating: float(self.catalog.columns.numeric[SUBSTITUTE_RATINGS[rating]][ordinals[point]])
+                                 for rating in used}
+            result["substitutes"].append({
+                "component": candidate,
+                "distance": round(distance, 4),
+                "ratings": candidate_ratings,
+                # Во сколько раз номинал замены больше исходного
+                "margins": {rating: round(candidate_ratings[rating] / target_ratings[rating], 3) for rating in used},
+            })
+        return result
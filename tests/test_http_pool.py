@@ -0,0 +1,161 @@
+"""
+HostLimitedTransport: лимит одновременных запросов на хост поверх заглушки апстрима (httpx.MockTransport)
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from http_pool import HostLimitedTransport, create_pooled_client
+
+# Сколько ждать запрос, который должен (или не должен) получить слот
+WAIT = 0.2
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Потоковое тело ответа (как SSE): несколько чанков, закрытие отмечается"""
+
+    def __init__(self, chunks=(b"data: 1\n\n", b"data: 2\n\n", b"data: [DONE]\n\n")):
+        self.chunks = chunks
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+def make_client(per_host_limit: int, handler=None):
+    streams = []
+
+    def stream_handler(request: httpx.Request) -> httpx.Response:
+        stream = ChunkedStream()
+        streams.append(stream)
+        return httpx.Response(200, stream=stream)
+
+    client = create_pooled_client({"per_host_limit": per_host_limit},
+                                  transport=httpx.MockTransport(handler or stream_handler))
+    return client, streams
+
+
+async def open_stream(client: httpx.AsyncClient, url: str = "https://upstream.test/chat") -> httpx.Response:
+    return await client.send(client.build_request("POST", url), stream=True)
+
+
+async def acquires_slot(client: httpx.AsyncClient, url: str = "https://upstream.test/chat") -> bool:
+    """Получает ли новый потоковый запрос слот за WAIT секунд (ответ сразу закрывается)"""
+    try:
+        response = await asyncio.wait_for(open_stream(client, url), WAIT)
+    except asyncio.TimeoutError:
+        return False
+    await response.aclose()
+    return True
+
+
+def test_per_host_limit_blocks_extra_streams():
+    async def scenario():
+        client, _ = make_client(per_host_limit=2)
+        first = await open_stream(client)
+        second = await open_stream(client)
+
+        third = asyncio.ensure_future(open_stream(client))
+        await asyncio.sleep(WAIT)
+        assert not third.done(), "третий поток не должен получить слот при лимите 2"
+
+        # Закрытие одного потока освобождает слот для ожидающего
+        await first.aclose()
+        third_response = await asyncio.wait_for(third, WAIT)
+        await second.aclose()
+        await third_response.aclose()
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slot_released_after_full_read():
+    async def scenario():
+        client, streams = make_client(per_host_limit=1)
+        response = await open_stream(client)
+        assert [chunk async for chunk in response.aiter_raw()] == list(ChunkedStream().chunks)
+        await response.aclose()
+
+        assert streams[0].closed
+        assert await acquires_slot(client)
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slot_released_on_early_close():
+    async def scenario():
+        client, streams = make_client(per_host_limit=1)
+        response = await open_stream(client)
+        # Клиент прочитал один чанк и отключился
+        async for _ in response.aiter_raw():
+            break
+        await response.aclose()
+
+        assert streams[0].closed
+        assert await acquires_slot(client)
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slot_released_when_closed_before_reading():
+    async def scenario():
+        client, _ = make_client(per_host_limit=1)
+        response = await open_stream(client)
+        await response.aclose()
+
+        assert await acquires_slot(client)
+        # Повторное закрытие не освобождает слот второй раз
+        await response.aclose()
+        held = await open_stream(client)
+        assert not await acquires_slot(client)
+        await held.aclose()
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_buffered_response_does_not_hold_slot():
+    async def scenario():
+        client, _ = make_client(per_host_limit=1, handler=lambda request: httpx.Response(200, json={"ok": True}))
+        for _ in range(3):
+            response = await asyncio.wait_for(client.post("https://upstream.test/chat"), WAIT)
+            assert response.json() == {"ok": True}
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_limit_is_per_host():
+    async def scenario():
+        client, _ = make_client(per_host_limit=1)
+        held = await open_stream(client, "https://first.test/chat")
+
+        assert not await acquires_slot(client, "https://first.test/chat")
+        assert await acquires_slot(client, "https://second.test/chat")
+        await held.aclose()
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slot_released_when_upstream_fails():
+    def failing(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("upstream down", request=request)
+
+    async def scenario():
+        transport = HostLimitedTransport(httpx.MockTransport(failing), per_host_limit=1)
+        client = httpx.AsyncClient(transport=transport)
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await asyncio.wait_for(client.get("https://upstream.test/"), WAIT)
+        await client.aclose()
+
+    asyncio.run(scenario())
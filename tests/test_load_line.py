@@ -0,0 +1,47 @@
+"""
+Нагрузочная прямая: ранжирование кандидатов и проверка входных данных /api/load-line/rank
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from load_line import rank_candidates
+
+ENTRIES = [
+    {"component_id": "A", "gain": 10.0, "gain_unit": "V/V"},
+    {"component_id": "B", "gain": 30.0, "gain_unit": "V/V"},
+    {"component_id": "C", "gain": None, "gain_unit": "V/V"},
+]
+
+
+def test_rank_candidates_limit():
+    assert [entry["component_id"] for entry in rank_candidates(ENTRIES)] == ["B", "A", "C"]
+    assert [entry["component_id"] for entry in rank_candidates(ENTRIES, limit=1)] == ["B"]
+    assert len(rank_candidates(ENTRIES, limit=10)) == 3
+
+
+@pytest.mark.parametrize("limit", [0, -1, "x", 1.5, True])
+def test_rank_candidates_rejects_invalid_limit(limit):
+    with pytest.raises(ValueError, match="limit"):
+        rank_candidates(ENTRIES, limit=limit)
+
+
+@pytest.fixture(scope="module")
+def client():
+    from web_app import app
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("limit", [0, -1, "x", 2.5, False])
+def test_rank_endpoint_rejects_invalid_limit(client, limit):
+    response = client.post("/api/load-line/rank", json={
+        "supply": 250, "load": 100000, "type": "vacuum_tube", "limit": limit})
+    assert response.status_code == 400
+    assert "limit" in response.json()["error"]
+
+
+def test_rank_endpoint_applies_limit(client):
+    response = client.post("/api/load-line/rank", json={
+        "supply": 250, "load": 100000, "type": "vacuum_tube", "limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) <= 1
@@ -0,0 +1,45 @@
+"""
+Пагинация поиска: границы limit/offset в /api/components/search/extended и /api/components/by-tag;
+разбор sort_by страницы поиска
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client():
+    from web_app import app
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"offset": -1}])
+def test_extended_search_rejects_invalid_paging(client, params):
+    assert client.get("/api/components/search/extended", params=params).status_code == 422
+
+
+def test_extended_search_pages(client):
+    first = client.get("/api/components/search/extended", params={"limit": 2}).json()
+    assert first["count"] == 2 and first["next_offset"] == 2
+    second = client.get("/api/components/search/extended", params={"limit": 2, "offset": 2}).json()
+    assert second["offset"] == 2
+    assert not {c["id"] for c in first["components"]} & {c["id"] for c in second["components"]}
+
+
+def test_by_tag_rejects_negative_limit(client):
+    assert client.get("/api/components/by-tag/amplification", params={"limit": -1}).status_code == 422
+
+
+@pytest.mark.parametrize("sort_by, expected", [
+    ("Ptot_desc", ("power", True)),
+    ("Imax_asc", ("current", False)),
+    ("Uce_max", ("voltage", True)),
+    ("Uce_max_asc", ("voltage", False)),
+    ("gain", ("gain", True)),
+    ("desc", (None, True)),
+    ("name", (None, True)),
+    (None, (None, True)),
+])
+def test_parse_sort(sort_by, expected):
+    from web_app import parse_sort
+    assert parse_sort(sort_by) == expected
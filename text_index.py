@@ -0,0 +1,215 @@
+"""
+Полнотекстовый индекс каталога: токены, префиксный поиск и ранжирование BM25
+"""
+
+import logging
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Поля компонента и их вес при ранжировании (упрощённый BM25F)
+FIELD_WEIGHTS = {
+    'id': 3.0,
+    'name': 2.0,
+    'application_tags': 1.5,
+    'role_tags': 1.0,
+    'technology_tags': 1.0,
+    'description': 1.0,
+}
+
+# Параметры BM25
+K1 = 1.2
+B = 0.75
+
+# Вес совпадения по префиксу относительно точного совпадения термина
+PREFIX_BOOST = 0.5
+# Ограничение на число терминов, в которые раскрывается один префикс
+MAX_PREFIX_EXPANSIONS = 64
+
+# Фонетическая транслитерация: 6Н2П -> 6n2p, КТ315 -> kt315
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+
+# Кириллические буквы, похожие на латинские (набор в неверной раскладке: ЕСС88 -> ecc88)
+HOMOGLYPHS = {
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h',
+    'о': 'o', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x',
+}
+
+TOKEN_PATTERN = re.compile(r'[0-9a-zа-яё]+')
+SUBTOKEN_PATTERN = re.compile(r'[a-z]+|[0-9]+')
+CYRILLIC_PATTERN = re.compile(r'[а-яё]')
+
+
+def fold_variants(token: str) -> Set[str]:
+    """Латинские варианты токена: транслитерация и (для «похожих» букв) гомоглифы"""
+    if not CYRILLIC_PATTERN.search(token):
+        return {token}
+    variants = {''.join(TRANSLIT.get(ch, ch) for ch in token)}
+    if all(ch in HOMOGLYPHS or not CYRILLIC_PATTERN.match(ch) for ch in token):
+        variants.add(''.join(HOMOGLYPHS.get(ch, ch) for ch in token))
+    return variants
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на токены в нижнем регистре"""
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def index_terms(token: str) -> Set[str]:
+    """Термины индекса для токена: варианты написания и части артикула (kt315 -> kt, 315)"""
+    terms = set()
+    for variant in fold_variants(token):
+        terms.add(variant)
+        parts = SUBTOKEN_PATTERN.findall(variant)
+        if len(parts) > 1:
+            terms.update(part for part in parts if len(part) >= 2)
+    return terms
+
+
+class TextIndex:
+    """Инвертированный индекс по id, названию, описанию и тегам компонентов"""
+
+    # Массивы индекса (для сохранения в снимок каталога)
+    ARRAYS = ['doc_lengths', 'terms', 'term_offsets', 'term_idf', 'term_ordinals', 'term_frequencies']
+
+    def __init__(self, components: List[Dict]):
+        self.size = len(components)
+        term_docs: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.doc_lengths = np.zeros(self.size, dtype=np.float64)
+
+        for ordinal, component in enumerate(components):
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                value = component.get(field)
+                if not value:
+                    continue
+                text = ' '.join(map(str, value)) if isinstance(value, list) else str(value)
+                for token in tokenize(text):
+                    length += weight
+                    for term in index_terms(token):
+                        docs = term_docs[term]
+                        docs[ordinal] = docs.get(ordinal, 0.0) + weight
+            self.doc_lengths[ordinal] = length
+
+        self.avg_length = float(self.doc_lengths.mean()) if self.size else 0.0
+
+        # Плоские массивы: словарь (отсортированные байтовые строки), списки
+        # ordinal/частот подряд и смещения термина в них
+        vocabulary = sorted(term_docs)
+        self.terms = np.array([term.encode('utf-8') for term in vocabulary], dtype=bytes) \
+            if vocabulary else np.empty(0, dtype='S1')
+        self.term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        self.term_idf = np.zeros(len(vocabulary), dtype=np.float64)
+        ordinal_parts, frequency_parts = [], []
+        for term_id, term in enumerate(vocabulary):
+            docs = term_docs[term]
+            ordinals = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            frequencies = np.fromiter(docs.values(), dtype=np.float64, count=len(docs))
+            order = np.argsort(ordinals)
+            ordinal_parts.append(ordinals[order])
+            frequency_parts.append(frequencies[order])
+            self.term_offsets[term_id + 1] = self.term_offsets[term_id] + len(docs)
+            df = len(docs)
+            self.term_idf[term_id] = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+        self.term_ordinals = np.concatenate(ordinal_parts) if ordinal_parts else np.empty(0, dtype=np.int64)
+        self.term_frequencies = np.concatenate(frequency_parts) if frequency_parts else np.empty(0, dtype=np.float64)
+
+        logger.info(f"🔤 Текстовый индекс: {len(self.terms)} терминов по {self.size} компонентам")
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'TextIndex':
+        """Индекс поверх готовых массивов (например, отображённых в память)"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.size = len(index.doc_lengths)
+        index.avg_length = float(index.doc_lengths.mean()) if index.size else 0.0
+        return index
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    # ==================== ПОИСК ====================
+
+    def _term_id(self, term: bytes) -> Optional[int]:
+        position = int(np.searchsorted(self.terms, term))
+        if position < len(self.terms) and self.terms[position] == term:
+            return position
+        return None
+
+    def _expand(self, token: str) -> Dict[int, float]:
+        """Термины словаря (их номера), соответствующие токену запроса (точно или по префиксу)"""
+        terms: Dict[int, float] = {}
+        for variant in fold_variants(token):
+            variant = variant.encode('utf-8')
+            term_id = self._term_id(variant)
+            if term_id is not None:
+                terms[term_id] = 1.0
+            if len(variant) < 2:
+                continue
+            start = int(np.searchsorted(self.terms, variant))
+            for term_id, term in enumerate(self.terms[start:start + MAX_PREFIX_EXPANSIONS + 1], start):
+                if not term.startswith(variant):
+                    break
+                terms.setdefault(term_id, PREFIX_BOOST)
+        return terms
+
+    def _score_term(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        lo, hi = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        ordinals, frequencies = self.term_ordinals[lo:hi], self.term_frequencies[lo:hi]
+        lengths = self.doc_lengths[ordinals]
+        denominator = frequencies + K1 * (1 - B + B * lengths / (self.avg_length or 1.0))
+        return ordinals, self.term_idf[term_id] * frequencies * (K1 + 1) / denominator
+
+    def match(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Компоненты, содержащие все токены запроса.
+
+        Возвращает (ordinal по возрастанию, оценка релевантности).
+        """
+        tokens = tokenize(query)
+        result_ordinals = np.empty(0, dtype=np.int64)
+        result_scores = np.empty(0, dtype=np.float64)
+
+        for position, token in enumerate(tokens):
+            ordinal_parts, score_parts = [], []
+            for term_id, boost in self._expand(token).items():
+                ordinals, scores = self._score_term(term_id)
+                ordinal_parts.append(ordinals)
+                score_parts.append(scores * boost)
+            if not ordinal_parts:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+            # Для токена берём лучший из совпавших терминов
+            ordinals, inverse = np.unique(np.concatenate(ordinal_parts), return_inverse=True)
+            token_scores = np.zeros(len(ordinals), dtype=np.float64)
+            np.maximum.at(token_scores, inverse, np.concatenate(score_parts))
+
+            if position == 0:
+                result_ordinals, result_scores = ordinals, token_scores
+            else:
+                result_ordinals, left, right = np.intersect1d(
+                    result_ordinals, ordinals, assume_unique=True, return_indices=True)
+                result_scores = result_scores[left] + token_scores[right]
+            if not len(result_ordinals):
+                break
+
+        return result_ordinals, result_scores
+
+    def search(self, query: str, limit: int = None) -> List[Tuple[int, float]]:
+        """Ранжированный список (ordinal, оценка) по убыванию релевантности"""
+        ordinals, scores = self.match(query)
+        order = np.lexsort((ordinals, -scores))
+        if limit:
+            order = order[:limit]
+        return list(zip(ordinals[order].tolist(), scores[order].tolist()))
@@ -1,16 +1,25 @@
 from fastapi import FastAPI, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
+import datetime
 import json
 import os
 import logging
 import asyncio
 import traceback
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import requests
 import httpx
-from collections import defaultdict
+
+from characteristics import curve_cache, curve_response, load_curve, load_family, resample_curve
+from command_executor import CatalogCommandExecutor
+from catalog_reload import CatalogReloader
+from http_pool import OPENROUTER_URL, create_pooled_client
+from load_line import rank_candidates, solve_batch
+from catalog import ComponentCatalog, NUMERIC_COLUMNS, SORT_COLUMNS, get_power_value
+from snapshot import DEFAULT_SNAPSHOT as SNAPSHOT_PATH, load_catalog
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -23,63 +32,31 @@ app = FastAPI(title="AI Component Library Web Interface")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Загружаем базу компонентов
+# Загружаем базу компонентов: из бинарного снимка (mmap, общий для воркеров),
+# а если его нет или он устарел — из components.json
 def load_components():
     try:
-        with open('components.json', 'r', encoding='utf-8') as f:
-            components = json.load(f)
-            logger.info(f"✅ Загружено {len(components)} компонентов")
-            
-            # ДОБАВЛЯЕМ СТАРЫЕ ПОЛЯ ДЛЯ ОБРАТНОЙ СОВМЕСТИМОСТИ
-            for component in components:
-                params = component.get('params', {})
-                
-                # Добавляем Imax если нет
-                if 'Imax' not in params:
-                    # Пытаемся найти максимальный ток в зависимости от типа
-                    if 'max_collector_current' in params:
-                        params['Imax'] = params['max_collector_current']
-                    elif 'max_drain_current' in params:
-                        params['Imax'] = params['max_drain_current']
-                    elif 'max_forward_current' in params:
-                        params['Imax'] = params['max_forward_current']
-                    elif 'secondary_max' in component.get('parameters_extended', {}).get('current_ratings', {}):
-                        params['Imax'] = component['parameters_extended']['current_ratings']['secondary_max']
-                    else:
-                        params['Imax'] = 0
-                
-                # Добавляем Uce_max если нет
-                if 'Uce_max' not in params:
-                    if 'max_collector_emitter_voltage' in params:
-                        params['Uce_max'] = params['max_collector_emitter_voltage']
-                    elif 'max_drain_source_voltage' in params:
-                        params['Uce_max'] = params['max_drain_source_voltage']
-                    elif 'max_reverse_voltage' in params:
-                        params['Uce_max'] = params['max_reverse_voltage']
-                    elif 'plate_voltage_max' in params:
-                        params['Uce_max'] = params['plate_voltage_max']
-                    elif 'primary_max' in component.get('parameters_extended', {}).get('voltage_ratings', {}):
-                        params['Uce_max'] = component['parameters_extended']['voltage_ratings']['primary_max']
-                    else:
-                        params['Uce_max'] = 0
-                
-                # Добавляем Ptot если нет
-                if 'Ptot' not in params:
-                    if 'max_power_dissipation' in params:
-                        params['Ptot'] = params['max_power_dissipation']
-                    elif 'power_rating' in params:
-                        params['Ptot'] = params['power_rating']
-                    elif 'plate_dissipation' in params:
-                        params['Ptot'] = params['plate_dissipation']
-                    else:
-                        params['Ptot'] = 0
-                        
-            return components
+        catalog, source = load_catalog('components.json', SNAPSHOT_PATH)
+        logger.info(f"✅ Загружено {len(catalog)} компонентов ({source})")
+        return catalog
     except Exception as e:
         logger.error(f"❌ Ошибка загрузки components.json: {e}")
-        return []
+        return ComponentCatalog([])
+
+# Размер таблицы соседей для /api/components/similar (0 — вычислять при запросе)
+SIMILARITY_TABLE_K = int(os.getenv("SIMILARITY_TABLE_K", "0"))
+
+def prepare_catalog(new_catalog: ComponentCatalog):
+    """Предварительные вычисления до того, как каталог начнёт обслуживать запросы"""
+    if SIMILARITY_TABLE_K > 0:
+        new_catalog.similarity().precompute(SIMILARITY_TABLE_K)
 
-components = load_components()
+catalog = load_components()
+components = catalog.components
+prepare_catalog(catalog)
+
+# Исполнитель команд над каталогом (пакетные запросы и ИИ-модуль)
+catalog_executor = CatalogCommandExecutor(lambda: catalog)
 
 # ==================== ИНИЦИАЛИЗАЦИЯ ИИ-МОДУЛЯ ====================
 brain = None
@@ -87,7 +64,9 @@ brain_available = False
 
 try:
     from brain import ComponentLibraryBrain
-    brain = ComponentLibraryBrain()
+    # Команды ИИ выполняются прямо над каталогом, без HTTP-запроса к самому себе
+    brain = ComponentLibraryBrain(executor=catalog_executor)
+    brain.apply_catalog_vocabulary(catalog.vocabulary())
     brain_available = True
     logger.info("✅ ИИ-модуль (brain.py) успешно загружен")
 except ImportError as e:
@@ -96,52 +75,33 @@ except Exception as e:
     logger.error(f"❌ Ошибка инициализации brain.py: {e}")
     brain_available = False
 
-# ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ НОВОЙ СТРУКТУРЫ ====================
-
-def get_power_value(component):
-    """Получает значение мощности из разных возможных полей"""
-    params = component.get('params', {})
-    
-    # Сначала новые поля
-    if 'max_power_dissipation' in params:
-        return params['max_power_dissipation']
-    elif 'power_rating' in params:
-        return params['power_rating']
-    elif 'plate_dissipation' in params:
-        return params['plate_dissipation']
-    elif 'Ptot' in params:
-        return params['Ptot']
-    return 0
-
-def get_voltage_value(component):
-    """Получает значение напряжения из разных возможных полей"""
-    params = component.get('params', {})
-    
-    if 'max_collector_emitter_voltage' in params:
-        return params['max_collector_emitter_voltage']
-    elif 'max_drain_source_voltage' in params:
-        return params['max_drain_source_voltage']
-    elif 'max_reverse_voltage' in params:
-        return params['max_reverse_voltage']
-    elif 'plate_voltage_max' in params:
-        return params['plate_voltage_max']
-    elif 'Uce_max' in params:
-        return params['Uce_max']
-    return 0
-
-def get_current_value(component):
-    """Получает значение тока из разных возможных полей"""
-    params = component.get('params', {})
-    
-    if 'max_collector_current' in params:
-        return params['max_collector_current']
-    elif 'max_drain_current' in params:
-        return params['max_drain_current']
-    elif 'max_forward_current' in params:
-        return params['max_forward_current']
-    elif 'Imax' in params:
-        return params['Imax']
-    return 0
+# ==================== ГОРЯЧАЯ ПЕРЕЗАГРУЗКА КАТАЛОГА ====================
+
+def swap_catalog(new_catalog: ComponentCatalog):
+    """Подменяет живой каталог: запросы, начатые раньше, дочитывают старый"""
+    global catalog, components
+    catalog = new_catalog
+    components = new_catalog.components
+    if brain is not None:
+        brain.apply_catalog_vocabulary(new_catalog.vocabulary())
+
+catalog_reloader = CatalogReloader(
+    'components.json',
+    get_catalog=lambda: catalog,
+    on_swap=swap_catalog,
+    prepare=prepare_catalog,
+    interval=float(os.getenv("CATALOG_WATCH_INTERVAL", "5"))
+)
+
+# Пул HTTP-соединений к OpenRouter (общий для прокси и brain.py)
+http_client = None
+
+def get_http_client():
+    """Пул соединений приложения; создаётся при старте, а при его отсутствии — по требованию"""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_pooled_client()
+    return http_client
 
 # ==================== API ENDPOINTS ДЛЯ НОВОЙ СТРУКТУРЫ ====================
 
@@ -149,17 +109,10 @@ def get_current_value(component):
 async def api_get_components_by_tag(
     tag: str,
     tag_type: Optional[str] = Query("application_tags", description="Тип тега: application_tags, technology_tags, role_tags"),
-    limit: Optional[int] = Query(None, description="Ограничение количества результатов")
+    limit: Optional[int] = Query(None, ge=1, description="Ограничение количества результатов")
 ):
     """API: Поиск компонентов по тегам"""
-    filtered = []
-    
-    for component in components:
-        # Проверяем наличие нужного типа тегов
-        if tag_type in component:
-            tags = component[tag_type]
-            if any(t.lower() == tag.lower() for t in tags):
-                filtered.append(component)
+    filtered = catalog.records(catalog.tag_postings(tag_type, tag))
     
     if limit and len(filtered) > limit:
         filtered = filtered[:limit]
@@ -182,72 +135,83 @@ async def api_search_extended(
     application: Optional[str] = Query(None, description="Область применения"),
     component_type: Optional[str] = Query(None, description="Тип компонента"),
     origin: Optional[str] = Query(None, description="Происхождение компонента"),
-    limit: Optional[int] = Query(50, description="Ограничение количества результатов")
+    limit: int = Query(50, ge=1, description="Ограничение количества результатов"),
+    offset: int = Query(0, ge=0, description="Смещение для постраничного вывода")
 ):
     """Расширенный поиск по параметрам"""
-    filtered = []
+    # Запрашиваем на один результат больше, чтобы узнать, есть ли следующая страница
+    filtered = catalog.search(
+        type=component_type,
+        origin=origin,
+        tags={'application_tags': application},
+        ranges={
+            'power': (min_power, max_power),
+            'voltage': (min_voltage, max_voltage),
+            'current': (min_current, max_current),
+        },
+        limit=limit + 1,
+        offset=offset
+    )
     
-    for component in components:
-        # Проверяем соответствие базовым фильтрам
-        if component_type and component.get('type') != component_type:
-            continue
-        if origin and component.get('origin') != origin:
-            continue
-        
-        # Проверяем мощность
-        power = get_power_value(component)
-        if min_power is not None and power < min_power:
-            continue
-        if max_power is not None and power > max_power:
-            continue
-        
-        # Проверяем напряжение
-        voltage = get_voltage_value(component)
-        if min_voltage is not None and voltage < min_voltage:
-            continue
-        if max_voltage is not None and voltage > max_voltage:
-            continue
-        
-        # Проверяем ток
-        current = get_current_value(component)
-        if min_current is not None and current < min_current:
-            continue
-        if max_current is not None and current > max_current:
-            continue
-        
-        # Проверяем тег применения
-        if application:
-            if not any(app.lower() == application.lower() for app in component.get('application_tags', [])):
-                continue
-        
-        filtered.append(component)
-        
-        # Останавливаемся при достижении лимита
-        if len(filtered) >= limit:
-            break
+    next_offset = None
+    if len(filtered) > limit:
+        filtered = filtered[:limit]
+        next_offset = offset + limit
     
     return {
         "count": len(filtered),
+        "offset": offset or 0,
+        "next_offset": next_offset,
         "components": filtered
     }
 
+@app.get("/api/components/facets")
+async def api_components_facets(
+    type: Optional[str] = Query(None, description="Тип компонента"),
+    origin: Optional[str] = Query(None, description="Происхождение компонента"),
+    search_text: Optional[str] = Query(None, description="Текстовый запрос"),
+    application_tag: Optional[str] = Query(None, description="Область применения"),
+    min_power: Optional[float] = Query(None, description="Минимальная мощность (Вт)"),
+    max_power: Optional[float] = Query(None, description="Максимальная мощность (Вт)"),
+    min_voltage: Optional[float] = Query(None, description="Минимальное напряжение (В)"),
+    max_voltage: Optional[float] = Query(None, description="Максимальное напряжение (В)"),
+    min_current: Optional[float] = Query(None, description="Минимальный ток (А)"),
+    max_current: Optional[float] = Query(None, description="Максимальный ток (А)"),
+    where: Optional[str] = Query(None, description="Выражение фильтра: type:bjt AND NOT origin:usa"),
+    max_tags: int = Query(15, ge=0, le=100, description="Сколько самых частых тегов каждого семейства вернуть")
+):
+    """API: Счётчики по типу, происхождению и тегам для результата поиска.
+
+    Счётчики измерения с заданным фильтром (type, origin, application_tag)
+    считаются без этого фильтра, чтобы показывать альтернативы выбору.
+    """
+    query = dict(
+        type=type,
+        origin=origin,
+        tags={'application_tags': application_tag},
+        ranges={
+            'power': (min_power, max_power),
+            'voltage': (min_voltage, max_voltage),
+            'current': (min_current, max_current),
+        },
+        text=search_text,
+        where=where
+    )
+    try:
+        return catalog.disjunctive_facets(catalog.search_ordinals(**query), query, max_tags=max_tags)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/statistics/tags")
 async def api_get_tags_statistics(
     tag_type: Optional[str] = Query("application_tags", description="Тип тега для анализа")
 ):
     """API: Статистика по тегам"""
-    tag_counts = defaultdict(int)
-    
-    for component in components:
-        if tag_type in component:
-            for tag in component[tag_type]:
-                tag_counts[tag] += 1
-    
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
+    sorted_tags = catalog.stats().tag_counts(tag_type)
     
     return {
         "tag_type": tag_type,
-        "total_tags": len(tag_counts),
+        "total_tags": len(sorted_tags),
         "tags": dict(sorted_tags[:50])
     }
 
@@ -257,40 +221,15 @@ async def api_get_similar_components(
     max_results: Optional[int] = Query(5, description="Максимальное количество похожих компонентов")
 ):
     """API: Поиск похожих компонентов"""
-    target_component = next((c for c in components if c['id'] == component_id), None)
+    target_component = catalog.get(component_id)
     if not target_component:
         raise HTTPException(status_code=404, detail=f"Component '{component_id}' not found")
     
-    similar_components = []
-    
-    for component in components:
-        if component['id'] == component_id:
-            continue
-        
-        similarity_score = 0
-        
-        # Сравниваем тип
-        if component.get('type') == target_component.get('type'):
-            similarity_score += 3
-        
-        # Сравниваем происхождение
-        if component.get('origin') == target_component.get('origin'):
-            similarity_score += 1
-        
-        # Сравниваем теги
-        for tag_type in ['application_tags', 'technology_tags', 'role_tags']:
-            if tag_type in component and tag_type in target_component:
-                common_tags = set(component[tag_type]) & set(target_component[tag_type])
-                similarity_score += len(common_tags) * 0.5
-        
-        if similarity_score > 0:
-            similar_components.append({
-                "component": component,
-                "similarity_score": round(similarity_score, 2)
-            })
-    
-    similar_components.sort(key=lambda x: x["similarity_score"], reverse=True)
-    similar_components = similar_components[:max_results]
+    # Оценка: тип +3, происхождение +1, каждый общий тег +0.5 (индекс похожести каталога)
+    similar_components = [
+        {"component": component, "similarity_score": round(score, 2)}
+        for component, score in catalog.similar(component_id, max_results)
+    ]
     
     return {
         "target_component": component_id,
@@ -298,6 +237,184 @@ async def api_get_similar_components(
         "similar_components": similar_components
     }
 
+@app.get("/api/components/{component_id}/substitutes")
+async def api_get_substitutes(
+    component_id: str,
+    limit: int = Query(5, description="Максимальное количество замен"),
+    type: Optional[str] = Query(None, description="Тип замены (по умолчанию — тип исходного компонента; можно семейство: bjt, vacuum_tube)"),
+    ratings: Optional[str] = Query(None, description="Учитываемые номиналы через запятую: Ptot, Uce_max, Imax, gain, gm, ft (по умолчанию — все известные)")
+):
+    """API: Замены «не хуже» компонента — ближайшие по номиналам среди тех, что не уступают ни по одному"""
+    rating_list = [rating.strip() for rating in ratings.split(',') if rating.strip()] if ratings else None
+    try:
+        result = catalog.substitutes().find(component_id, limit, type, rating_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Component '{component_id}' not found")
+    
+    result["substitutes_count"] = len(result["substitutes"])
+    return result
+
+# ==================== ХАРАКТЕРИСТИКИ (ВАХ) ====================
+
+# Сколько точек ВАХ встраивается в страницу компонента
+CHART_POINTS = 1000
+
+@app.get("/api/components/{component_id}/characteristics")
+async def api_get_characteristics(
+    component_id: str,
+    points: Optional[int] = Query(None, description="Максимальное число точек (прореживание под разрешение графика)"),
+    v_min: Optional[float] = Query(None, description="Минимальное напряжение окна (V)"),
+    v_max: Optional[float] = Query(None, description="Максимальное напряжение окна (V)"),
+    method: str = Query("lttb", description="Метод прореживания: 'lttb' (форма кривой) или 'minmax' (экстремумы)"),
+    at: Optional[List[float]] = Query(None, description="Напряжения (V) для интерполяции тока; можно указать несколько"),
+    curve: Optional[float] = Query(None, description="Значение параметра семейства (Ug, Ib...): выбирается ближайшая кривая"),
+    family: bool = Query(False, description="Вернуть всё семейство кривых в колоночном виде")
+):
+    """API: ВАХ компонента (кривая или всё семейство) с прореживанием, окном по напряжению и интерполяцией"""
+    component = catalog.get(component_id)
+    if not component:
+        raise HTTPException(status_code=404, detail=f"Component '{component_id}' not found")
+    
+    curve_family = load_family(component.get('characteristics_file'))
+    if curve_family is None:
+        raise HTTPException(status_code=404, detail=f"Characteristics file for '{component_id}' not found")
+    
+    try:
+        return curve_response(component_id, curve_family, points, v_min, v_max, method, at, curve, family)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== НАГРУЗОЧНАЯ ПРЯМАЯ ====================
+
+# Максимальное число компонентов-кандидатов в одном расчёте
+MAX_LOAD_LINE_CANDIDATES = 1000
+# Поля operating_points, задающие смещение (значение параметра семейства)
+BIAS_KEYS = ('grid_voltage', 'base_current', 'gate_voltage')
+
+def default_bias(component: Dict) -> Optional[float]:
+    """Смещение из первой типовой рабочей точки компонента"""
+    for point in component.get('operating_points') or []:
+        for key in BIAS_KEYS:
+            if isinstance(point.get(key), (int, float)):
+                return float(point[key])
+    return None
+
+def load_line_entry(component: Dict, solution: Dict) -> Dict:
+    """Решение для компонента с проверкой допустимой мощности рассеяния"""
+    rated_power = get_power_value(component) or None
+    dissipation = solution.get("dissipation")
+    return {
+        "component_id": component.get('id'),
+        "name": component.get('name'),
+        "type": component.get('type'),
+        **solution,
+        "rated_power": rated_power,
+        "within_rating": None if rated_power is None or dissipation is None else dissipation <= rated_power,
+    }
+
+@app.get("/api/components/{component_id}/load-line")
+async def api_load_line(
+    component_id: str,
+    supply: float = Query(..., description="Напряжение питания E (V)"),
+    load: float = Query(..., description="Сопротивление нагрузки R (Ом)"),
+    bias: Optional[float] = Query(None, description="Смещение (Ug, Ib...); по умолчанию — из operating_points компонента")
+):
+    """API: Рабочая точка на пересечении нагрузочной прямой с ВАХ, усиление и рассеиваемая мощность"""
+    component = catalog.get(component_id)
+    if not component:
+        raise HTTPException(status_code=404, detail=f"Component '{component_id}' not found")
+    
+    curve_family = load_family(component.get('characteristics_file'))
+    if curve_family is None:
+        raise HTTPException(status_code=404, detail=f"Characteristics file for '{component_id}' not found")
+    
+    if bias is None:
+        bias = default_bias(component)
+    try:
+        solution = solve_batch([curve_family], supply, load, [bias])[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "supply": supply,
+        "load": load,
+        "bias": bias,
+        "current_unit": "A",
+        # Концы нагрузочной прямой для графика: (0, E/R) и (E, 0)
+        "load_line": {"voltage": [0.0, supply], "current": [supply / load, 0.0]},
+        **load_line_entry(component, solution),
+    }
+
+@app.post("/api/load-line/rank")
+async def api_rank_load_line(request: Request):
+    """
+    Оценка одной схемы (E, R, смещение) сразу для многих компонентов.
+    Тело: {"supply": 250, "load": 100000, "bias": -2, "component_ids": [...] или "type": "vacuum_tube",
+           "rank_by": "gain" | "dissipation" | "current" | "voltage" | "swing", "limit": 10}.
+    Без bias для каждого компонента берётся смещение из его operating_points.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"success": False, "error": "Тело запроса должно быть JSON"}, status_code=400)
+    if not isinstance(body, dict) or "supply" not in body or "load" not in body:
+        return JSONResponse({"success": False, "error": "Нужны поля supply и load"}, status_code=400)
+
+    limit = body.get("limit")
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        return JSONResponse({"success": False, "error": "limit должен быть целым числом не меньше 1"}, status_code=400)
+
+    component_ids = body.get("component_ids")
+    if component_ids is not None and (not isinstance(component_ids, list)
+                                      or not all(isinstance(component_id, str) for component_id in component_ids)):
+        return JSONResponse({"success": False, "error": "component_ids должен быть списком строк"}, status_code=400)
+
+    if component_ids:
+        candidates = [catalog.get(component_id) for component_id in component_ids]
+    elif isinstance(body.get("type"), str) and body["type"]:
+        candidates = catalog.records(catalog.type_postings(body["type"]))
+    else:
+        return JSONResponse({"success": False, "error": "Укажите component_ids или type"}, status_code=400)
+    if len(candidates) > MAX_LOAD_LINE_CANDIDATES:
+        return JSONResponse({
+            "success": False,
+            "error": f"Слишком много кандидатов: {len(candidates)} (максимум {MAX_LOAD_LINE_CANDIDATES})"
+        }, status_code=400)
+
+    # Компоненты без ВАХ пропускаются
+    solvable = []
+    for component in candidates:
+        curve_family = load_family(component.get('characteristics_file')) if component else None
+        if curve_family is not None and curve_family.point_count:
+            solvable.append((component, curve_family))
+
+    bias = body.get("bias")
+    try:
+        solutions = solve_batch(
+            [curve_family for _, curve_family in solvable],
+            float(body["supply"]), float(body["load"]),
+            [bias if bias is not None else default_bias(component) for component, _ in solvable],
+        )
+        ranked = rank_candidates(
+            [load_line_entry(component, solution) for (component, _), solution in zip(solvable, solutions)],
+            body.get("rank_by", "gain"), limit,
+        )
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+    logger.info(f"📐 Нагрузочная прямая: {len(solvable)} из {len(candidates)} кандидатов с ВАХ")
+    return {
+        "success": True,
+        "supply": body["supply"],
+        "load": body["load"],
+        "current_unit": "A",
+        "candidates": len(candidates),
+        "solved": len(solvable),
+        "results": ranked,
+    }
+
 # ==================== КРИТИЧЕСКИЕ ENDPOINTS ДЛЯ ИИ ====================
 
 @app.post("/api/ai-query")
@@ -326,9 +443,10 @@ async def api_process_ai_query(request: Request):
                 "error": "Пустой запрос"
             }, status_code=400)
         
-        # Используем asyncio.to_thread для вызова синхронного метода
+        # Асинхронный конвейер: запрос к OpenRouter идёт через общий пул соединений,
+        # команда выполняется над каталогом в памяти — поток не занимается
         logger.info("⏳ Обработка запроса через brain.py...")
-        result = await asyncio.to_thread(brain.process_query, user_query, user_api_key)
+        result = await brain.process_query_async(user_query, user_api_key)
         logger.info(f"✅ Результат обработки: успех={result.get('success')}, режим={result.get('mode')}")
         
         return JSONResponse(result)
@@ -366,8 +484,6 @@ async def proxy_openrouter_chat(request: Request):
             )
 
         # 2. Подготавливаем запрос к OpenRouter
-        openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
-        
         # 2.1. Формируем заголовки, включая ключ ПОЛЬЗОВАТЕЛЯ
         headers = {
             "Authorization": f"Bearer {user_api_key}",
@@ -384,16 +500,20 @@ async def proxy_openrouter_chat(request: Request):
             "max_tokens": request_data.get("max_tokens", 1000)
         }
 
-        # 3. Отправляем запрос к OpenRouter
+        # 3. Отправляем запрос к OpenRouter через общий пул соединений
+        #    (без нового TCP + TLS рукопожатия на каждый запрос)
         logger.info(f"Проксируем запрос к OpenRouter для модели {payload['model']}")
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                openrouter_url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
+        if request_data.get("stream"):
+            payload["stream"] = True
+            return await stream_openrouter(headers, payload)
+
+        response = await get_http_client().post(
+            OPENROUTER_URL,
+            headers=headers,
+            json=payload
+        )
+        response.raise_for_status()
+        result = response.json()
 
         # 4. Возвращаем результат пользователя
         return JSONResponse(result)
@@ -408,6 +528,93 @@ async def proxy_openrouter_chat(request: Request):
         logger.error(f"Ошибка проксирования запроса: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка сервера: {str(e)}")
 
+async def stream_openrouter(headers: Dict, payload: Dict) -> StreamingResponse:
+    """Пробрасывает SSE-поток OpenRouter браузеру по мере поступления чанков.
+
+    Следующий чанк читается из апстрима только после того, как предыдущий
+    отправлен клиенту, поэтому ответ целиком в памяти не накапливается.
+    """
+    client = get_http_client()
+    upstream = await client.send(
+        client.build_request("POST", OPENROUTER_URL, headers=headers, json=payload),
+        stream=True
+    )
+    if upstream.is_error:
+        # Ошибку апстрима отдаём обычным JSON-ответом (обработчик выше)
+        await upstream.aread()
+        await upstream.aclose()
+        upstream.raise_for_status()
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            # Закрываем и при обрыве соединения браузером — слот пула освобождается
+            await upstream.aclose()
+
+    try:
+        # Если клиент отключится раньше, чем начнётся чтение relay(), её finally
+        # не выполнится — апстрим закроет фоновая задача ответа (aclose повторно безопасен)
+        return StreamingResponse(
+            relay(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(upstream.aclose)
+        )
+    except BaseException:
+        await upstream.aclose()
+        raise
+
+# ==================== ПАКЕТНЫЕ ЗАПРОСЫ ====================
+
+# Максимальное число команд в одном пакете
+MAX_BATCH_SIZE = 1000
+
+@app.post("/api/batch")
+async def api_batch(request: Request):
+    """
+    Пакетное выполнение команд (формат parse_command: {"command": ..., "args": {...}}).
+    Тело: {"commands": [...]} или просто список команд.
+    Ответ — NDJSON: по строке {"index", "command", "result"} на команду, в порядке запроса.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"success": False, "error": "Тело запроса должно быть JSON"}, status_code=400)
+
+    commands = body.get("commands") if isinstance(body, dict) else body
+    if not isinstance(commands, list):
+        return JSONResponse({"success": False, "error": "Ожидается список команд в поле commands"}, status_code=400)
+    if len(commands) > MAX_BATCH_SIZE:
+        return JSONResponse({
+            "success": False,
+            "error": f"Слишком много команд: {len(commands)} (максимум {MAX_BATCH_SIZE})"
+        }, status_code=400)
+
+    logger.info(f"📦 Пакетный запрос: {len(commands)} команд")
+
+    def ndjson_lines():
+        for index, result in catalog_executor.execute_batch(commands):
+            command = commands[index].get("command") if isinstance(commands[index], dict) else None
+            yield json.dumps({"index": index, "command": command, "result": result},
+                             ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+# ==================== АДМИНИСТРИРОВАНИЕ ====================
+
+@app.post("/api/admin/catalog/reload")
+async def api_reload_catalog(
+    request: Request,
+    force: bool = Query(False, description="Пересобрать каталог, даже если файл не изменился")
+):
+    """Перечитывает components.json и атомарно подменяет каталог без перезапуска"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token and request.headers.get("X-Admin-Token") != admin_token:
+        raise HTTPException(status_code=403, detail="Неверный токен администратора")
+    return await catalog_reloader.reload(force=force)
+
 # ==================== НОВЫЙ ENDPOINT: ПРОВЕРКА СТАТУСА ====================
 
 @app.get("/api/system/status")
@@ -422,35 +629,64 @@ async def api_get_system_status():
             "components_search": "/api/components/search/extended",
             "system_status": "/api/system/status"
         },
+        "catalog": catalog_reloader.status(),
+        "intent_cache": brain.intent_cache.stats() if brain is not None else None,
+        "characteristics_cache": curve_cache.stats(),
         "timestamp": datetime.datetime.now().isoformat()
     }
 
+# ==================== ЖИЗНЕННЫЙ ЦИКЛ ====================
+
+@app.on_event("startup")
+async def open_http_client():
+    """Создаём пул соединений к OpenRouter на всё время жизни воркера"""
+    global http_client
+    http_client = create_pooled_client()
+    if brain is not None:
+        brain.attach_async_client(http_client)
+
+@app.on_event("startup")
+async def start_catalog_watcher():
+    """Следим за изменениями components.json"""
+    catalog_reloader.start()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Закрываем пулы соединений при остановке воркера"""
+    global http_client
+    await catalog_reloader.stop()
+    if brain is not None:
+        await brain.aclose()
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
 # ==================== ВЕБ-ИНТЕРФЕЙС ====================
 
+SORT_ORDERS = ('asc', 'desc')
+
+
+def parse_sort(sort_by: Optional[str]) -> Tuple[Optional[str], bool]:
+    """Колонка каталога и направление для sort_by страницы поиска.
+
+    Направление — только суффикс _asc / _desc ('Ptot_desc'); иначе значение целиком
+    считается полем ('Uce_max', 'power') с сортировкой по убыванию.
+    None — сортировка не по числовой колонке (id, name, relevance).
+    """
+    sort_field, sort_order = sort_by or '', 'desc'
+    field, separator, suffix = sort_field.rpartition('_')
+    if separator and suffix.lower() in SORT_ORDERS:
+        sort_field, sort_order = field, suffix
+    order_by = sort_field if sort_field in NUMERIC_COLUMNS else SORT_COLUMNS.get(sort_field)
+    return order_by, sort_order.lower() == 'desc'
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Главная страница"""
-    # Правильный подсчёт статистики для новой структуры
-    stats = {
-        "total_components": len(components),
-        "bjt_count": len([c for c in components if c.get('type') in ['bjt_npn', 'bjt_pnp']]),
-        "mosfet_count": len([c for c in components if 'mosfet' in c.get('type', '').lower()]),
-        "tube_count": len([c for c in components if 'vacuum_tube' in c.get('type', '').lower()]),
-        "diode_count": len([c for c in components if 'diode' in c.get('type', '').lower()]),
-        "transformer_count": len([c for c in components if 'transformer' in c.get('type', '').lower()]),
-        "soviet_count": len([c for c in components if c.get('origin', '').lower() == 'soviet']),
-        "usa_count": len([c for c in components if c.get('origin', '').lower() == 'usa']),
-        "japan_count": len([c for c in components if c.get('origin', '').lower() == 'japan']),
-        "europe_count": len([c for c in components if c.get('origin', '').lower() in ['europe', 'uk']]),
-        "generic_count": len([c for c in components if c.get('origin', '').lower() == 'generic']),
-    }
-    
-    # Самые мощные компоненты (по максимальной мощности)
-    powerful_components = sorted(
-        components,
-        key=lambda x: get_power_value(x),
-        reverse=True
-    )[:5]
+    # Счётчики и top-5 по мощности посчитаны при сборке каталога
+    catalog_stats = catalog.stats()
+    stats = catalog_stats.summary()
+    powerful_components = catalog_stats.top_components('power', 5)
     
     # Избранные компоненты (первые 6)
     featured_components = components[:6]
@@ -471,54 +707,41 @@ async def components_page(
     origin: Optional[str] = Query(None),
     search_text: Optional[str] = Query(None),
     application_tag: Optional[str] = Query(None),
+    where: Optional[str] = Query(None),
     sort_by: Optional[str] = Query("id")
 ):
     """Страница поиска компонентов"""
-    filtered = components.copy()
-    
-    if type:
-        filtered = [c for c in filtered if c.get('type') == type]
-    
-    if origin:
-        filtered = [c for c in filtered if c.get('origin', '').lower() == origin.lower()]
-    
-    if search_text:
-        search_lower = search_text.lower()
-        filtered = [
-            c for c in filtered 
-            if (search_lower in c.get('name', '').lower() 
-            or search_lower in c.get('description', '').lower()
-            or search_lower in c.get('id', '').lower()
-            or any(search_lower in tag.lower() for tag in c.get('application_tags', [])))
-        ]
-    
-    if application_tag:
-        filtered = [c for c in filtered if 'application_tags' in c and application_tag in c['application_tags']]
-    
-    if sort_by:
-        try:
-            if sort_by == "power":
-                filtered.sort(key=lambda x: get_power_value(x), reverse=True)
-            elif sort_by == "voltage":
-                filtered.sort(key=lambda x: get_voltage_value(x), reverse=True)
-            elif sort_by == "current":
-                filtered.sort(key=lambda x: get_current_value(x), reverse=True)
-            elif sort_by == "id":
-                filtered.sort(key=lambda x: x.get('id', ''))
-            elif sort_by == "name":
-                filtered.sort(key=lambda x: x.get('name', ''))
-        except Exception as e:
-            logger.warning(f"Ошибка сортировки: {e}")
+    # Числовая сортировка берётся из отсортированных колонок каталога
+    order_by, descending = parse_sort(sort_by)
+    
+    # Текстовый поиск идёт по индексу; без явной сортировки — по релевантности
+    filter_error = None
+    query = dict(
+        type=type,
+        origin=origin,
+        tags={'application_tags': application_tag},
+        text=search_text,
+        where=where
+    )
+    try:
+        ordinals = catalog.search_ordinals(order_by=order_by, descending=descending, **query)
+        # Счётчики фильтров — по тем же ordinal; измерение с выбранным фильтром считается без него
+        facets = catalog.disjunctive_facets(ordinals, query)
+    except ValueError as e:
+        filter_error = str(e)
+        ordinals = []
+        facets = catalog.facets(ordinals)
+    filtered = catalog.records(ordinals)
+    
+    if sort_by == "id" and not search_text:
+        filtered.sort(key=lambda x: x.get('id', ''))
+    elif sort_by == "name":
+        filtered.sort(key=lambda x: x.get('name', ''))
     
     # Получаем уникальные типы, происхождения и теги для фильтров
-    component_types = sorted(set(c.get('type') for c in components if c.get('type')))
-    origins = sorted(set(c.get('origin') for c in components if c.get('origin')))
-    
-    # Собираем все теги применения
-    all_application_tags = []
-    for component in components:
-        all_application_tags.extend(component.get('application_tags', []))
-    common_application_tags = sorted(set(all_application_tags))[:15]
+    component_types = catalog.values('type')
+    origins = catalog.values('origin')
+    common_application_tags = catalog.values('application_tags')[:15]
     
     return templates.TemplateResponse("search.html", {
         "request": request,
@@ -528,11 +751,14 @@ async def components_page(
         "component_types": component_types,
         "origins": origins,
         "common_application_tags": common_application_tags,
+        "facets": facets,
+        "filter_error": filter_error,
         "filters": {
             "type": type,
             "origin": origin,
             "search_text": search_text,
             "application_tag": application_tag,
+            "where": where,
             "sort_by": sort_by
         },
         "brain_available": brain_available,
@@ -542,7 +768,7 @@ async def components_page(
 @app.get("/component/{component_id}", response_class=HTMLResponse)
 async def component_detail(request: Request, component_id: str):
     """Страница компонента"""
-    component = next((c for c in components if c['id'] == component_id), None)
+    component = catalog.get(component_id)
     
     if not component:
         return templates.TemplateResponse("error.html", {
@@ -555,32 +781,12 @@ async def component_detail(request: Request, component_id: str):
         })
     
     characteristics = None
-    file_path = component.get('characteristics_file')
-    
-    if file_path and os.path.exists(file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = f.read()
-            
-            lines = data.strip().split('\n')
-            characteristics = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                
-                parts = line.replace(',', ' ').split()
-                if len(parts) >= 2:
-                    try:
-                        voltage = float(parts[0])
-                        current = float(parts[1])
-                        characteristics.append({"voltage": voltage, "current": current})
-                    except ValueError:
-                        continue
-                        
-        except Exception as e:
-            logger.error(f"Ошибка чтения характеристик: {e}")
+    try:
+        curve = load_curve(component.get('characteristics_file'))
+        if curve is not None:
+            characteristics = resample_curve(curve, points=CHART_POINTS).points()
+    except Exception as e:
+        logger.error(f"Ошибка чтения характеристик: {e}")
     
     return templates.TemplateResponse("component.html", {
         "request": request,
@@ -595,15 +801,7 @@ async def component_detail(request: Request, component_id: str):
 @app.get("/ai-query", response_class=HTMLResponse)
 async def ai_query_page(request: Request):
     """Страница ИИ-запросов"""
-    # Правильный подсчет статистики для новой структуры
-    stats = {
-        "bjt_count": len([c for c in components if c.get('type') in ['bjt_npn', 'bjt_pnp']]),
-        "mosfet_count": len([c for c in components if 'mosfet' in c.get('type', '').lower()]),
-        "tube_count": len([c for c in components if 'vacuum_tube' in c.get('type', '').lower()]),
-        "diode_count": len([c for c in components if 'diode' in c.get('type', '').lower()]),
-        "transformer_count": len([c for c in components if 'transformer' in c.get('type', '').lower()]),
-        "total_components": len(components)
-    }
+    stats = catalog.stats().summary()
     
     return templates.TemplateResponse("ai_query.html", {
         "request": request,